@@ -9,6 +9,7 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from database.models import Base
+from database.engine import sync_url
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -19,6 +20,10 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# DATABASE_URL from the environment takes precedence over alembic.ini
+if os.getenv('DATABASE_URL'):
+    config.set_main_option('sqlalchemy.url', sync_url(os.environ['DATABASE_URL']))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
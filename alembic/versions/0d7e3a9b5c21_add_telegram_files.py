@@ -0,0 +1,35 @@
+"""Add telegram_files table
+
+Revision ID: 0d7e3a9b5c21
+Revises: f2a4c8e6b913
+Create Date: 2026-10-19 17:12:36.204918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d7e3a9b5c21'
+down_revision: Union[str, None] = 'f2a4c8e6b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'telegram_files',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('file_id', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('telegram_files')
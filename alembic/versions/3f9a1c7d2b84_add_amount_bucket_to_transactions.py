@@ -0,0 +1,31 @@
+"""Add amount bucket index to transactions
+
+Revision ID: 3f9a1c7d2b84
+Revises: 12392c410d52
+Create Date: 2026-10-19 10:12:31.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7d2b84'
+down_revision: Union[str, None] = '12392c410d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable: existing rows are filled by services.transaction.backfill_amount_buckets()
+    op.add_column('transactions', sa.Column('amount_bucket', sa.String(length=16), nullable=True))
+    op.create_index('ix_transactions_user_bucket', 'transactions', ['user_id', 'amount_bucket'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_user_bucket', table_name='transactions')
+    op.drop_column('transactions', 'amount_bucket')
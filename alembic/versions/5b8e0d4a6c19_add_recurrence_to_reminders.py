@@ -0,0 +1,28 @@
+"""Add recurrence to reminders
+
+Revision ID: 5b8e0d4a6c19
+Revises: a7c2e5d91f03
+Create Date: 2026-10-19 14:05:52.730411
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e0d4a6c19'
+down_revision: Union[str, None] = 'a7c2e5d91f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reminders', sa.Column('recurrence', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reminders', 'recurrence')
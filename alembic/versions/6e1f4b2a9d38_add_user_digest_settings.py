@@ -0,0 +1,30 @@
+"""Add monthly digest settings to users
+
+Revision ID: 6e1f4b2a9d38
+Revises: 0d7e3a9b5c21
+Create Date: 2026-10-19 17:41:52.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1f4b2a9d38'
+down_revision: Union[str, None] = '0d7e3a9b5c21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('digest_enabled', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('users', sa.Column('digest_month', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'digest_month')
+    op.drop_column('users', 'digest_enabled')
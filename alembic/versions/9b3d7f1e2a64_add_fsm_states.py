@@ -0,0 +1,37 @@
+"""Add fsm_states table
+
+Revision ID: 9b3d7f1e2a64
+Revises: 6e1f4b2a9d38
+Create Date: 2026-10-19 18:05:27.493610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3d7f1e2a64'
+down_revision: Union[str, None] = '6e1f4b2a9d38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'fsm_states',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('state', sa.String(), nullable=True),
+        sa.Column('data', sa.LargeBinary(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_fsm_states_updated_at'), 'fsm_states', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_fsm_states_updated_at'), table_name='fsm_states')
+    op.drop_table('fsm_states')
@@ -0,0 +1,66 @@
+"""Add monthly totals ledger
+
+Revision ID: a7c2e5d91f03
+Revises: 3f9a1c7d2b84
+Create Date: 2026-10-19 11:40:08.512907
+
+"""
+from typing import Sequence, Union
+from collections import defaultdict
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from cryptography.fernet import Fernet
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c2e5d91f03'
+down_revision: Union[str, None] = '3f9a1c7d2b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Key file of services/crypto.py at the time of this revision; copied so the migration does not import app code
+KEY_FILE = 'crypto.key'
+
+
+def _fernet() -> Fernet:
+    with open(KEY_FILE, 'rb') as f:
+        return Fernet(f.read())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    monthly_totals = op.create_table('monthly_totals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.DateTime(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('total', sa.LargeBinary(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'month', 'type', name='uq_monthly_totals_user_month_type')
+    )
+
+    # Backfill ledger from existing transactions
+    bind = op.get_bind()
+    totals = defaultdict(lambda: [0.0, 0])
+    rows = bind.execute(sa.text("SELECT user_id, type, date, amount FROM transactions")).all()
+    fernet = _fernet() if rows else None
+    for user_id, type_, date, amount in rows:
+        if isinstance(date, str):
+            date = datetime.datetime.fromisoformat(date)
+        date = date or datetime.datetime.utcnow()
+        key = (user_id, datetime.datetime(date.year, date.month, 1), type_)
+        totals[key][0] += float(fernet.decrypt(amount).decode())
+        totals[key][1] += 1
+    if totals:
+        op.bulk_insert(monthly_totals, [
+            {'user_id': user_id, 'month': month, 'type': type_, 'total': fernet.encrypt(str(total).encode()), 'count': count}
+            for (user_id, month, type_), (total, count) in totals.items()
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('monthly_totals')
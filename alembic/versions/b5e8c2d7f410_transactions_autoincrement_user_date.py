@@ -0,0 +1,40 @@
+"""Never reuse transaction ids, index transactions by user and date
+
+Revision ID: b5e8c2d7f410
+Revises: 9b3d7f1e2a64
+Create Date: 2026-10-19 18:31:09.557120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e8c2d7f410'
+down_revision: Union[str, None] = '9b3d7f1e2a64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        # AUTOINCREMENT can only be set by rebuilding the table
+        with op.batch_alter_table('transactions', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        # Continue after the highest id ever used, including rows already moved to the archive
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'transactions'")
+        op.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'transactions', COALESCE(MAX(id), 0) FROM "
+            "(SELECT id FROM transactions UNION ALL SELECT id FROM transactions_archive)"
+        )
+    op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_user_date', table_name='transactions')
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('transactions', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
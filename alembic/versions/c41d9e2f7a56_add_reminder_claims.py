@@ -0,0 +1,32 @@
+"""Add reminder claim columns
+
+Revision ID: c41d9e2f7a56
+Revises: 5b8e0d4a6c19
+Create Date: 2026-10-19 15:22:17.094562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d9e2f7a56'
+down_revision: Union[str, None] = '5b8e0d4a6c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reminders', sa.Column('claimed_by', sa.String(), nullable=True))
+    op.add_column('reminders', sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_reminders_active_due', 'reminders', ['is_active', 'remind_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reminders_active_due', table_name='reminders')
+    op.drop_column('reminders', 'claim_expires_at')
+    op.drop_column('reminders', 'claimed_by')
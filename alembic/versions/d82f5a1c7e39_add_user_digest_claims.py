@@ -0,0 +1,30 @@
+"""Add digest claim lease to users
+
+Revision ID: d82f5a1c7e39
+Revises: b5e8c2d7f410
+Create Date: 2026-10-19 18:52:44.861203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd82f5a1c7e39'
+down_revision: Union[str, None] = 'b5e8c2d7f410'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('digest_claimed_by', sa.String(), nullable=True))
+    op.add_column('users', sa.Column('digest_claim_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'digest_claim_expires_at')
+    op.drop_column('users', 'digest_claimed_by')
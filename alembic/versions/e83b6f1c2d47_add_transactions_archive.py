@@ -0,0 +1,51 @@
+"""Add transactions archive table
+
+Revision ID: e83b6f1c2d47
+Revises: c41d9e2f7a56
+Create Date: 2026-10-19 16:05:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83b6f1c2d47'
+down_revision: Union[str, None] = 'c41d9e2f7a56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'transactions_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.LargeBinary(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('currency', sa.String(), nullable=True),
+        sa.Column('amount_bucket', sa.String(length=16), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_transactions_archive_user_date', 'transactions_archive', ['user_id', 'date'], unique=False)
+    op.create_index('ix_transactions_archive_user_bucket', 'transactions_archive', ['user_id', 'amount_bucket'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Move archived rows back so no history is lost
+    op.execute(
+        "INSERT INTO transactions (id, user_id, amount, type, category_id, date, description, currency, amount_bucket) "
+        "SELECT id, user_id, amount, type, category_id, date, description, currency, amount_bucket FROM transactions_archive"
+    )
+    op.drop_index('ix_transactions_archive_user_bucket', table_name='transactions_archive')
+    op.drop_index('ix_transactions_archive_user_date', table_name='transactions_archive')
+    op.drop_table('transactions_archive')
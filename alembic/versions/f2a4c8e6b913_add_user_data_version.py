@@ -0,0 +1,28 @@
+"""Add data_version to users
+
+Revision ID: f2a4c8e6b913
+Revises: e83b6f1c2d47
+Create Date: 2026-10-19 16:48:09.552734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a4c8e6b913'
+down_revision: Union[str, None] = 'e83b6f1c2d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,91 @@
+# Benchmark: amount range queries through bucket index vs full decrypt scan
+#
+# Usage: python benchmarks/bench_amount_bucket.py [rows]
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database.models import Base, Transaction, Category
+from services.crypto import encrypt_value, decrypt_value, amount_bucket_token
+import services.transaction as transaction_service
+import database.db as db
+
+USER_ID = 1
+
+def populate(Session, rows: int):
+    # Log-uniform amounts between 1 and 1e6, like real spending
+    with Session() as session:
+        cat = Category(user_id=USER_ID, name='Bench', type='expense')
+        session.add(cat)
+        session.flush()
+        for _ in range(rows):
+            amount = round(10 ** random.uniform(0, 6), 2)
+            session.add(Transaction(
+                user_id=USER_ID,
+                amount=encrypt_value(amount),
+                type='expense',
+                category_id=cat.id,
+                currency='USD',
+                amount_bucket=amount_bucket_token(USER_ID, amount)
+            ))
+        session.commit()
+
+def full_scan(Session, min_amount: float):
+    with Session() as session:
+        txs = session.query(Transaction).filter(Transaction.user_id == USER_ID).all()
+        return [t for t in txs if decrypt_value(t.amount) >= min_amount]
+
+def full_scan_largest(Session, limit: int):
+    with Session() as session:
+        txs = session.query(Transaction).filter(Transaction.user_id == USER_ID).all()
+        amounts = sorted((decrypt_value(t.amount) for t in txs), reverse=True)
+        return amounts[:limit]
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return time.perf_counter() - start, result
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        engine = create_engine(f"sqlite:///{db_path}", future=True)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        # Point services at the benchmark database; NullPool because every timed call runs its own event loop
+        db.AsyncSessionLocal = async_sessionmaker(
+            create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool), expire_on_commit=False
+        )
+
+        populate(Session, rows)
+        print(f"Rows: {rows}")
+
+        for min_amount in (1000, 100000):
+            scan_time, scan_rows = timed(full_scan, Session, min_amount)
+            idx_time, idx_rows = timed(transaction_service.get_transactions_by_amount, USER_ID, min_amount)
+            assert len(scan_rows) == len(idx_rows)
+            print(f"amount >= {min_amount:>7}: full scan {scan_time * 1000:8.1f} ms, "
+                  f"bucket index {idx_time * 1000:8.1f} ms ({len(idx_rows)} rows, x{scan_time / idx_time:.1f})")
+
+        scan_time, top = timed(full_scan_largest, Session, 10)
+        idx_time, idx_top = timed(transaction_service.get_largest_transactions, USER_ID, 10)
+        assert [round(a, 2) for a in top] == [round(t.amount, 2) for t in idx_top]
+        print(f"largest 10:        full scan {scan_time * 1000:8.1f} ms, "
+              f"bucket index {idx_time * 1000:8.1f} ms (x{scan_time / idx_time:.1f})")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
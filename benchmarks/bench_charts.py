@@ -0,0 +1,60 @@
+# Benchmark: chart rendering with the Pillow backend vs matplotlib, per chart type
+#
+# Each backend runs in a fresh process, so import time and peak memory (max RSS)
+# are what a report worker pays: import, first render (fonts, caches), then the
+# steady-state time per render.
+#
+# Usage: python benchmarks/bench_charts.py [renders] [dpi]
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+LABELS = ["Groceries", "Rent", "Transport", "Entertainment", "Health", "Utilities", "Other"]
+AMOUNTS = [320.5, 900.0, 120.0, 75.25, 40.0, 60.0, 8.0]
+
+def child(backend: str, chart: str, renders: int, dpi: int):
+    # Configure before reports.charts reads config
+    os.environ['PIE_CHART_BACKEND'] = backend
+    os.environ['BAR_CHART_BACKEND'] = backend
+    start = time.perf_counter()
+    from reports.charts import render_pie_chart, render_bar_chart
+    render = render_pie_chart if chart == 'pie' else render_bar_chart
+    render(LABELS, AMOUNTS, "Expenses (USD)", dpi)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(renders):
+        size = len(render(LABELS, AMOUNTS, "Expenses (USD)", dpi))
+    per_render = (time.perf_counter() - start) / renders
+    print(json.dumps({
+        'first': first,
+        'per_render': per_render,
+        'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'png': size,
+    }))
+
+def main():
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    dpi = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+    print(f"Renders: {renders}, dpi: {dpi}")
+    print(f"{'chart':>5} {'backend':>10} {'import+first':>13} {'per render':>11} {'max RSS':>9} {'PNG':>8}")
+    for chart in ('pie', 'bar'):
+        for backend in ('matplotlib', 'pillow'):
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', backend, chart, str(renders), str(dpi)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{chart:>5} {backend:>10} {r['first'] * 1000:10.0f} ms {r['per_render'] * 1000:8.1f} ms "
+                  f"{r['max_rss'] / 2**20:6.1f} MiB {r['png'] / 1024:5.0f} KiB")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+    else:
+        main()
@@ -0,0 +1,136 @@
+# Benchmark: monthly digest for many users, batched job vs one scan and render per user
+#
+# "per-user" is the naive approach: one query per user and a pyplot render on the
+# event loop. "batched" is services/digest.py: one aggregate query per user
+# batch and charts rendered in the report worker pool. Sends go to a fake bot
+# with Telegram pacing disabled, so only the bot's own cost is measured.
+#
+# Usage: python benchmarks/bench_digest.py [users] [transactions_per_user]
+
+import asyncio
+import datetime
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database.models import Base, User, Transaction, Category
+from services.crypto import encrypt_value, decrypt_value
+from services.ratelimit import TelegramRateLimiter
+import database.db as db
+import services.digest as digest
+import services.delivery as delivery
+from reports.workers import get_report_pool, shutdown_report_pool
+
+TODAY = datetime.datetime(2026, 10, 1, 9, 0)
+MONTH = datetime.datetime(2026, 9, 1)
+
+class FakeBot:
+    async def send_photo(self, chat_id, photo, caption):
+        pass
+
+    async def send_message(self, chat_id, text):
+        pass
+
+def populate(Session, users: int, per_user: int):
+    with Session() as session:
+        cats = [Category(user_id=0, name=f'Category {i}', type='expense') for i in range(8)]
+        session.add_all(cats)
+        session.flush()
+        for uid in range(1, users + 1):
+            session.add(User(telegram_id=uid, preferred_currency='USD', digest_enabled=True))
+            for i in range(per_user):
+                session.add(Transaction(
+                    user_id=uid,
+                    amount=encrypt_value(float(i % 100 + 1)),
+                    type='income' if i % 10 == 0 else 'expense',
+                    category_id=cats[i % 8].id,
+                    currency='USD',
+                    date=MONTH + datetime.timedelta(hours=i)
+                ))
+        session.commit()
+
+async def per_user(users: int):
+    # One query and one pie chart on the event loop per user
+    for uid in range(1, users + 1):
+        async with db.AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(Transaction.type, Transaction.amount, Category.name)
+                .outerjoin(Category, Transaction.category_id == Category.id)
+                .where(Transaction.user_id == uid, Transaction.date >= MONTH, Transaction.date < TODAY)
+            )).all()
+        categories = {}
+        for type_, amount, name in rows:
+            if type_ == 'expense':
+                categories[name] = categories.get(name, 0.0) + decrypt_value(amount)
+        fig, ax = plt.subplots(figsize=(10, 8))
+        ax.pie(list(categories.values()), labels=list(categories), autopct='%1.1f%%', startangle=90)
+        buf = io.BytesIO()
+        plt.savefig(buf, format='png', dpi=digest.DIGEST_CHART_DPI, bbox_inches='tight')
+        plt.close(fig)
+
+async def batched(users: int):
+    return await digest.send_monthly_digest(FakeBot(), TODAY)
+
+async def max_loop_gap(coro):
+    # Longest time the event loop was blocked while coro ran
+    gap = 0.0
+    done = False
+
+    async def probe():
+        nonlocal gap
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            gap = max(gap, time.perf_counter() - start - 0.005)
+
+    task = asyncio.create_task(probe())
+    result = await coro
+    done = True
+    await task
+    return result, gap
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    per_user_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    digest.telegram_limiter = delivery.telegram_limiter = TelegramRateLimiter(global_rate=10**6, per_chat_rate=10**6)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        engine = create_engine(f"sqlite:///{db_path}", future=True)
+        Base.metadata.create_all(engine)
+        populate(sessionmaker(bind=engine), users, per_user_rows)
+        print(f"Users: {users}, transactions per user: {per_user_rows}")
+
+        async def run():
+            db.AsyncSessionLocal = async_sessionmaker(
+                create_async_engine(f"sqlite+aiosqlite:///{db_path}"), expire_on_commit=False
+            )
+            # Spawn the workers up front so process start-up is not billed to the job
+            await asyncio.gather(*(
+                asyncio.get_running_loop().run_in_executor(get_report_pool(), time.sleep, 0.1)
+                for _ in range(get_report_pool()._max_workers)
+            ))
+            for name, fn in (('per-user', per_user), ('batched', batched)):
+                start = time.perf_counter()
+                stats, gap = await max_loop_gap(fn(users))
+                elapsed = time.perf_counter() - start
+                print(f"{name:>9}: {elapsed:7.2f} s, {elapsed / users * 1000:6.1f} ms/user, max loop block {gap * 1000:6.1f} ms")
+                if stats:
+                    print(f"           query {stats['query_seconds']:.2f}s, render {stats['render_seconds']:.2f}s, "
+                          f"send {stats['send_seconds']:.2f}s, sent {stats['sent']}")
+            await shutdown_report_pool()
+
+        asyncio.run(run())
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
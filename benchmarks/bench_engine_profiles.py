@@ -0,0 +1,86 @@
+# Benchmark: write throughput and reader latency per database engine profile
+#
+# One thread commits single-row inserts (like add_transaction) while another
+# thread keeps reading; with the legacy rollback journal readers wait for the
+# writer, with WAL they do not.
+#
+# Usage: python benchmarks/bench_engine_profiles.py [writes] [profile ...]
+#        DATABASE_URL=postgresql://... python benchmarks/bench_engine_profiles.py 2000 server
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, text
+from database.engine import make_engine, SQLITE_PROFILES
+import datetime
+
+# Dedicated table, so pointing the benchmark at a real server database never touches bot data
+metadata = MetaData()
+bench_writes = Table(
+    'bench_writes', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, nullable=False),
+    Column('message', String, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+)
+
+def run_profile(url: str, profile: str, writes: int) -> dict:
+    engine = make_engine(url, profile)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    done = threading.Event()
+    read_latencies = []
+
+    def reader():
+        with engine.connect() as conn:
+            while not done.is_set():
+                start = time.perf_counter()
+                conn.execute(text("SELECT count(*) FROM bench_writes")).scalar()
+                conn.rollback()
+                read_latencies.append(time.perf_counter() - start)
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        for i in range(writes):
+            conn.execute(
+                bench_writes.insert(),
+                {'user_id': i, 'message': 'bench', 'created_at': datetime.datetime.now()}
+            )
+            conn.commit()
+    elapsed = time.perf_counter() - start
+    done.set()
+    reader_thread.join()
+    metadata.drop_all(engine)
+    engine.dispose()
+
+    read_latencies.sort()
+    return {
+        'writes_per_sec': writes / elapsed,
+        'reads': len(read_latencies),
+        'read_p99_ms': read_latencies[int(len(read_latencies) * 0.99)] * 1000 if read_latencies else 0.0,
+    }
+
+def main():
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    profiles = sys.argv[2:] or list(SQLITE_PROFILES)
+    server_url = os.getenv('DATABASE_URL', '')
+    print(f"Writes per profile: {writes}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in profiles:
+            if profile == 'server':
+                url = server_url
+            else:
+                url = f"sqlite:///{os.path.join(tmp, f'{profile}.db')}"
+            result = run_profile(url, profile if profile in SQLITE_PROFILES else 'wal', writes)
+            print(f"{profile:>8}: {result['writes_per_sec']:8.0f} commits/s, "
+                  f"{result['reads']:7d} concurrent reads, read p99 {result['read_p99_ms']:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
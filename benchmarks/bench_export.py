@@ -0,0 +1,110 @@
+# Benchmark: full-history exports, time and peak Python memory per format
+#
+# "excel-inmemory" is the previous approach (regular workbook, every row in
+# memory, auto-size scan over all cells) for comparison with the streamed export.
+# PDF renders in a report worker process, so its peak covers the bot process only.
+#
+# Usage: python benchmarks/bench_export.py [rows] [format ...]
+
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import openpyxl
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database.models import Base, Transaction, Category
+from services.crypto import encrypt_value
+from services.transaction import get_last_transactions
+import database.db as db
+import reports.export as export
+from reports.workers import shutdown_report_pool
+from reports.stream import export_stream
+
+USER_ID = 1
+
+def populate(Session, rows: int):
+    with Session() as session:
+        cats = [Category(user_id=USER_ID, name=f'Category {i}', type='expense') for i in range(10)]
+        session.add_all(cats)
+        session.flush()
+        for i in range(rows):
+            session.add(Transaction(
+                user_id=USER_ID,
+                amount=encrypt_value(float(i % 1000)),
+                type='expense',
+                category_id=cats[i % 10].id,
+                currency='USD',
+                description=f'Purchase {i}'
+            ))
+        session.commit()
+
+async def excel_inmemory(user_id: int):
+    txs = await get_last_transactions(user_id, limit=10**9)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Date", "Category", "Type", "Amount", "Description"])
+    for t in txs:
+        ws.append([t.date.strftime('%d.%m.%Y %H:%M'), t.category, t.type, t.amount, t.description or ""])
+    for col in ws.columns:
+        ws.column_dimensions[col[0].column_letter].width = min(max(len(str(c.value)) for c in col) + 2, 50)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf
+
+def stream_export(fmt: str):
+    async def run(user_id: int):
+        file, _ = await export_stream(user_id, fmt)
+        file.file.close()
+    return run
+
+FORMATS = {
+    'excel-inmemory': excel_inmemory,
+    'excel': export.export_excel,
+    'pdf': export.export_pdf,
+    'csv': stream_export('csv'),
+    'parquet': stream_export('parquet'),
+}
+
+def measure(fn, rows: int):
+    # Time and peak memory from separate runs, tracemalloc slows allocation-heavy code a lot
+    start = time.perf_counter()
+    asyncio.run(fn(USER_ID))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    asyncio.run(fn(USER_ID))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    formats = sys.argv[2:] or list(FORMATS)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        engine = create_engine(f"sqlite:///{db_path}", future=True)
+        Base.metadata.create_all(engine)
+        populate(sessionmaker(bind=engine), rows)
+        # NullPool because every measured call runs its own event loop
+        db.AsyncSessionLocal = async_sessionmaker(
+            create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool), expire_on_commit=False
+        )
+        # Report worker processes open the database from the environment
+        os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+        print(f"Rows: {rows}")
+        for name in formats:
+            elapsed, peak = measure(FORMATS[name], rows)
+            print(f"{name:>15}: {elapsed:7.2f} s, {rows / elapsed:8.0f} rows/s, peak {peak / 2**20:7.1f} MiB")
+        asyncio.run(shutdown_report_pool())
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
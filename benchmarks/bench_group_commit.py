@@ -0,0 +1,79 @@
+# Benchmark: concurrent transaction inserts, one commit per insert vs group commit
+#
+# Each simulated user adds a transaction (insert + monthly ledger update) at the
+# same time; with group commit the writes share one commit per batch instead of
+# queueing for the SQLite write lock one by one. Per-insert commits that lose
+# the lock race fail with "database is locked" and are reported as errors.
+#
+# Usage: python benchmarks/bench_group_commit.py [writes] [concurrency] [profile ...]
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.engine import make_async_engine, SQLITE_PROFILES
+from database.models import Base, Transaction
+from database.write_queue import WriteQueue
+from services.crypto import encrypt_value
+from services.ledger import record_transaction
+
+def make_work(i: int):
+    user_id = i % 50
+
+    async def work(session):
+        tx = Transaction(user_id=user_id, amount=encrypt_value(10.0), type='expense', currency='USD')
+        session.add(tx)
+        await record_transaction(session, user_id, 'expense', 10.0)
+        await session.flush()
+        return tx.id
+
+    return work
+
+async def run_mode(url: str, profile: str, writes: int, concurrency: int, grouped: bool):
+    engine = make_async_engine(url, profile)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    queue = WriteQueue(Session)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            if grouped:
+                return await queue.submit(make_work(i))
+            async with Session() as session:
+                result = await make_work(i)(session)
+                await session.commit()
+                return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(writes)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    await queue.close()
+    await engine.dispose()
+    ok = sum(1 for r in results if not isinstance(r, Exception))
+    return ok / elapsed, writes - ok, queue.batches
+
+def main():
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    profiles = sys.argv[3:] or ['wal', 'durable']
+    print(f"Writes: {writes}, concurrent callers: {concurrency}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in profiles:
+            if profile not in SQLITE_PROFILES:
+                raise SystemExit(f"Unknown profile: {profile}")
+            url = f"sqlite:///{os.path.join(tmp, f'{profile}.db')}"
+            single, single_errors, _ = asyncio.run(run_mode(url, profile, writes, concurrency, grouped=False))
+            grouped, grouped_errors, batches = asyncio.run(run_mode(url, profile, writes, concurrency, grouped=True))
+            print(f"{profile:>8}: per-insert commit {single:7.0f} writes/s ({single_errors} failed), "
+                  f"group commit {grouped:7.0f} writes/s ({grouped_errors} failed, {batches} commits)")
+
+if __name__ == "__main__":
+    main()
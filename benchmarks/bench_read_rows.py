@@ -0,0 +1,89 @@
+# Benchmark: report read path, detached ORM objects vs column rows (TransactionRow)
+#
+# Usage: python benchmarks/bench_read_rows.py [rows]
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker, joinedload
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database.models import Base, Transaction, Category
+from services.crypto import encrypt_value, decrypt_value
+import database.db as db
+import services.transaction as transaction_service
+
+USER_ID = 1
+
+def populate(Session, rows: int):
+    with Session() as session:
+        cats = [Category(user_id=USER_ID, name=f'Category {i}', type='expense') for i in range(10)]
+        session.add_all(cats)
+        session.flush()
+        for i in range(rows):
+            session.add(Transaction(
+                user_id=USER_ID,
+                amount=encrypt_value(float(i % 1000)),
+                type='expense',
+                category_id=cats[i % 10].id,
+                currency='USD',
+                description='bench'
+            ))
+        session.commit()
+
+async def orm_objects(limit: int):
+    # Read path before TransactionRow: full ORM objects with joined category, detached and mutated
+    async with db.AsyncSessionLocal() as session:
+        txs = (await session.execute(
+            select(Transaction)
+            .options(joinedload(Transaction.category))
+            .where(Transaction.user_id == USER_ID)
+            .order_by(Transaction.date.desc())
+            .limit(limit)
+        )).scalars().all()
+        session.expunge_all()
+    for t in txs:
+        t.amount = decrypt_value(t.amount)
+    return txs
+
+def measure(coro_fn, *args):
+    # Time and peak memory from separate runs, tracemalloc slows allocation-heavy code a lot
+    start = time.perf_counter()
+    result = asyncio.run(coro_fn(*args))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    asyncio.run(coro_fn(*args))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        engine = create_engine(f"sqlite:///{db_path}", future=True)
+        Base.metadata.create_all(engine)
+        populate(sessionmaker(bind=engine), rows)
+        # NullPool because every measured call runs its own event loop
+        db.AsyncSessionLocal = async_sessionmaker(
+            create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool), expire_on_commit=False
+        )
+
+        print(f"Rows: {rows}")
+        orm_time, orm_peak, orm_rows = measure(orm_objects, rows)
+        row_time, row_peak, dto_rows = measure(transaction_service.get_last_transactions, USER_ID, rows)
+        assert len(orm_rows) == len(dto_rows)
+        print(f"ORM objects:    {orm_time * 1000:8.1f} ms, peak {orm_peak / 2**20:7.1f} MiB")
+        print(f"TransactionRow: {row_time * 1000:8.1f} ms, peak {row_peak / 2**20:7.1f} MiB "
+              f"(x{orm_time / row_time:.1f} faster, x{orm_peak / row_peak:.1f} less memory)")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
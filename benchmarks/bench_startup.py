@@ -0,0 +1,119 @@
+# Benchmark: time to first update, from process spawn to the /start reply
+#
+# A child process imports main, builds the real dispatcher, runs its startup
+# hooks (background warm-up included) and feeds one /start update through a
+# fake Telegram session, so nothing goes over the network. The parent measures
+# wall time from spawn to the handled update; with --budget it exits with
+# status 1 when the median run is slower, so CI can fail on start-up regressions.
+#
+# Usage: python benchmarks/bench_startup.py [runs] [--budget SECONDS]
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ('pandas', 'openpyxl', 'reportlab', 'matplotlib')
+BENCH_TOKEN = '123456789:' + 'A' * 35
+
+def child():
+    import asyncio
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import main
+    imported = time.perf_counter()
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Update
+
+    class FakeSession(BaseSession):
+        # Records API calls instead of sending them
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls.append(type(method).__name__)
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b''
+
+        async def close(self):
+            pass
+
+    heavy_at_import = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    async def run():
+        main.init_db()
+        session = FakeSession()
+        bot = Bot(BENCH_TOKEN, session=session)
+        dp = main.create_dispatcher()
+        await dp.emit_startup(bot=bot, dispatcher=dp)
+        ready = time.perf_counter()
+        await dp.feed_update(bot, Update.model_validate({
+            'update_id': 1,
+            'message': {
+                'message_id': 1, 'date': int(time.time()),
+                'chat': {'id': 1, 'type': 'private'},
+                'from': {'id': 1, 'is_bot': False, 'first_name': 'Bench'},
+                'text': '/start', 'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+            },
+        }))
+        handled = time.perf_counter()
+        # Stop before the warm-up finishes: only time to first update is measured
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        return ready, handled, session.calls
+
+    ready, handled, calls = asyncio.run(run())
+    print(json.dumps({
+        'import': imported - start,
+        'ready': ready - start,
+        'first_update': handled - start,
+        'calls': calls,
+        'heavy_at_import': heavy_at_import,
+    }), flush=True)
+
+def measure() -> dict:
+    # One cold start in a scratch directory (fresh database, key and log file)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}", BOT_TOKEN=BENCH_TOKEN)
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child'],
+                                cwd=tmp, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        line = proc.stdout.readline()
+        wall = time.perf_counter() - start
+        proc.wait()
+    result = json.loads(line)
+    result['wall'] = wall
+    return result
+
+def main():
+    args = sys.argv[1:]
+    budget = None
+    if '--budget' in args:
+        i = args.index('--budget')
+        budget = float(args[i + 1])
+        del args[i:i + 2]
+    runs = int(args[0]) if args else 3
+
+    results = [measure() for _ in range(runs)]
+    for r in results:
+        print(f"spawn to first update {r['wall']:.2f}s (imports {r['import']:.2f}s, "
+              f"dispatcher ready {r['ready']:.2f}s, handled {r['first_update']:.2f}s), replies: {r['calls']}")
+    heavy = results[0]['heavy_at_import']
+    print(f"Heavy modules imported at start-up: {', '.join(heavy) or 'none'}")
+    median = statistics.median(r['wall'] for r in results)
+    print(f"Median time to first update: {median:.2f}s" + (f" (budget {budget:.2f}s)" if budget else ""))
+    if budget is not None and median > budget:
+        print("Start-up budget exceeded")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['--child']:
+        child()
+    else:
+        main()
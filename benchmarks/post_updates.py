@@ -0,0 +1,81 @@
+# Post recorded (or synthetic) updates to a running webhook server and report acknowledgement latency
+#
+# Start the bot in webhook mode without registering it with Telegram, e.g.
+#   BOT_MODE=webhook WEBHOOK_SECRET=local python main.py
+# then
+#   python benchmarks/post_updates.py http://localhost:8080/webhook --secret local --count 200 --concurrency 20
+#
+# --file takes recorded updates, one Update JSON object per line (as Telegram
+# sends them). Without it, /start updates from distinct synthetic users are
+# generated. Replies go to the Bot API with the configured token, so use a
+# test token or recorded chats you own.
+#
+# Usage: python benchmarks/post_updates.py URL [--secret S] [--file F] [--count N] [--concurrency C]
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+
+def synthetic_updates(count: int):
+    for i in range(1, count + 1):
+        yield {
+            'update_id': i,
+            'message': {
+                'message_id': i, 'date': int(time.time()),
+                'chat': {'id': 10**6 + i, 'type': 'private'},
+                'from': {'id': 10**6 + i, 'is_bot': False, 'first_name': f'Load {i}'},
+                'text': '/start', 'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+            },
+        }
+
+def recorded_updates(path: str, count: int):
+    with open(path, encoding='utf-8') as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    # Repeat the recording if more updates are asked for, with fresh update ids
+    for i in range(count or len(updates)):
+        yield dict(updates[i % len(updates)], update_id=i + 1)
+
+async def post_all(url: str, updates: list, secret: str, concurrency: int):
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def post(session, update):
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(post(session, u) for u in updates))
+        elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('url')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--file')
+    parser.add_argument('--count', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.file:
+        updates = list(recorded_updates(args.file, args.count))
+    else:
+        updates = list(synthetic_updates(args.count or 100))
+    latencies, statuses, elapsed = asyncio.run(post_all(args.url, updates, args.secret, args.concurrency))
+    latencies.sort()
+    print(f"Posted {len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.0f}/s), statuses: {statuses}")
+    print(f"Latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,99 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from contextlib import asynccontextmanager
+from contextvars import Context, ContextVar
 from .models import Base
+from .engine import make_engine, make_async_engine
+import asyncio
 
-DATABASE_URL = 'sqlite:///finance.db'
-
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+# Sync engine for init_db, migrations and maintenance scripts
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine)
 
+# Async engine used by services, so queries never block the event loop
+async_engine = make_async_engine()
+# Objects stay usable after commit: lazy refresh is not possible outside the session in async mode
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# Session of the unit of work running in the current context (one per aiogram update)
+_current_session = ContextVar('current_session', default=None)
+
+async def _commit(session):
+    await session.commit()
+    session.info.pop('writes', None)
+    for callback in session.info.pop('after_commit', []):
+        callback()
+
+async def _rollback(session):
+    session.info.pop('writes', None)
+    session.info.pop('after_commit', None)
+    await session.rollback()
+
+@event.listens_for(Session, 'after_flush')
+def _mark_writes(session, flush_context):
+    # Lets session_scope() tell a failed write from a failed read
+    session.info['writes'] = True
+
+@asynccontextmanager
+async def unit_of_work():
+    """Open a session shared by every session_scope() inside; commits once on success.
+
+    The session checks out a connection only when first used, and
+    commit_current() returns it to the pool before network I/O.
+    """
+    async with AsyncSessionLocal() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+            await _commit(session)
+        finally:
+            _current_session.reset(token)
+
+@asynccontextmanager
+async def session_scope():
+    """Session of the current unit of work, or a new unit of work if none is active.
+
+    Services use this instead of opening sessions directly and flush instead of
+    committing, so nested service calls share one connection and one commit.
+    A service call that fails after writing rolls the unit of work back, so a
+    handler catching the error cannot commit half of it.
+    """
+    session = _current_session.get()
+    if session is not None:
+        try:
+            yield session
+        except BaseException:
+            if session.info.get('writes') or session.new or session.dirty or session.deleted:
+                await _rollback(session)
+            raise
+        return
+    async with unit_of_work() as session:
+        yield session
+
+async def commit_current():
+    """Commit the active unit of work early and return its connection to the pool.
+
+    Called before network I/O (Telegram requests, exchange rate lookups) and
+    before waiting on a write made by another connection, so an update never
+    holds the SQLite write lock or a pooled connection while it waits.
+    """
+    session = _current_session.get()
+    if session is not None:
+        await _commit(session)
+
+def after_commit(callback):
+    # Run callback once the current unit of work commits (dropped if it rolls back); at once outside one
+    session = _current_session.get()
+    if session is None:
+        callback()
+    else:
+        session.info.setdefault('after_commit', []).append(callback)
+
+def create_background_task(coro) -> asyncio.Task:
+    # Task in an empty context, outside the caller's unit of work (create_task(context=) needs Python 3.11)
+    return Context().run(asyncio.create_task, coro)
+
 def init_db():
     # Create all tables
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
@@ -0,0 +1,93 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import (
+    DATABASE_URL, DB_PROFILE,
+    SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
+)
+import logging
+
+# Pragmas applied to every new SQLite connection, per profile
+SQLITE_PROFILES = {
+    # SQLite defaults: rollback journal, synchronous=FULL, readers wait for writers
+    'legacy': {},
+    # WAL lets readers run concurrently with the writer; NORMAL syncs only at checkpoints
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+    },
+    # WAL with an fsync per commit, for deployments that cannot lose the last commits on power loss
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+    },
+}
+
+# Sync and async drivers for each backend
+SYNC_DRIVERS = {'sqlite': 'sqlite', 'postgresql': 'postgresql+psycopg2'}
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+def _with_driver(url: str, drivers: dict) -> str:
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in drivers:
+        raise ValueError(f"Unsupported database backend: {backend}")
+    return url.set(drivername=drivers[backend]).render_as_string(hide_password=False)
+
+def sync_url(url: str = DATABASE_URL) -> str:
+    return _with_driver(url, SYNC_DRIVERS)
+
+def async_url(url: str = DATABASE_URL) -> str:
+    return _with_driver(url, ASYNC_DRIVERS)
+
+def sqlite_pragmas(profile: str = DB_PROFILE) -> dict:
+    """Pragmas for profile; cache, mmap and busy timeout apply to every profile except legacy"""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    if profile != 'legacy':
+        pragmas.update({
+            'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+            'cache_size': -SQLITE_CACHE_SIZE_KB,  # Negative value is size in KiB
+            'mmap_size': SQLITE_MMAP_SIZE,
+            'temp_store': 'MEMORY',
+        })
+    return pragmas
+
+def _install_sqlite_pragmas(sync_engine, pragmas: dict):
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def engine_options(url: str) -> dict:
+    # Pool settings for server databases; SQLite uses SQLAlchemy's default file pool
+    if make_url(url).get_backend_name() == 'sqlite':
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+def make_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE, **kwargs):
+    """Sync engine for init_db, migrations and maintenance scripts"""
+    url = sync_url(url)
+    engine = create_engine(url, echo=False, future=True, **{**engine_options(url), **kwargs})
+    if engine.dialect.name == 'sqlite':
+        _install_sqlite_pragmas(engine, sqlite_pragmas(profile))
+    logging.debug(f"Database engine: {engine.url.render_as_string()}, profile={profile}")
+    return engine
+
+def make_async_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE, **kwargs):
+    """Async engine used by services"""
+    url = async_url(url)
+    engine = create_async_engine(url, echo=False, **{**engine_options(url), **kwargs})
+    if engine.dialect.name == 'sqlite':
+        _install_sqlite_pragmas(engine.sync_engine, sqlite_pragmas(profile))
+    return engine
@@ -0,0 +1,197 @@
+import database.db as db
+from database.models import FSMState
+from services.crypto import encrypt_text, decrypt_text
+from config import FSM_STORAGE, FSM_FLUSH_INTERVAL_MS, FSM_CACHE_SECONDS, FSM_STATE_TTL_HOURS
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import select, delete, insert
+import asyncio
+import datetime
+import json
+import logging
+import time
+
+# Expired rows are deleted at most this often
+SWEEP_INTERVAL_SECONDS = 600
+# Without write-back (flush_interval 0), writes that failed are retried this often
+RETRY_INTERVAL_SECONDS = 1
+
+class _Entry:
+    __slots__ = ('state', 'data', 'updated_at', 'loaded_at')
+
+    def __init__(self, state, data: dict, updated_at: datetime.datetime, loaded_at: float):
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+        self.loaded_at = loaded_at
+
+def storage_key(key: StorageKey) -> str:
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+class SQLStorage(BaseStorage):
+    """aiogram FSM storage in the fsm_states table with a write-back cache.
+
+    Reads are served from memory; a key is loaded from the database on its
+    first use and again once cache_seconds have passed. Writes update the
+    cache and mark the key dirty; a background task writes dirty keys in one
+    transaction every flush_interval seconds, and close() (dispatcher
+    shutdown) writes whatever is left. States untouched for ttl_hours read as
+    empty and their rows are swept.
+
+    Caching is only coherent while one process owns the dialogs (polling).
+    With cache_seconds=0 and flush_interval=0, the defaults in webhook mode,
+    every read goes to the database and every write is committed before it
+    returns, so instances behind a load balancer share state.
+    """
+
+    def __init__(self, session_factory=None, flush_interval: float = FSM_FLUSH_INTERVAL_MS / 1000,
+                 cache_seconds: float = FSM_CACHE_SECONDS, ttl_hours: float = FSM_STATE_TTL_HOURS):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.cache_seconds = cache_seconds
+        self.ttl = datetime.timedelta(hours=ttl_hours) if ttl_hours else None
+        self._cache = {}
+        self._dirty = set()
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+        self._last_sweep = 0.0
+        self.loads = 0
+        self.flushes = 0
+
+    def _session(self):
+        return (self.session_factory or db.AsyncSessionLocal)()
+
+    def _expired(self, updated_at: datetime.datetime, now: datetime.datetime) -> bool:
+        return self.ttl is not None and updated_at < now - self.ttl
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        name = storage_key(key)
+        entry = self._cache.get(name)
+        now = datetime.datetime.utcnow()
+        if entry is not None:
+            stale = name not in self._dirty and time.monotonic() - entry.loaded_at > self.cache_seconds
+            if not stale:
+                if self._expired(entry.updated_at, now):
+                    entry.state, entry.data = None, {}
+                return entry
+
+        started = time.monotonic()
+        async with self._session() as session:
+            row = (await session.execute(
+                select(FSMState.state, FSMState.data, FSMState.updated_at).where(FSMState.key == name)
+            )).first()
+        self.loads += 1
+        current = self._cache.get(name)
+        if current is not None and (name in self._dirty or current.loaded_at >= started):
+            # Written or loaded by a concurrent call while we waited: newer than our row
+            return current
+        if row is None or self._expired(row.updated_at, now):
+            # Misses are cached too: most updates come from users who are not in a dialog
+            entry = _Entry(None, {}, now, time.monotonic())
+        else:
+            data = json.loads(decrypt_text(row.data)) if row.data else {}
+            entry = _Entry(row.state, data, row.updated_at, time.monotonic())
+        self._cache[name] = entry
+        return entry
+
+    def _touch(self, key: StorageKey, entry: _Entry):
+        entry.updated_at = datetime.datetime.utcnow()
+        entry.loaded_at = time.monotonic()  # Own writes keep the cached entry authoritative
+        self._dirty.add(storage_key(key))
+        if self._task is None or self._task.done():
+            # Flusher starts lazily on the loop of its first writer, outside the writer's unit of work
+            self._task = db.create_background_task(self._run())
+
+    async def _written(self):
+        # Write-through mode: commit before returning to the handler
+        if self.flush_interval <= 0:
+            await self.flush()
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._touch(key, entry)
+        await self._written()
+
+    async def get_state(self, key: StorageKey):
+        return (await self._entry(key)).state
+
+    async def set_data(self, key: StorageKey, data: dict) -> None:
+        entry = await self._entry(key)
+        entry.data = data.copy()
+        self._touch(key, entry)
+        await self._written()
+
+    async def get_data(self, key: StorageKey) -> dict:
+        return (await self._entry(key)).data.copy()
+
+    async def _run(self):
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval or RETRY_INTERVAL_SECONDS)
+            await self.flush()
+            if time.monotonic() - self._last_sweep > SWEEP_INTERVAL_SECONDS:
+                try:
+                    await self.sweep()
+                except Exception as e:
+                    logging.warning(f"Failed to remove expired FSM states: {e}")
+
+    async def flush(self) -> int:
+        """Write dirty keys in one transaction; returns the number of keys written"""
+        # One flush at a time, so a later snapshot of a key is never overwritten by an earlier one
+        async with self._flush_lock:
+            names, self._dirty = self._dirty, set()
+            if not names:
+                return 0
+            # Every dirty row is replaced; finished dialogs (state.clear()) are only deleted
+            rows = [
+                {'key': name, 'state': entry.state, 'updated_at': entry.updated_at,
+                 'data': encrypt_text(json.dumps(entry.data)) if entry.data else None}
+                for name, entry in ((name, self._cache[name]) for name in names)
+                if entry.state is not None or entry.data
+            ]
+            try:
+                async with self._session() as session:
+                    await session.execute(delete(FSMState).where(FSMState.key.in_(list(names))))
+                    if rows:
+                        await session.execute(insert(FSMState), rows)
+                    await session.commit()
+            except asyncio.CancelledError:
+                self._dirty |= names
+                raise
+            except Exception as e:
+                logging.warning(f"Failed to write {len(names)} FSM states, will retry: {e}")
+                self._dirty |= names
+                return 0
+            self.flushes += 1
+            return len(names)
+
+    async def sweep(self) -> int:
+        """Delete expired rows and drop idle clean entries from the cache; returns rows deleted"""
+        self._last_sweep = time.monotonic()
+        idle = [name for name, entry in self._cache.items()
+                if name not in self._dirty and self._last_sweep - entry.loaded_at > self.cache_seconds]
+        for name in idle:
+            del self._cache[name]
+        if self.ttl is None:
+            return 0
+        async with self._session() as session:
+            result = await session.execute(
+                delete(FSMState).where(FSMState.updated_at < datetime.datetime.utcnow() - self.ttl)
+            )
+            await session.commit()
+        if result.rowcount:
+            logging.info(f"Removed {result.rowcount} expired FSM states")
+        return result.rowcount
+
+    async def close(self) -> None:
+        # Write pending changes before the process exits
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        written = await self.flush()
+        logging.info(f"FSM storage closed: {written} pending states written, {self.loads} loads")
+
+def create_fsm_storage() -> BaseStorage:
+    return MemoryStorage() if FSM_STORAGE == 'memory' else SQLStorage()
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, LargeBinary
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, LargeBinary, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.sql.expression import false as sa_false
 import datetime
 
 Base = declarative_base()
@@ -10,6 +11,11 @@ class User(Base):
     telegram_id = Column(Integer, nullable=False, unique=True)
     preferred_currency = Column(String, nullable=False, default='RUB')
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    data_version = Column(Integer, nullable=False, default=0, server_default='0')  # Bumped on every change that affects reports
+    digest_enabled = Column(Boolean, nullable=False, default=False, server_default=sa_false())  # Opt-in monthly digest
+    digest_month = Column(DateTime, nullable=True)  # First day of the last month a digest was delivered for
+    digest_claimed_by = Column(String, nullable=True)  # Digest run sending this user's digest
+    digest_claim_expires_at = Column(DateTime, nullable=True)  # After this, another run may take over
     # User settings and preferences
 
 class Category(Base):
@@ -30,8 +36,33 @@ class Transaction(Base):
     date = Column(DateTime, default=datetime.datetime.utcnow)
     description = Column(String)
     currency = Column(String, nullable=True, default='USD')  # Currency at time of transaction
+    amount_bucket = Column(String(16), nullable=True)  # HMAC of log-scale amount bucket, see services/crypto.py
     # Transaction record (income or expense)
     category = relationship('Category')
+    __table_args__ = (
+        Index('ix_transactions_user_date', 'user_id', 'date'),
+        Index('ix_transactions_user_bucket', 'user_id', 'amount_bucket'),
+        # Ids are never reused (SQLite would restart at max(id) + 1), so they cannot clash with archived rows
+        {'sqlite_autoincrement': True},
+    )
+
+class ArchivedTransaction(Base):
+    __tablename__ = 'transactions_archive'
+    # Same columns and ids as transactions; rows older than ARCHIVE_AFTER_DAYS are moved here by services/archive.py
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    amount = Column(LargeBinary, nullable=False)
+    type = Column(String, nullable=False)
+    category_id = Column(Integer, ForeignKey('categories.id'))
+    date = Column(DateTime)
+    description = Column(String)
+    currency = Column(String, nullable=True)
+    amount_bucket = Column(String(16), nullable=True)
+    archived_at = Column(DateTime, default=datetime.datetime.utcnow)
+    __table_args__ = (
+        Index('ix_transactions_archive_user_date', 'user_id', 'date'),
+        Index('ix_transactions_archive_user_bucket', 'user_id', 'amount_bucket'),
+    )
 
 class Goal(Base):
     __tablename__ = 'goals'
@@ -51,7 +82,13 @@ class Reminder(Base):
     message = Column(String, nullable=False)
     remind_at = Column(DateTime, nullable=False)
     is_active = Column(Boolean, default=True)
+    recurrence = Column(String, nullable=True)  # None for one-shot, see services/recurrence.py
+    claimed_by = Column(String, nullable=True)  # Worker currently delivering the reminder
+    claim_expires_at = Column(DateTime, nullable=True)  # Claim lease, expired claims can be taken over
     # Payment reminder
+    __table_args__ = (
+        Index('ix_reminders_active_due', 'is_active', 'remind_at'),
+    )
 
 class UserCurrency(Base):
     __tablename__ = 'user_currencies'
@@ -59,4 +96,33 @@ class UserCurrency(Base):
     user_id = Column(Integer, nullable=False)
     currency_code = Column(String, nullable=False)
     position = Column(Integer, nullable=False)  # Order position in converter menu
-    # User's preferred currencies for converter 
\ No newline at end of file
+    # User's preferred currencies for converter 
+
+class MonthlyTotal(Base):
+    __tablename__ = 'monthly_totals'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    month = Column(DateTime, nullable=False)  # First day of month
+    type = Column(String, nullable=False)  # income/expense
+    total = Column(LargeBinary, nullable=False)  # Encrypted sum of stored amounts
+    count = Column(Integer, nullable=False, default=0)
+    # Running per-month ledger, updated on every transaction insert
+    __table_args__ = (
+        UniqueConstraint('user_id', 'month', 'type', name='uq_monthly_totals_user_month_type'),
+    )
+
+class TelegramFile(Base):
+    __tablename__ = 'telegram_files'
+    # file_id Telegram returned for uploaded content, so identical charts and reports are re-sent without uploading
+    content_hash = Column(String(64), primary_key=True)  # sha256 of kind, filename and bytes
+    kind = Column(String, nullable=False)  # 'photo' or 'document'
+    file_id = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class FSMState(Base):
+    __tablename__ = 'fsm_states'
+    # aiogram FSM state and data per chat/user (see database/fsm_storage.py)
+    key = Column(String, primary_key=True)  # bot:chat:user:thread:destiny
+    state = Column(String, nullable=True)
+    data = Column(LargeBinary, nullable=True)  # Encrypted JSON
+    updated_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,130 @@
+import database.db as db
+from config import WRITE_BATCH_MAX_ROWS, WRITE_BATCH_MAX_DELAY_MS
+import asyncio
+import logging
+
+class WriteQueue:
+    """Single-writer group commit.
+
+    Callers submit `async def work(session) -> result` callables. One background
+    task collects submissions for up to max_delay seconds or max_batch items,
+    runs them in one session and commits once, then resolves each caller's
+    future with its result. Work may run more than once: if a batch fails,
+    every item is retried in its own transaction so one bad write cannot fail
+    the others.
+    """
+
+    def __init__(self, session_factory=None, max_batch: int = WRITE_BATCH_MAX_ROWS,
+                 max_delay: float = WRITE_BATCH_MAX_DELAY_MS / 1000):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, work):
+        """Queue work and wait until it is committed; returns work's result"""
+        if self._task is None or self._task.done():
+            # Writer starts lazily on the loop of its first caller, outside the caller's unit of work.
+            # Work left in the queue of a writer that stopped would never run: fail it first
+            self._fail_pending([], RuntimeError("Write queue stopped before committing this write"))
+            self._queue = asyncio.Queue()
+            self._task = db.create_background_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((work, future))
+        return await future
+
+    async def _collect(self, batch: list) -> bool:
+        # Fills batch, returns True on the close() sentinel (a None item)
+        item = await self._queue.get()
+        if item is None:
+            return True
+        batch.append(item)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    async def _run(self):
+        closing = False
+        batch = []
+        try:
+            while not closing:
+                batch = []
+                closing = await self._collect(batch)
+                if not batch:
+                    continue
+                try:
+                    await self._commit_batch(batch)
+                except Exception as e:
+                    logging.warning(f"Group commit of {len(batch)} writes failed, retrying one by one: {e}")
+                    for item in batch:
+                        await self._commit_batch([item])
+            batch = []
+        finally:
+            # Cancelled, or closed with work submitted after the sentinel: no caller may wait forever
+            self._fail_pending(batch, RuntimeError("Write queue stopped before committing this write"))
+
+    def _fail_pending(self, batch: list, error: Exception):
+        # Fail the futures of batch and of everything still queued
+        items = list(batch)
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                items.append(item)
+        for _, future in items:
+            # Futures of a loop that already closed have no one waiting on them
+            if not future.done() and not future.get_loop().is_closed():
+                future.set_exception(error)
+        if items:
+            logging.error(f"Write queue stopped with {len(items)} writes not committed")
+
+    async def _commit_batch(self, batch: list):
+        # Raises only for multi-item batches; a single item reports its error to the caller
+        session_factory = self.session_factory or db.AsyncSessionLocal
+        results = []
+        try:
+            async with session_factory() as session:
+                for work, _ in batch:
+                    results.append(await work(session))
+                await session.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                raise
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        # Commit everything queued so far, then stop the writer
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logging.info(f"Write queue closed: {self.items} writes in {self.batches} commits")
+
+# Shared writer for transaction inserts (see services.transaction.add_transaction)
+transaction_writer = WriteQueue()
@@ -3,4 +3,5 @@ from .transaction import router as transaction_router
 from .goal import router as goal_router
 from .reminder import router as reminder_router
 from .converter import router as converter_router
-from .reports import router as reports_router 
\ No newline at end of file
+from .reports import router as reports_router
+from .middleware import UnitOfWorkMiddleware, CommitBeforeRequestMiddleware
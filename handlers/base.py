@@ -22,7 +22,7 @@ async def start_handler(message: types.Message, state: FSMContext):
     """Handle /start command"""
     await state.clear()
     try:
-        user_data = create_or_get_user(message.from_user.id)
+        user_data = await create_or_get_user(message.from_user.id)
         user_name = message.from_user.first_name or "User"
         await message.answer(
             f"👋 Welcome to Financial Bot, {user_name}!\n\n"
@@ -56,6 +56,7 @@ Commands:
 • /set_currency - Change preferred currency
 • /add_category - Add new category
 • /convert - Currency converter
+• /digest - Turn the monthly digest on or off
 
 Features:
 💰 Transactions - Track income and expenses with categories
@@ -38,8 +38,8 @@ async def convert_amount(message: types.Message, state: FSMContext):
     await state.set_state(ConvertState.waiting_for_base)
     
     # Create keyboard with user's preferred currencies
-    user_currency = get_user_currency(message.from_user.id)
-    converter_currencies = get_user_converter_currencies(message.from_user.id)
+    user_currency = await get_user_currency(message.from_user.id)
+    converter_currencies = await get_user_converter_currencies(message.from_user.id)
     
     # Add user's main currency if not in converter currencies
     all_currencies = [user_currency] + [c for c in converter_currencies if c != user_currency]
@@ -79,8 +79,8 @@ async def convert_base(message: types.Message, state: FSMContext):
     await state.set_state(ConvertState.waiting_for_target)
     
     # Create keyboard with user's preferred currencies (exclude source)
-    user_currency = get_user_currency(message.from_user.id)
-    converter_currencies = get_user_converter_currencies(message.from_user.id)
+    user_currency = await get_user_currency(message.from_user.id)
+    converter_currencies = await get_user_converter_currencies(message.from_user.id)
     
     all_currencies = [user_currency] + [c for c in converter_currencies if c != user_currency]
     currencies = [c for c in all_currencies if c != base_currency]
@@ -141,8 +141,8 @@ async def convert_target(message: types.Message, state: FSMContext):
 async def converter_menu(message: types.Message):
     try:
         # Show popular rates based on user's preferred currency and converter settings
-        user_currency = get_user_currency(message.from_user.id)
-        converter_currencies = get_user_converter_currencies(message.from_user.id)
+        user_currency = await get_user_currency(message.from_user.id)
+        converter_currencies = await get_user_converter_currencies(message.from_user.id)
         rates_text = await get_popular_rates(user_currency, converter_currencies)
         kb = types.ReplyKeyboardMarkup(
             keyboard=[
@@ -168,8 +168,8 @@ async def converter_convert_button(message: types.Message, state: FSMContext):
 async def currency_settings_menu(message: types.Message, state: FSMContext):
     """Show currency settings menu"""
     try:
-        user_currency = get_user_currency(message.from_user.id)
-        converter_currencies = get_user_converter_currencies(message.from_user.id)
+        user_currency = await get_user_currency(message.from_user.id)
+        converter_currencies = await get_user_converter_currencies(message.from_user.id)
         
         text = f"⚙️ Currency Settings\n\n"
         text += f"💰 Your main currency: {user_currency}\n"
@@ -195,7 +195,7 @@ async def edit_converter_currencies(message: types.Message, state: FSMContext):
     """Start editing converter currencies"""
     await state.set_state(CurrencySettingsState.waiting_for_currencies)
     
-    current_currencies = get_user_converter_currencies(message.from_user.id)
+    current_currencies = await get_user_converter_currencies(message.from_user.id)
     
     text = (
         f"✏️ Edit Converter Currencies\n\n"
@@ -238,7 +238,7 @@ async def process_converter_currencies(message: types.Message, state: FSMContext
             return
         
         # Remove user's main currency if present
-        user_currency = get_user_currency(message.from_user.id)
+        user_currency = await get_user_currency(message.from_user.id)
         currencies = [c for c in currencies if c != user_currency]
         
         if not currencies:
@@ -246,7 +246,7 @@ async def process_converter_currencies(message: types.Message, state: FSMContext
             return
         
         # Save currencies
-        success = set_user_converter_currencies(message.from_user.id, currencies)
+        success = await set_user_converter_currencies(message.from_user.id, currencies)
         if success:
             await message.answer(
                 f"✅ Converter currencies updated!\n"
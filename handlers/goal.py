@@ -4,7 +4,8 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 from handlers.base import main_menu
 from services.goal import add_goal, get_goals, update_goal_progress, get_goals_with_progress
-from services.user import get_user_currency, format_amount_with_currency
+from services.projection import project_goals
+from services.user import get_user_currency, format_amount_with_currency, format_amount
 from datetime import datetime, timedelta
 import logging
 
@@ -32,7 +33,7 @@ async def goal_name_handler(message: types.Message, state: FSMContext):
     
     await state.update_data(name=name)
     await state.set_state(GoalState.waiting_for_amount)
-    user_currency = get_user_currency(message.from_user.id)
+    user_currency = await get_user_currency(message.from_user.id)
     await message.answer(f"💰 Enter target amount (in {user_currency}):")
 
 @router.message(GoalState.waiting_for_amount, F.text.regexp(r"^\d+(\.\d+)?$"))
@@ -96,7 +97,7 @@ async def goal_deadline_handler(message: types.Message, state: FSMContext):
     
     try:
         data = await state.get_data()
-        goal = add_goal(
+        goal = await add_goal(
             user_id=message.from_user.id,
             name=data['name'],
             target_amount=data['target_amount'],
@@ -104,7 +105,7 @@ async def goal_deadline_handler(message: types.Message, state: FSMContext):
         )
         
         deadline_text = deadline.strftime("%d.%m.%Y") if deadline else "No deadline"
-        amount_str = format_amount_with_currency(data['target_amount'], message.from_user.id)
+        amount_str = await format_amount_with_currency(data['target_amount'], message.from_user.id)
         
         await message.answer(
             f"✅ Goal created successfully!\n\n"
@@ -124,11 +125,14 @@ async def goal_deadline_handler(message: types.Message, state: FSMContext):
 @router.message(Command("goals"))
 async def view_goals(message: types.Message):
     try:
-        goals = get_goals_with_progress(message.from_user.id)
+        goals = await get_goals_with_progress(message.from_user.id)
         if not goals:
             await message.answer("🎯 You don't have any goals yet.\nUse /create_goal to create one!")
             return
         
+        projections = await project_goals(message.from_user.id, goals)
+        user_currency = await get_user_currency(message.from_user.id)
+        
         text = "🎯 Your financial goals:\n\n"
         for i, goal in enumerate(goals, 1):
             progress = (goal.current_amount / goal.target_amount) * 100 if goal.target_amount > 0 else 0
@@ -137,16 +141,25 @@ async def view_goals(message: types.Message):
             status = "✅ Achieved" if goal.achieved else "🔄 In progress"
             deadline_text = goal.deadline.strftime("%d.%m.%Y") if goal.deadline else "No deadline"
             
-            current_str = format_amount_with_currency(goal.current_amount, message.from_user.id)
-            target_str = format_amount_with_currency(goal.target_amount, message.from_user.id)
+            current_str = format_amount(goal.current_amount, user_currency)
+            target_str = format_amount(goal.target_amount, user_currency)
             
             text += (
                 f"{i}. {goal.name}\n"
                 f"💰 {current_str} / {target_str}\n"
                 f"📊 {progress_bar} {progress:.1f}%\n"
                 f"📅 {deadline_text}\n"
-                f"📈 {status}\n\n"
+                f"📈 {status}\n"
             )
+            
+            if goal.id in projections:
+                eta, required_monthly = projections[goal.id]
+                eta_text = eta.strftime("%m.%Y") if eta else "not at current savings rate"
+                text += f"⏳ Projected: {eta_text}\n"
+                if required_monthly is not None:
+                    required_str = format_amount(required_monthly, user_currency)
+                    text += f"💵 Needed: {required_str} / month\n"
+            text += "\n"
         
         await message.answer(text)
         
@@ -157,7 +170,7 @@ async def view_goals(message: types.Message):
 @router.message(lambda m: m.text == "🎯 Goals")
 async def goals_menu(message: types.Message):
     try:
-        goals = get_goals(message.from_user.id)
+        goals = await get_goals(message.from_user.id)
         kb = types.ReplyKeyboardMarkup(
             keyboard=[
                 [types.KeyboardButton(text="Create Goal")],
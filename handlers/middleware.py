@@ -0,0 +1,21 @@
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from database.db import unit_of_work, commit_current
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """Run each update in one unit of work: services share a session, committed before Telegram calls and at the end"""
+
+    async def __call__(self, handler, event, data):
+        async with unit_of_work():
+            return await handler(event, data)
+
+class CommitBeforeRequestMiddleware(BaseRequestMiddleware):
+    """Commit the update's unit of work before each Telegram API call.
+
+    Writes made so far become durable before the user is told about them, and
+    no SQLite write lock or pooled connection is held while Telegram answers.
+    """
+
+    async def __call__(self, make_request, bot, method):
+        await commit_current()
+        return await make_request(bot, method)
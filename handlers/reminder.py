@@ -4,6 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 from handlers.base import main_menu
 from services.reminder import add_reminder, get_active_reminders, delete_reminder
+from services.recurrence import make_rule, rule_label, DAILY, WEEKLY, MONTHLY
 from datetime import datetime, timedelta
 import logging
 
@@ -12,6 +13,15 @@ router = Router()
 class ReminderState(StatesGroup):
     waiting_for_message = State()
     waiting_for_datetime = State()
+    waiting_for_recurrence = State()
+
+# Repeat options shown after the first reminder time is chosen
+RECURRENCE_OPTIONS = {
+    "Once": None,
+    "Every day": DAILY,
+    "Every week": WEEKLY,
+    "Every month": MONTHLY,
+}
 
 @router.message(Command("add_reminder"))
 async def add_reminder_start(message: types.Message, state: FSMContext):
@@ -76,12 +86,39 @@ async def reminder_datetime_handler(message: types.Message, state: FSMContext):
             await message.answer("❌ Invalid format. Use DD.MM.YYYY HH:MM (e.g., 31.12.2024 15:30):")
             return
     
+    await state.update_data(remind_at=remind_at.isoformat())
+    await state.set_state(ReminderState.waiting_for_recurrence)
+    kb = types.ReplyKeyboardMarkup(
+        keyboard=[
+            [types.KeyboardButton(text="Once"), types.KeyboardButton(text="Every day")],
+            [types.KeyboardButton(text="Every week"), types.KeyboardButton(text="Every month")],
+            [types.KeyboardButton(text="Cancel")]
+        ],
+        resize_keyboard=True
+    )
+    await message.answer("🔁 Repeat this reminder?", reply_markup=kb)
+
+@router.message(ReminderState.waiting_for_recurrence)
+async def reminder_recurrence_handler(message: types.Message, state: FSMContext):
+    if message.text == "Cancel":
+        await state.clear()
+        await message.answer("❌ Reminder creation cancelled", reply_markup=main_menu)
+        return
+    
+    if message.text not in RECURRENCE_OPTIONS:
+        await message.answer("Choose an option from the buttons.")
+        return
+    
     try:
         data = await state.get_data()
-        reminder = add_reminder(
+        remind_at = datetime.fromisoformat(data['remind_at'])
+        kind = RECURRENCE_OPTIONS[message.text]
+        recurrence = make_rule(kind, remind_at) if kind else None
+        reminder = await add_reminder(
             user_id=message.from_user.id,
             message=data['reminder_message'],
-            remind_at=remind_at
+            remind_at=remind_at,
+            recurrence=recurrence
         )
         
         time_str = remind_at.strftime("%d.%m.%Y at %H:%M")
@@ -96,11 +133,13 @@ async def reminder_datetime_handler(message: types.Message, state: FSMContext):
             minutes = time_diff.seconds // 60
             time_until = f"in {minutes} minutes"
         
+        repeat_text = f"\n🔁 Repeats: {rule_label(recurrence)}" if recurrence else ""
         await message.answer(
             f"✅ Reminder set successfully!\n\n"
             f"⏰ Message: {data['reminder_message']}\n"
             f"📅 Date: {time_str}\n"
-            f"⏳ Time until reminder: {time_until}",
+            f"⏳ Time until reminder: {time_until}"
+            f"{repeat_text}",
             reply_markup=main_menu
         )
         await state.clear()
@@ -113,7 +152,7 @@ async def reminder_datetime_handler(message: types.Message, state: FSMContext):
 @router.message(Command("reminders"))
 async def view_reminders(message: types.Message):
     try:
-        reminders = get_active_reminders(message.from_user.id)
+        reminders = await get_active_reminders(message.from_user.id)
         if not reminders:
             await message.answer("⏰ You don't have any active reminders.\nUse /add_reminder to create one!")
             return
@@ -121,7 +160,7 @@ async def view_reminders(message: types.Message):
         text = "⏰ Your active reminders:\n\n"
         for i, reminder in enumerate(reminders, 1):
             # Calculate time until reminder
-            now = datetime.datetime.now()
+            now = datetime.now()
             time_until = reminder.remind_at - now
             
             if time_until.total_seconds() > 0:
@@ -131,10 +170,12 @@ async def view_reminders(message: types.Message):
             else:
                 time_str = "Overdue"
             
+            repeat_text = f"🔁 {rule_label(reminder.recurrence)}\n" if reminder.recurrence else ""
             text += (
                 f"{i}. {reminder.message}\n"
                 f"📅 {reminder.remind_at.strftime('%d.%m.%Y %H:%M')}\n"
-                f"⏳ {time_str}\n\n"
+                f"⏳ {time_str}\n"
+                f"{repeat_text}\n"
             )
         
         await message.answer(text)
@@ -146,7 +187,7 @@ async def view_reminders(message: types.Message):
 @router.message(lambda m: m.text == "⏰ Reminders")
 async def reminders_menu(message: types.Message):
     try:
-        reminders = get_active_reminders(message.from_user.id)
+        reminders = await get_active_reminders(message.from_user.id)
         kb = types.ReplyKeyboardMarkup(
             keyboard=[
                 [types.KeyboardButton(text="Add Reminder")],
@@ -1,52 +1,141 @@
 from aiogram import Router, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from handlers.base import main_menu
 from reports.export import export_pdf, export_excel
-from aiogram.types import BufferedInputFile
+from reports.stream import export_stream
+from reports.jobs import report_jobs
+from services.digest import is_digest_enabled, set_digest_enabled
+from services.telegram_files import send_cached_file
+import asyncio
 import logging
 import os
+import time
 
 router = Router()
 
-@router.message(Command("export_pdf"))
-async def export_pdf_command(message: types.Message):
+# Telegram rate-limits message edits; row counts are shown at most this often
+PROGRESS_EDIT_INTERVAL = 2.0
+
+class _Progress:
+    """Status message of one export job, edited as the job advances"""
+
+    def __init__(self, message: types.Message):
+        self.message = message
+        self._last_edit = 0.0
+
+    async def update(self, text: str, throttle: bool = False):
+        now = time.monotonic()
+        if throttle and now - self._last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+        self._last_edit = now
+        try:
+            await self.message.edit_text(text)
+        except TelegramBadRequest:
+            pass  # Same text or message deleted by the user
+
+async def _queue_export(message: types.Message, fmt: str, title: str, run):
+    """Queue `run(message, progress)` as a background report job and return right away.
+
+    Generation and upload happen in the report job queue (reports/jobs.py), so
+    handlers never wait for an export; a second request for the same format is
+    refused while the first is still queued or running.
+    """
+    user_id = message.from_user.id
+    status = await message.answer(f"⏳ {title} export queued...")
+    progress = _Progress(status)
+
+    async def job():
+        try:
+            await progress.update(f"⚙️ Generating {title} export...")
+            await run(message, progress)
+        except ValueError as e:
+            await progress.update(f"❌ {e}")
+        except Exception as e:
+            logging.error(f"Error generating {fmt} export for user {user_id}: {e}")
+            await progress.update(f"❌ Error generating {title} export. Please try again.")
+
     try:
-        await message.answer("📄 Generating PDF report...")
-        
-        pdf_buffer = export_pdf(message.from_user.id)
-        if not pdf_buffer:
-            await message.answer("❌ No data available for report generation.")
+        position = report_jobs.submit((user_id, fmt), job)
+    except asyncio.QueueFull:
+        await progress.update("❌ Too many exports are being prepared right now. Please try again later.")
+        return
+    if position is None:
+        await progress.update(f"⏳ Your {title} export is already being prepared.")
+    elif position:
+        await progress.update(f"⏳ {title} export queued, position {position}...")
+
+async def _run_pdf(message: types.Message, progress: _Progress):
+    pdf_buffer = await export_pdf(message.from_user.id)
+    if not pdf_buffer:
+        await progress.update("❌ No data available for report generation.")
+        return
+    
+    await progress.update("📤 Uploading PDF report...")
+    # Send PDF file (cached reports are re-sent by file_id)
+    await send_cached_file(
+        message, 'document', pdf_buffer.read(), "financial_report.pdf",
+        caption="📄 Your Financial Report\n\nHere's your complete financial overview in PDF format."
+    )
+    await progress.update("✅ PDF report ready.")
+
+async def _run_excel(message: types.Message, progress: _Progress):
+    excel_buffer = await export_excel(message.from_user.id)
+    if not excel_buffer:
+        await progress.update("❌ No data available for report generation.")
+        return
+    
+    await progress.update("📤 Uploading Excel report...")
+    # Send Excel file (cached reports are re-sent by file_id)
+    await send_cached_file(
+        message, 'document', excel_buffer.read(), "financial_report.xlsx",
+        caption="📊 Your Financial Report\n\nHere's your complete financial data in Excel format."
+    )
+    await progress.update("✅ Excel report ready.")
+
+def _run_stream(fmt: str, title: str):
+    async def run(message: types.Message, progress: _Progress):
+        async def rows_written(rows: int):
+            await progress.update(f"⚙️ Generating {title} export... {rows} transactions", throttle=True)
+
+        file, stats = await export_stream(message.from_user.id, fmt, progress=rows_written)
+        if not file:
+            await progress.update("❌ No data available for report generation.")
             return
         
-        # Send PDF file
+        await progress.update(f"📤 Uploading {title} export...")
         await message.answer_document(
-            document=BufferedInputFile(pdf_buffer.read(), filename="financial_report.pdf"),
-            caption="📄 Your Financial Report\n\nHere's your complete financial overview in PDF format."
+            document=file,
+            caption=f"🗂 Your transactions ({title})\n\n{stats['rows']} transactions, full history."
         )
-            
-    except Exception as e:
-        logging.error(f"Error generating PDF report for user {message.from_user.id}: {e}")
-        await message.answer("❌ Error generating PDF report. Please try again.")
+        await progress.update(f"✅ {title} export ready.")
+    return run
+
+@router.message(Command("export_pdf"))
+async def export_pdf_command(message: types.Message):
+    await _queue_export(message, 'pdf', "PDF", _run_pdf)
 
 @router.message(Command("export_excel"))
 async def export_excel_command(message: types.Message):
-    try:
-        await message.answer("📊 Generating Excel report...")
-        
-        excel_buffer = export_excel(message.from_user.id)
-        if not excel_buffer:
-            await message.answer("❌ No data available for report generation.")
-            return
-        
-        # Send Excel file
-        await message.answer_document(
-            document=BufferedInputFile(excel_buffer.read(), filename="financial_report.xlsx"),
-            caption="📊 Your Financial Report\n\nHere's your complete financial data in Excel format."
-        )
-            
-    except Exception as e:
-        logging.error(f"Error generating Excel report for user {message.from_user.id}: {e}")
-        await message.answer("❌ Error generating Excel report. Please try again.")
+    await _queue_export(message, 'excel', "Excel", _run_excel)
+
+@router.message(Command("export_csv"))
+async def export_csv_command(message: types.Message):
+    await _queue_export(message, 'csv', "CSV", _run_stream('csv', "CSV"))
+
+@router.message(Command("export_parquet"))
+async def export_parquet_command(message: types.Message):
+    await _queue_export(message, 'parquet', "Parquet", _run_stream('parquet', "Parquet"))
+
+@router.message(Command("digest"))
+async def digest_command(message: types.Message):
+    # Toggle the opt-in monthly digest (services/digest.py)
+    enabled = not await is_digest_enabled(message.from_user.id)
+    await set_digest_enabled(message.from_user.id, enabled)
+    if enabled:
+        await message.answer("📅 Monthly digest enabled. You'll get last month's summary on the 1st of every month.\n\nSend /digest again to turn it off.")
+    else:
+        await message.answer("📅 Monthly digest disabled.")
 
 @router.message(lambda m: m.text == "📋 Reports")
 async def reports_menu(message: types.Message):
@@ -54,6 +143,7 @@ async def reports_menu(message: types.Message):
         keyboard=[
             [types.KeyboardButton(text="📄 PDF Report")],
             [types.KeyboardButton(text="📊 Excel Report")],
+            [types.KeyboardButton(text="🗂 CSV Export"), types.KeyboardButton(text="🗂 Parquet Export")],
             [types.KeyboardButton(text="Back")]
         ],
         resize_keyboard=True
@@ -68,6 +158,14 @@ async def pdf_report_button(message: types.Message):
 async def excel_report_button(message: types.Message):
     await export_excel_command(message)
 
+@router.message(lambda m: m.text == "🗂 CSV Export")
+async def csv_export_button(message: types.Message):
+    await export_csv_command(message)
+
+@router.message(lambda m: m.text == "🗂 Parquet Export")
+async def parquet_export_button(message: types.Message):
+    await export_parquet_command(message)
+
 @router.message(lambda m: m.text == "Back")
 async def back_to_main_reports(message: types.Message):
     await message.answer("🏠 Main Menu:", reply_markup=main_menu) 
\ No newline at end of file
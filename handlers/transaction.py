@@ -2,11 +2,11 @@ from aiogram import Router, types, F
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from services.transaction import get_categories, add_transaction, get_last_transactions, get_expense_stats_last_month, add_category
-from services.user import get_user_currency, format_amount_with_currency, set_user_currency, SUPPORTED_CURRENCIES
+from services.user import get_user_currency, format_amount_with_currency, format_amount, set_user_currency, SUPPORTED_CURRENCIES
 from database.models import Category
 from aiogram.filters import Command
 from handlers.base import main_menu
-from aiogram.types import BufferedInputFile
+from services.telegram_files import send_cached_file
 import logging
 
 router = Router()
@@ -50,7 +50,7 @@ async def process_amount(message: types.Message, state: FSMContext):
     transaction_type = data["type"]
     
     # Get categories by type
-    categories = get_categories(message.from_user.id, transaction_type)
+    categories = await get_categories(message.from_user.id, transaction_type)
     if not categories:
         await message.answer(f"❌ No {transaction_type} categories found. Please create one first using /add_category", reply_markup=main_menu)
         await state.clear()
@@ -79,7 +79,7 @@ async def process_category(message: types.Message, state: FSMContext):
     try:
         data = await state.get_data()
         transaction_type = data["type"]
-        categories = get_categories(message.from_user.id, transaction_type)
+        categories = await get_categories(message.from_user.id, transaction_type)
         category_names = [c.name for c in categories]
         
         if message.text not in category_names:
@@ -87,14 +87,14 @@ async def process_category(message: types.Message, state: FSMContext):
             return
         category_id = next(c.id for c in categories if c.name == message.text)
         
-        add_transaction(
+        await add_transaction(
             user_id=message.from_user.id,
             amount=data["amount"], 
             type_=data["type"], 
             category_id=category_id
         )
         transaction_type_text = "income" if data["type"] == "income" else "expense"
-        amount_str = format_amount_with_currency(data["amount"], message.from_user.id)
+        amount_str = await format_amount_with_currency(data["amount"], message.from_user.id)
         await message.answer(f"✅ {transaction_type_text.capitalize()} {amount_str} in category '{message.text}' saved!", reply_markup=main_menu)
         await state.clear()
     except Exception as e:
@@ -105,16 +105,15 @@ async def process_category(message: types.Message, state: FSMContext):
 @router.message(Command("view_transactions"))
 async def view_transactions(message: types.Message):
     try:
-        transactions = get_last_transactions(message.from_user.id)
+        transactions = await get_last_transactions(message.from_user.id)
         if not transactions:
             await message.answer("📊 You have no transactions yet.")
             return
         lines = ["📊 Your recent transactions:\n"]
         for t in transactions:
-            cat = t.category.name if t.category else "No category"
             emoji = "💰" if t.type == "income" else "💸"
-            amount_str = format_amount_with_currency(t.amount, message.from_user.id)
-            lines.append(f"{emoji} {t.date.strftime('%d.%m %H:%M')} | {cat} | {amount_str}")
+            amount_str = format_amount(t.amount, t.currency)
+            lines.append(f"{emoji} {t.date.strftime('%d.%m %H:%M')} | {t.category} | {amount_str}")
         await message.answer("\n".join(lines))
     except Exception as e:
         logging.error(f"Error viewing transactions for user {message.from_user.id}: {e}")
@@ -123,22 +122,21 @@ async def view_transactions(message: types.Message):
 @router.message(Command("stats"))
 async def stats(message: types.Message):
     try:
-        stats_data, buf = get_expense_stats_last_month(message.from_user.id)
+        stats_data, buf = await get_expense_stats_last_month(message.from_user.id)
         if stats_data is None:
             await message.answer("📊 No expenses in the last month.")
             return
+        user_currency = await get_user_currency(message.from_user.id)
         text = "📊 Monthly expense statistics by category:\n\n"
         total = sum(stats_data.values())
         for cat, amount in stats_data.items():
             percentage = (amount / total) * 100
-            amount_str = format_amount_with_currency(amount, message.from_user.id)
+            amount_str = format_amount(amount, user_currency)
             text += f"• {cat}: {amount_str} ({percentage:.1f}%)\n"
-        total_str = format_amount_with_currency(total, message.from_user.id)
+        total_str = format_amount(total, user_currency)
         text += f"\n💸 Total expenses: {total_str}"
-        await message.answer_photo(
-            photo=BufferedInputFile(buf.read(), filename="stats.png"), 
-            caption=text
-        )
+        # Unchanged stats produce the same PNG, which is then re-sent by file_id
+        await send_cached_file(message, 'photo', buf.read(), "stats.png", caption=text)
     except Exception as e:
         logging.error(f"Error generating stats for user {message.from_user.id}: {e}")
         await message.answer("❌ Error creating statistics.")
@@ -158,7 +156,7 @@ async def set_currency_start(message: types.Message, state: FSMContext):
         ],
         resize_keyboard=True
     )
-    current_currency = get_user_currency(message.from_user.id)
+    current_currency = await get_user_currency(message.from_user.id)
     await message.answer(f"💱 Current currency: {current_currency}\nSelect new preferred currency:", reply_markup=kb)
 
 @router.message(CurrencyState.waiting_for_currency)
@@ -186,7 +184,7 @@ async def set_currency_process(message: types.Message, state: FSMContext):
         return
     
     try:
-        success = set_user_currency(message.from_user.id, currency)
+        success = await set_user_currency(message.from_user.id, currency)
         if success:
             await message.answer(f"✅ Currency changed to {currency}!", reply_markup=main_menu)
         else:
@@ -247,7 +245,7 @@ async def add_category_name(message: types.Message, state: FSMContext):
     
     try:
         data = await state.get_data()
-        add_category(message.from_user.id, name, data["type"])
+        await add_category(message.from_user.id, name, data["type"])
         type_emoji = "💰" if data["type"] == "income" else "💸"
         await message.answer(f"✅ {type_emoji} Category '{name}' added!", reply_markup=main_menu)
     except ValueError as e:
@@ -284,7 +282,7 @@ async def categories_menu(message: types.Message):
             ], 
             resize_keyboard=True
         )
-        current_currency = get_user_currency(message.from_user.id)
+        current_currency = await get_user_currency(message.from_user.id)
         await message.answer(f"📝 Category Management\n💱 Current currency: {current_currency}", reply_markup=kb)
     except Exception as e:
         logging.error(f"Error showing categories menu for user {message.from_user.id}: {e}")
@@ -301,8 +299,8 @@ async def add_category_button(message: types.Message, state: FSMContext):
 @router.message(lambda m: m.text == "My Categories")
 async def show_categories(message: types.Message):
     try:
-        income_categories = get_categories(message.from_user.id, "income")
-        expense_categories = get_categories(message.from_user.id, "expense")
+        income_categories = await get_categories(message.from_user.id, "income")
+        expense_categories = await get_categories(message.from_user.id, "expense")
         
         text = "📝 Your categories:\n\n"
         if income_categories:
@@ -1,14 +1,23 @@
 # Entry point for the Telegram bot
 
 from aiogram import Bot, Dispatcher
+from aiohttp import web
 import asyncio
-from config import BOT_TOKEN
-from handlers import base_router, transaction_router, goal_router, reminder_router, converter_router, reports_router
+from config import BOT_TOKEN, BOT_MODE, WEBHOOK_HOST, WEBHOOK_PORT
+from handlers import base_router, transaction_router, goal_router, reminder_router, converter_router, reports_router, UnitOfWorkMiddleware, CommitBeforeRequestMiddleware
 from services.scheduler import setup_scheduler
 from database.db import init_db
+from database.write_queue import transaction_writer
+from database.fsm_storage import create_fsm_storage
+from reports.workers import shutdown_report_pool
+from reports.jobs import report_jobs
+from services.warmup import start_warm_up
+from webhook import create_webhook_app
 import logging
 
+# force: module-level log calls during the imports above may already have installed a default handler
 logging.basicConfig(
+    force=True,
     level=logging.INFO,
     format='%(asctime)s %(levelname)s %(name)s %(message)s',
     handlers=[
@@ -17,23 +26,59 @@ logging.basicConfig(
     ]
 )
 
-async def main():
-    # Initialize database
-    init_db()
-    logging.info("Database initialized")
-    
+def create_bot() -> Bot:
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    # Each update's writes are committed before the bot talks to Telegram
+    bot.session.middleware(CommitBeforeRequestMiddleware())
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    # FSM state survives restarts (FSM_STORAGE=sql); the dispatcher writes it back on shutdown
+    dp = Dispatcher(storage=create_fsm_storage())
+    # One database session and commit per update
+    dp.update.middleware(UnitOfWorkMiddleware())
     dp.include_router(base_router)
     dp.include_router(transaction_router)
     dp.include_router(goal_router)
     dp.include_router(reminder_router)
     dp.include_router(converter_router)
     dp.include_router(reports_router)
-    setup_scheduler(bot)
+    # pandas, openpyxl and the report workers load in the background, not before the first update
+    dp.startup.register(start_warm_up)
+    # Commit queued transaction inserts before the process exits
+    dp.shutdown.register(transaction_writer.close)
+    dp.shutdown.register(report_jobs.close)
+    dp.shutdown.register(shutdown_report_pool)
+    return dp
+
+async def main():
+    # Initialize database
+    init_db()
+    logging.info("Database initialized")
+    
+    bot = create_bot()
+    dp = create_dispatcher()
+    await setup_scheduler(bot)
     
     logging.info("Bot started")
     await dp.start_polling(bot)
 
+def run_webhook():
+    # Serve updates over HTTP; SIGINT/SIGTERM stop accepting, drain in-flight updates, then shut down
+    init_db()
+    logging.info("Database initialized")
+    
+    bot = create_bot()
+    dp = create_dispatcher()
+    # The scheduler needs the server's event loop, so it starts with the app
+    dp.startup.register(setup_scheduler)
+    app = create_webhook_app(bot, dp)
+    
+    logging.info(f"Bot started (webhook) on {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, print=None)
+
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    if BOT_MODE == 'webhook':
+        run_webhook()
+    else:
+        asyncio.run(main()) 
\ No newline at end of file
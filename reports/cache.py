@@ -0,0 +1,141 @@
+from services.user import get_data_version
+from reports.workers import run_in_report_pool
+from config import REPORT_CACHE_MAX_BYTES, REPORT_CACHE_DIR, CHART_CACHE_MAX_BYTES
+from collections import OrderedDict
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import tempfile
+
+class ReportCache:
+    """Rendered reports keyed by (user, format, data version).
+
+    A version bump (new transaction, currency change) makes old entries
+    unreachable, so nothing has to be invalidated explicitly. Memory tier is an
+    LRU bounded by total bytes; the optional disk tier keeps only the latest
+    version of each (user, format) report.
+    """
+
+    def __init__(self, max_bytes: int = REPORT_CACHE_MAX_BYTES, directory: str = REPORT_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_id: int, fmt: str, version: int) -> str:
+        return os.path.join(self.directory, f"{user_id}_{fmt}_{version}.bin")
+
+    def get(self, user_id: int, fmt: str, version: int):
+        # Memory tier only
+        key = (user_id, fmt, version)
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, user_id: int, fmt: str, version: int, data: bytes):
+        # Memory tier only
+        self._remember((user_id, fmt, version), data)
+
+    def _read_disk(self, user_id: int, fmt: str, version: int):
+        try:
+            with open(self._path(user_id, fmt, version), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, user_id: int, fmt: str, version: int, data: bytes):
+        # Older versions of this report can never be requested again
+        prefix = f"{user_id}_{fmt}_"
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix):
+                os.remove(os.path.join(self.directory, name))
+        # Written to a temp file and renamed, so a crash mid-write never leaves a truncated report behind
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(user_id, fmt, version))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _remember(self, key, data: bytes):
+        # Reports larger than the whole memory budget only go to disk
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def get_or_build(self, user_id: int, fmt: str, build):
+        """Return cached report bytes as BytesIO, or `await build(user_id)` (BytesIO or None) and cache it"""
+        version = await get_data_version(user_id)
+        if version is not None:
+            data = self.get(user_id, fmt, version)
+            if data is None and self.directory:
+                data = await asyncio.to_thread(self._read_disk, user_id, fmt, version)
+                if data is not None:
+                    self.put(user_id, fmt, version, data)
+            if data is not None:
+                self.hits += 1
+                logging.info(f"Report cache hit: user_id={user_id}, format={fmt}, version={version}")
+                return io.BytesIO(data)
+        self.misses += 1
+        buf = await build(user_id)
+        if buf is not None and version is not None:
+            data = buf.getvalue()
+            self.put(user_id, fmt, version, data)
+            if self.directory:
+                await asyncio.to_thread(self._write_disk, user_id, fmt, version, data)
+        return buf
+
+report_cache = ReportCache()
+
+class ChartCache:
+    """Rendered charts keyed by a hash of the renderer and its arguments.
+
+    Same data gives the same key, so an unchanged /stats chart is served from
+    memory (and, being byte-identical, re-sent by file_id). LRU bounded by total bytes.
+    """
+
+    def __init__(self, max_bytes: int = CHART_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(fn, args) -> str:
+        return hashlib.sha256(repr((fn.__module__, fn.__qualname__, args)).encode()).hexdigest()
+
+    async def get_or_render(self, fn, *args) -> bytes:
+        """Return cached bytes for fn(*args), or render them in a report worker process and cache them"""
+        key = self.key(fn, args)
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = await run_in_report_pool(fn, *args)
+        if len(data) <= self.max_bytes:
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return data
+
+chart_cache = ChartCache()
@@ -0,0 +1,57 @@
+from config import PIE_CHART_BACKEND, BAR_CHART_BACKEND
+import importlib.util
+import io
+
+# Chart renderers for report worker processes (reports/workers.py). Each chart
+# type uses its configured backend: 'pillow' (reports/pillow_charts.py, fast and
+# light) or 'matplotlib' (object-oriented Figure API, no pyplot global state).
+# Charts the Pillow backend cannot lay out legibly fall back to matplotlib.
+# Backends are imported on first use, so a worker drawing with Pillow never loads matplotlib.
+
+# More slices or bars than this overlap their labels in the simple Pillow layout
+PILLOW_MAX_ITEMS = 12
+
+def _use_pillow(backend: str, labels: list) -> bool:
+    # Checks that Pillow is installed without importing it
+    return backend == 'pillow' and len(labels) <= PILLOW_MAX_ITEMS and importlib.util.find_spec("PIL") is not None
+
+def _figure_png(fig, dpi: int) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+    return buf.getvalue()
+
+def render_pie_chart(labels: list, amounts: list, title: str, dpi: int = 100) -> bytes:
+    """Pie chart of amounts by label as PNG bytes"""
+    if _use_pillow(PIE_CHART_BACKEND, labels):
+        from reports.pillow_charts import render_pie
+        return render_pie(labels, amounts, title, dpi)
+
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    wedges, texts, autotexts = ax.pie(
+        amounts,
+        labels=labels,
+        autopct='%1.1f%%',
+        startangle=90
+    )
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+    return _figure_png(fig, dpi)
+
+def render_bar_chart(labels: list, values: list, title: str, dpi: int = 100) -> bytes:
+    """Bar chart of values by label as PNG bytes"""
+    if _use_pillow(BAR_CHART_BACKEND, labels):
+        from reports.pillow_charts import render_bar
+        return render_bar(labels, values, title, dpi)
+
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    bars = ax.bar(range(len(values)), values, color=[f"C{i % 10}" for i in range(len(values))])
+    ax.bar_label(bars, labels=[f"{v:,.2f}" for v in values], fontweight='bold')
+    ax.set_xticks(range(len(labels)), labels, rotation=30 if len(labels) > 6 else 0, ha='right' if len(labels) > 6 else 'center')
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    return _figure_png(fig, dpi)
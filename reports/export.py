@@ -1,138 +1,101 @@
-from services.transaction import get_last_transactions
+from services.transaction import iter_transaction_rows, get_text_column_lengths, get_conversion_rates
 from services.user import get_user_currency, format_amount_with_currency
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfutils
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-import openpyxl
+from reports.workers import run_in_report_pool
+from reports.cache import report_cache
+import asyncio
 import io
-from sqlalchemy.orm import joinedload
-import datetime
 import os
 
-def export_pdf(user_id: int, limit: int = 100):
-    # Export last transactions to PDF for specific user
+async def export_pdf(user_id: int):
+    """Export full transaction history to PDF for specific user (cached until the user's data changes).
+
+    Rendering streams rows from the database inside a report worker process,
+    so large histories never block the event loop; returns None if there is no data.
+    """
+    return await report_cache.get_or_build(user_id, 'pdf', _render_pdf)
+
+async def _render_pdf(user_id: int):
     try:
-        txs = get_last_transactions(user_id, limit)
-        if not txs:
-            return None
-        
-        user_currency = get_user_currency(user_id)
-        
-        buf = io.BytesIO()
-        c = canvas.Canvas(buf, pagesize=A4)
-        width, height = A4
-        
-        # Header
-        y = height - 40
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(40, y, "Financial Report")
-        
-        y -= 25
-        c.setFont("Helvetica", 10)
-        c.drawString(40, y, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        c.drawString(40, y-15, f"Total transactions: {len(txs)}")
-        c.drawString(40, y-30, f"Currency: {user_currency}")
-        
-        # Table header
-        y -= 60
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(40, y, "Date")
-        c.drawString(120, y, "Category")
-        c.drawString(220, y, "Type")
-        c.drawString(280, y, f"Amount ({user_currency})")
-        
-        # Draw line
-        y -= 5
-        c.line(40, y, 450, y)
-        
-        # Transactions
-        y -= 15
-        c.setFont("Helvetica", 9)
-        total_income = 0
-        total_expense = 0
-        
-        for t in txs:
-            if y < 60:  # New page
-                c.showPage()
-                y = height - 40
-                
-            cat = t.category.name if t.category else "No category"
-            type_str = "Income" if t.type == "income" else "Expense"
-            amount = float(t.amount)
-            
-            if t.type == "income":
-                total_income += amount
-            else:
-                total_expense += amount
-            
-            c.drawString(40, y, t.date.strftime('%d.%m.%Y'))
-            c.drawString(120, y, cat[:12])
-            c.drawString(220, y, type_str)
-            c.drawString(280, y, f"{amount:,.2f}")
-            y -= 12
-        
-        # Summary
-        y -= 20
-        c.line(40, y, 450, y)
-        y -= 15
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(40, y, f"Total Income: {total_income:,.2f} {user_currency}")
-        c.drawString(250, y, f"Total Expense: {total_expense:,.2f} {user_currency}")
-        c.drawString(40, y-15, f"Balance: {total_income - total_expense:,.2f} {user_currency}")
-        
-        c.save()
-        buf.seek(0)
-        return buf
+        currency, rates = await get_conversion_rates(user_id)
+        # By name, so reportlab is only ever imported by the workers
+        pdf = await run_in_report_pool('reports.pdf:render_history_pdf', user_id, currency, rates)
+        return io.BytesIO(pdf) if pdf else None
     except Exception as e:
         print(f"Error generating PDF: {e}")
         return None
 
-def export_excel(user_id: int, limit: int = 100):
-    # Export last transactions to Excel for specific user
+def _column_width(max_length: int) -> int:
+    return min(max_length + 2, 50)
+
+async def export_excel(user_id: int):
+    """Export full transaction history to Excel for specific user (cached until the user's data changes)"""
+    return await report_cache.get_or_build(user_id, 'excel', _render_excel)
+
+async def _render_excel(user_id: int):
+    """Build the Excel export.
+
+    Rows are streamed page by page into a write-only workbook, so memory does
+    not grow with history size. Write-only sheets need column widths before the
+    first row, so they come from the longest values in the database
+    (category, description) and the fixed formats of the other columns.
+    """
+    # Heavy; loaded on first use (or by the startup warm-up, see services/warmup.py)
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
     try:
-        txs = get_last_transactions(user_id, limit)
-        if not txs:
-            return None
-        
-        user_currency = get_user_currency(user_id)
+        user_currency = await get_user_currency(user_id)
+        lengths = await get_text_column_lengths(user_id)
         
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Transactions"
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Transactions")
         
-        # Headers
         headers = ["Date", "Category", "Type", f"Amount ({user_currency})", "Description"]
-        ws.append(headers)
+        widths = [
+            len("00.00.0000 00:00"),
+            max(lengths['category'], len("No category"), len("Expenses:")),
+            len("Expense"),
+            max(len(headers[3]), len("-1,000,000,000.00")),
+            max(lengths['description'], len(headers[4])),
+        ]
+        for letter, width in zip("ABCDE", widths):
+            ws.column_dimensions[letter].width = _column_width(width)
         
         # Style header
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(row=1, column=col)
-            cell.font = openpyxl.styles.Font(bold=True)
-            cell.fill = openpyxl.styles.PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        header_font = openpyxl.styles.Font(bold=True)
+        header_fill = openpyxl.styles.PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            header_cells.append(cell)
+        ws.append(header_cells)
         
         # Data
         total_income = 0
         total_expense = 0
+        count = 0
         
-        for t in txs:
-            cat = t.category.name if t.category else "No category"
-            type_str = "Income" if t.type == "income" else "Expense"
-            amount = float(t.amount)
-            
-            if t.type == "income":
-                total_income += amount
-            else:
-                total_expense += amount
-            
-            ws.append([
-                t.date.strftime('%d.%m.%Y %H:%M'),
-                cat,
-                type_str,
-                amount,
-                t.description or ""
-            ])
+        async for batch in iter_transaction_rows(user_id):
+            for t in batch:
+                type_str = "Income" if t.type == "income" else "Expense"
+                amount = t.amount
+                
+                if t.type == "income":
+                    total_income += amount
+                else:
+                    total_expense += amount
+                
+                ws.append([
+                    t.date.strftime('%d.%m.%Y %H:%M') if t.date else "",
+                    t.category,
+                    type_str,
+                    amount,
+                    t.description or ""
+                ])
+            count += len(batch)
+        if not count:
+            return None
         
         # Summary
         ws.append([])
@@ -141,23 +104,11 @@ def export_excel(user_id: int, limit: int = 100):
         ws.append(["Expenses:", "", "", total_expense, ""])
         ws.append(["Balance:", "", "", total_income - total_expense, ""])
         
-        # Auto-adjust column widths
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column].width = adjusted_width
-        
+        # Zipping the sheet is CPU bound, keep it off the event loop
         buf = io.BytesIO()
-        wb.save(buf)
+        await asyncio.to_thread(wb.save, buf)
         buf.seek(0)
         return buf
     except Exception as e:
         print(f"Error generating Excel: {e}")
-        return None 
\ No newline at end of file
+        return None
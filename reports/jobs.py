@@ -0,0 +1,75 @@
+from database.db import create_background_task
+from config import REPORT_JOB_CONCURRENCY, REPORT_JOB_MAX_PENDING
+import asyncio
+import logging
+
+class ReportJobQueue:
+    """Bounded background queue for report generation.
+
+    Handlers submit `async def job()` callables under a key such as
+    (user_id, format) and return immediately. At most `concurrency` jobs run at
+    once; a key that is already queued or running is not accepted again until
+    its job finishes, so repeated taps on an export button do not pile up work.
+    """
+
+    def __init__(self, concurrency: int = REPORT_JOB_CONCURRENCY, max_pending: int = REPORT_JOB_MAX_PENDING):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._queue = None
+        self._workers = []
+        self._keys = set()
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def is_active(self, key) -> bool:
+        return key in self._keys
+
+    def submit(self, key, job):
+        """Queue job; returns its queue position (0 = starts right away), or None if key is already in flight.
+
+        Raises asyncio.QueueFull when max_pending jobs are already waiting.
+        """
+        if key in self._keys:
+            return None
+        if not self._workers:
+            # Workers start lazily on the caller's loop, outside the caller's unit of work
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._workers = [
+                create_background_task(self._run())
+                for _ in range(self.concurrency)
+            ]
+        position = max(len(self._keys) - self.concurrency + 1, 0)
+        self._queue.put_nowait((key, job))
+        self._keys.add(key)
+        return position
+
+    async def _run(self):
+        while True:
+            key, job = await self._queue.get()
+            try:
+                await job()
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Report job {key} failed: {e}")
+            finally:
+                self._keys.discard(key)
+                self._queue.task_done()
+
+    async def close(self):
+        # Running jobs are cancelled; their users simply get no file
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._keys.clear()
+        logging.info(f"Report job queue closed: {self.completed} completed, {self.failed} failed")
+
+# Shared queue for /export_* commands (see handlers/reports.py)
+report_jobs = ReportJobQueue()
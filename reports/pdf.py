@@ -0,0 +1,127 @@
+from services.transaction import iter_transaction_rows_sync
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+import datetime
+import io
+
+# Runs inside report worker processes (reports/workers.py), never on the bot's event loop
+
+MARGIN = 40
+ROW_HEIGHT = 12
+# Column x positions; amounts are right-aligned at AMOUNT_RIGHT
+DATE_X, CATEGORY_X, TYPE_X, AMOUNT_RIGHT, DESCRIPTION_X = 40, 110, 230, 370, 385
+
+class _PagedTable:
+    """Draws table rows top to bottom, starting new pages with a repeated header and page numbers"""
+
+    def __init__(self, c: canvas.Canvas, currency: str):
+        self.c = c
+        self.currency = currency
+        self.width, self.height = A4
+        self.page = 1
+        self.y = self.height - MARGIN
+
+    def header(self):
+        c = self.c
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(DATE_X, self.y, "Date")
+        c.drawString(CATEGORY_X, self.y, "Category")
+        c.drawString(TYPE_X, self.y, "Type")
+        c.drawRightString(AMOUNT_RIGHT, self.y, f"Amount ({self.currency})")
+        c.drawString(DESCRIPTION_X, self.y, "Description")
+        self.y -= 5
+        c.line(MARGIN, self.y, self.width - MARGIN, self.y)
+        self.y -= 15
+
+    def _new_page(self):
+        self.c.setFont("Helvetica", 8)
+        self.c.drawRightString(self.width - MARGIN, MARGIN / 2, f"Page {self.page}")
+        self.c.showPage()
+        self.page += 1
+        self.y = self.height - MARGIN
+        self.header()
+
+    def ensure(self, lines: int = 1):
+        if self.y - lines * ROW_HEIGHT < MARGIN:
+            self._new_page()
+
+    def row(self, t):
+        self.ensure()
+        c = self.c
+        c.setFont("Helvetica", 9)
+        c.drawString(DATE_X, self.y, t.date.strftime('%d.%m.%Y') if t.date else "")
+        c.drawString(CATEGORY_X, self.y, t.category[:20])
+        c.drawString(TYPE_X, self.y, "Income" if t.type == "income" else "Expense")
+        c.drawRightString(AMOUNT_RIGHT, self.y, f"{t.amount:,.2f}")
+        c.drawString(DESCRIPTION_X, self.y, (t.description or "")[:32])
+        self.y -= ROW_HEIGHT
+
+    def subtotal(self, label: str, income: float, expense: float):
+        self.ensure(2)
+        c = self.c
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(DATE_X, self.y, label)
+        c.drawString(TYPE_X, self.y, f"+{income:,.2f}  -{expense:,.2f}  = {income - expense:,.2f} {self.currency}")
+        self.y -= ROW_HEIGHT * 1.5
+
+    def finish(self):
+        self.c.setFont("Helvetica", 8)
+        self.c.drawRightString(self.width - MARGIN, MARGIN / 2, f"Page {self.page}")
+        self.c.save()
+
+def _month_label(month) -> str:
+    return f"Subtotal {month[0]}-{month[1]:02d}" if month else "Subtotal (no date)"
+
+def render_history_pdf(user_id: int, currency: str, rates: dict) -> bytes:
+    """Render the user's full history as a paged PDF with per-month subtotals; None if there is no data.
+
+    Rows are streamed from a keyset cursor in insertion order, so month
+    subtotals are emitted whenever the month changes, in the same pass.
+    """
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    table = _PagedTable(c, currency)
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(MARGIN, table.y, "Financial Report - full history")
+    table.y -= 25
+    c.setFont("Helvetica", 10)
+    c.drawString(MARGIN, table.y, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    c.drawString(MARGIN, table.y - 15, f"Currency: {currency}")
+    table.y -= 45
+    table.header()
+
+    count = 0
+    total_income = total_expense = 0.0
+    month = None
+    month_income = month_expense = 0.0
+    for batch in iter_transaction_rows_sync(user_id, currency, rates):
+        for t in batch:
+            row_month = (t.date.year, t.date.month) if t.date else None
+            if count and row_month != month:
+                table.subtotal(_month_label(month), month_income, month_expense)
+                month_income = month_expense = 0.0
+            month = row_month
+            table.row(t)
+            if t.type == "income":
+                month_income += t.amount
+                total_income += t.amount
+            else:
+                month_expense += t.amount
+                total_expense += t.amount
+            count += 1
+    if not count:
+        return None
+    table.subtotal(_month_label(month), month_income, month_expense)
+
+    # Summary
+    table.ensure(4)
+    c.line(MARGIN, table.y, table.width - MARGIN, table.y)
+    table.y -= 15
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(MARGIN, table.y, f"Total Income: {total_income:,.2f} {currency}")
+    c.drawString(250, table.y, f"Total Expense: {total_expense:,.2f} {currency}")
+    c.drawString(MARGIN, table.y - 15, f"Balance: {total_income - total_expense:,.2f} {currency}")
+    c.drawString(250, table.y - 15, f"Transactions: {count}")
+    table.finish()
+    return buf.getvalue()
@@ -0,0 +1,120 @@
+from PIL import Image, ImageDraw, ImageFont
+import importlib.util
+import io
+import math
+import os
+
+# Pie and bar charts drawn directly with Pillow: no figure/axes machinery, a
+# fraction of matplotlib's import time and memory. Output matches the
+# matplotlib charts in size (10x8 inches at the given DPI) and colours.
+
+FIGSIZE = (10, 8)
+# Shapes are drawn at this multiple of the final size and downsampled, since Pillow does not antialias
+SUPERSAMPLE = 2
+# matplotlib's default "tab10" cycle
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+          '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+# Slices smaller than this share of the pie get no percentage label
+MIN_LABELED_SHARE = 0.03
+
+_fonts = {}
+
+def _font_path(bold: bool):
+    # CHART_FONT overrides; otherwise DejaVu from matplotlib's data directory (found without importing matplotlib)
+    override = os.getenv('CHART_FONT_BOLD' if bold else 'CHART_FONT')
+    if override:
+        return override
+    spec = importlib.util.find_spec('matplotlib')
+    if spec and spec.origin:
+        name = 'DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf'
+        path = os.path.join(os.path.dirname(spec.origin), 'mpl-data', 'fonts', 'ttf', name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _font(points: float, dpi: int, bold: bool = False):
+    size = max(int(points * dpi / 72 * SUPERSAMPLE), 1)
+    key = (size, bold)
+    if key not in _fonts:
+        path = _font_path(bold)
+        _fonts[key] = ImageFont.truetype(path, size) if path else ImageFont.load_default(size)
+    return _fonts[key]
+
+def _canvas(dpi: int):
+    width, height = (int(side * dpi * SUPERSAMPLE) for side in FIGSIZE)
+    image = Image.new('RGB', (width, height), 'white')
+    return image, ImageDraw.Draw(image)
+
+def _to_png(image) -> bytes:
+    image = image.reduce(SUPERSAMPLE)  # Box filter: averages each SUPERSAMPLE x SUPERSAMPLE block
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    return buf.getvalue()
+
+def _title(draw, image, title: str, dpi: int) -> int:
+    # Draws the title centred at the top, returns the y below it
+    font = _font(14, dpi, bold=True)
+    top = int(0.3 * dpi * SUPERSAMPLE)
+    draw.text((image.width // 2, top), title, fill='black', font=font, anchor='mt')
+    return top + int(font.size * 1.8)
+
+def render_pie(labels: list, amounts: list, title: str, dpi: int = 100) -> bytes:
+    """Pie chart like matplotlib's ax.pie(autopct='%1.1f%%', startangle=90), as PNG bytes"""
+    image, draw = _canvas(dpi)
+    top = _title(draw, image, title, dpi)
+    label_font = _font(10, dpi)
+    pct_font = _font(10, dpi, bold=True)
+
+    # Leave room around the pie for the outside labels
+    radius = int(min(image.width * 0.28, (image.height - top) * 0.38))
+    cx, cy = image.width // 2, top + (image.height - top) // 2
+    box = (cx - radius, cy - radius, cx + radius, cy + radius)
+
+    total = float(sum(amounts)) or 1.0
+    # Counter-clockwise from 12 o'clock; Pillow angles run clockwise from 3 o'clock
+    angle = -90.0
+    for i, (label, amount) in enumerate(zip(labels, amounts)):
+        share = amount / total
+        sweep = share * 360.0
+        start, end = angle - sweep, angle
+        draw.pieslice(box, start, end, fill=COLORS[i % len(COLORS)], outline='white', width=SUPERSAMPLE)
+
+        middle = math.radians((start + end) / 2)
+        dx, dy = math.cos(middle), math.sin(middle)
+        if share >= MIN_LABELED_SHARE:
+            draw.text((cx + dx * radius * 0.6, cy + dy * radius * 0.6), f"{share * 100:.1f}%",
+                      fill='white', font=pct_font, anchor='mm')
+        anchor = 'lm' if dx >= 0 else 'rm'
+        draw.text((cx + dx * radius * 1.1, cy + dy * radius * 1.1), str(label),
+                  fill='black', font=label_font, anchor=anchor)
+        angle = start
+    return _to_png(image)
+
+def render_bar(labels: list, values: list, title: str, dpi: int = 100) -> bytes:
+    """Vertical bar chart with the value above each bar, as PNG bytes"""
+    image, draw = _canvas(dpi)
+    top = _title(draw, image, title, dpi)
+    label_font = _font(9, dpi)
+    value_font = _font(9, dpi, bold=True)
+
+    margin = int(0.6 * dpi * SUPERSAMPLE)
+    left, right = margin, image.width - margin
+    bottom = image.height - int(label_font.size * 2.5)
+    plot_top = top + int(value_font.size * 1.5)
+    draw.line((left, bottom, right, bottom), fill='black', width=SUPERSAMPLE)
+
+    peak = max((abs(v) for v in values), default=0) or 1.0
+    slot = (right - left) / max(len(values), 1)
+    bar_width = slot * 0.7
+    for i, (label, value) in enumerate(zip(labels, values)):
+        x0 = left + i * slot + (slot - bar_width) / 2
+        height = (bottom - plot_top) * abs(value) / peak
+        draw.rectangle((x0, bottom - height, x0 + bar_width, bottom), fill=COLORS[i % len(COLORS)])
+        centre = x0 + bar_width / 2
+        draw.text((centre, bottom - height - SUPERSAMPLE * 4), f"{value:,.2f}", fill='black', font=value_font, anchor='md')
+        # Long labels are shortened to the bar slot
+        text = str(label)
+        while len(text) > 1 and draw.textlength(text, font=label_font) > slot:
+            text = text[:-2] + '…'
+        draw.text((centre, bottom + SUPERSAMPLE * 6), text, fill='black', font=label_font, anchor='mt')
+    return _to_png(image)
@@ -0,0 +1,125 @@
+from services.transaction import iter_transaction_rows
+from aiogram.types import InputFile
+from config import EXPORT_SPOOL_MAX_BYTES
+import csv
+import datetime
+import gzip
+import io
+import logging
+import tempfile
+import time
+
+# Streaming exports: keyset cursor -> batched decrypt/convert (iter_transaction_rows) -> serializer -> spooled temp file.
+# Memory stays bounded by one batch plus the spool threshold, whatever the history size.
+
+COLUMNS = ['id', 'date', 'type', 'category', 'amount', 'currency', 'description']
+
+class SpooledInputFile(InputFile):
+    """Uploads an open (spooled) temp file in chunks instead of loading it into memory; closes it afterwards"""
+
+    def __init__(self, file, filename: str, **kwargs):
+        super().__init__(filename=filename, **kwargs)
+        self.file = file
+
+    async def read(self, bot):
+        try:
+            self.file.seek(0)
+            while chunk := self.file.read(self.chunk_size):
+                yield chunk
+        finally:
+            self.file.close()
+
+class _CsvGzWriter:
+    # Gzip-compressed UTF-8 CSV with a header row
+    extension = 'csv.gz'
+
+    def __init__(self, file):
+        self.gz = gzip.GzipFile(fileobj=file, mode='wb')
+        self.text = io.TextIOWrapper(self.gz, encoding='utf-8', newline='')
+        self.writer = csv.writer(self.text)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, batch):
+        self.writer.writerows(
+            (t.id, t.date.isoformat(sep=' ') if t.date else '', t.type, t.category,
+             f"{t.amount:.2f}", t.currency, t.description or '')
+            for t in batch
+        )
+
+    def close(self):
+        self.text.close()  # Flushes the gzip trailer, the spool itself stays open
+
+class _ParquetWriter:
+    # Columnar Parquet, one row group per batch (requires pyarrow)
+    extension = 'parquet'
+
+    def __init__(self, file):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('date', pa.timestamp('us')),
+            ('type', pa.string()),
+            ('category', pa.string()),
+            ('amount', pa.float64()),
+            ('currency', pa.string()),
+            ('description', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(file, self.schema, compression='zstd')
+
+    def write(self, batch):
+        columns = list(zip(*batch))
+        self.writer.write_batch(self.pa.record_batch(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+STREAM_FORMATS = {
+    'csv': _CsvGzWriter,
+    'parquet': _ParquetWriter,
+}
+
+async def export_stream(user_id: int, fmt: str, progress=None):
+    """Stream the user's full history into a compressed file of the given format.
+
+    Returns (SpooledInputFile, stats) or (None, stats) if there is no data; stats
+    has rows, bytes, seconds and rows_per_sec. `progress`, if given, is awaited
+    with the number of rows written so far after every batch.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    start = time.perf_counter()
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    rows = 0
+    try:
+        writer = STREAM_FORMATS[fmt](spool)
+        async for batch in iter_transaction_rows(user_id):
+            writer.write(batch)
+            rows += len(batch)
+            if progress:
+                await progress(rows)
+        writer.close()
+    except Exception:
+        spool.close()
+        raise
+
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'bytes': spool.tell(),
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds else 0.0,
+    }
+    logging.info(
+        f"Exported {rows} transactions as {fmt} for user {user_id}: {stats['bytes']} bytes, "
+        f"{seconds:.2f}s, {stats['rows_per_sec']:.0f} rows/s"
+    )
+    if not rows:
+        spool.close()
+        return None, stats
+    filename = f"transactions_{datetime.date.today():%Y%m%d}.{writer.extension}"
+    return SpooledInputFile(spool, filename), stats
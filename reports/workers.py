@@ -0,0 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor
+from config import REPORT_WORKERS
+import asyncio
+import importlib
+import multiprocessing
+import logging
+import os
+
+_pool = None
+
+def get_report_pool() -> ProcessPoolExecutor:
+    # Spawned, not forked: children must not inherit the parent's database connections
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        logging.info(f"Report worker pool started: {REPORT_WORKERS} processes")
+    return _pool
+
+def _call_by_name(target: str, *args):
+    # Runs in the worker: the module is imported there, never in the bot process
+    module, name = target.split(':')
+    return getattr(importlib.import_module(module), name)(*args)
+
+async def run_in_report_pool(fn, *args):
+    """Run a picklable top-level function in a report worker process and await its result.
+
+    fn may also be a 'module:function' string, so heavy modules (reportlab) are
+    only imported by the workers.
+    """
+    if isinstance(fn, str):
+        fn, args = _call_by_name, (fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(get_report_pool(), fn, *args)
+
+def _warm_worker(modules: tuple) -> int:
+    for module in modules:
+        importlib.import_module(module)
+    return os.getpid()
+
+async def warm_report_pool(modules: tuple = ()):
+    """Start every worker process now and import modules in each, instead of on the first report"""
+    pool = get_report_pool()
+    loop = asyncio.get_running_loop()
+    # Concurrent submissions make the pool spawn all its workers; a few extra cover slow starters
+    pids = await asyncio.gather(*(
+        loop.run_in_executor(pool, _warm_worker, modules) for _ in range(REPORT_WORKERS * 2)
+    ))
+    return len(set(pids))
+
+async def shutdown_report_pool():
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await asyncio.to_thread(pool.shutdown)
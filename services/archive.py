@@ -0,0 +1,48 @@
+from database.db import SessionLocal
+from database.models import Transaction, ArchivedTransaction
+from config import ARCHIVE_AFTER_DAYS
+from sqlalchemy import select, insert, delete
+import datetime
+import logging
+
+# Last-month stats read transactions directly, so recent rows always stay in the hot table
+MIN_ARCHIVE_DAYS = 62
+# Columns copied as-is, ids are preserved
+ARCHIVE_COLUMNS = ['id', 'user_id', 'amount', 'type', 'category_id', 'date', 'description', 'currency', 'amount_bucket']
+
+def archive_cutoff(days: int = ARCHIVE_AFTER_DAYS) -> datetime.datetime:
+    # Transactions dated before this moment are archived (dates are stored in UTC)
+    return datetime.datetime.utcnow() - datetime.timedelta(days=max(days, MIN_ARCHIVE_DAYS))
+
+def archive_transactions(days: int = ARCHIVE_AFTER_DAYS, batch_size: int = 1000) -> int:
+    """Move transactions older than `days` into transactions_archive, one batch per commit.
+
+    Monthly totals already include the moved rows, so stats, goals and forecasts
+    do not change; detailed reads fall back to the archive (see services/transaction.py).
+    Blocking; the scheduler runs it in a thread.
+    """
+    if days <= 0:
+        return 0
+    cutoff = archive_cutoff(days)
+    hot_columns = [getattr(Transaction, name) for name in ARCHIVE_COLUMNS]
+    moved = 0
+    with SessionLocal() as session:
+        while True:
+            ids = session.execute(
+                select(Transaction.id)
+                .where(Transaction.date < cutoff)
+                .order_by(Transaction.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            session.execute(
+                insert(ArchivedTransaction).from_select(
+                    ARCHIVE_COLUMNS, select(*hot_columns).where(Transaction.id.in_(ids))
+                )
+            )
+            session.execute(delete(Transaction).where(Transaction.id.in_(ids)))
+            session.commit()
+            moved += len(ids)
+    logging.info(f"Archived {moved} transactions older than {cutoff:%Y-%m-%d}")
+    return moved
@@ -1,3 +1,4 @@
+from database.db import commit_current
 import requests
 import asyncio
 import logging
@@ -33,6 +34,8 @@ def convert(amount: float, base: str, target: str) -> float:
 
 async def get_popular_rates(user_currency: str = 'USD', converter_currencies: list = None) -> str:
     # Get popular exchange rates for display based on user's preferred currency and converter settings
+    # Don't hold the update's transaction open during the HTTP request
+    await commit_current()
     try:
         # Use asyncio to make requests non-blocking
         loop = asyncio.get_event_loop()
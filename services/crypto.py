@@ -1,4 +1,8 @@
 from cryptography.fernet import Fernet
+from functools import lru_cache
+import hashlib
+import hmac
+import math
 import os
 
 KEY_FILE = 'crypto.key'
@@ -21,4 +25,47 @@ def encrypt_value(value: float) -> bytes:
 def decrypt_value(token: bytes) -> float:
     key = get_key()
     f = Fernet(key)
-    return float(f.decrypt(token).decode()) 
\ No newline at end of file
+    return float(f.decrypt(token).decode()) 
+
+def encrypt_text(value: str) -> bytes:
+    return Fernet(get_key()).encrypt(value.encode())
+
+def decrypt_text(token: bytes) -> str:
+    return Fernet(get_key()).decrypt(token).decode()
+
+# Coarse log-scale buckets for encrypted amounts: each decade is split into
+# BUCKETS_PER_DECADE buckets, so a bucket spans a ~1.78x range of values.
+BUCKETS_PER_DECADE = 4
+MIN_BUCKET_AMOUNT = 0.01
+MAX_BUCKET_AMOUNT = 1e13
+MIN_BUCKET = math.floor(math.log10(MIN_BUCKET_AMOUNT) * BUCKETS_PER_DECADE)
+MAX_BUCKET = math.floor(math.log10(MAX_BUCKET_AMOUNT) * BUCKETS_PER_DECADE)
+
+@lru_cache(maxsize=1)
+def _bucket_key() -> bytes:
+    # Derive a separate HMAC key so bucket tokens never reuse the Fernet key directly
+    return hmac.new(get_key(), b'amount-bucket', hashlib.sha256).digest()
+
+def amount_bucket(value: float) -> int:
+    """Get log-scale magnitude bucket for amount, clamped to [MIN_BUCKET, MAX_BUCKET]"""
+    value = abs(value)
+    if value <= MIN_BUCKET_AMOUNT:
+        return MIN_BUCKET
+    if value >= MAX_BUCKET_AMOUNT:
+        return MAX_BUCKET
+    return math.floor(math.log10(value) * BUCKETS_PER_DECADE)
+
+def bucket_token(user_id: int, bucket: int) -> str:
+    """Keyed token for (user, bucket) pair; equal buckets of different users never collide"""
+    msg = f'{user_id}:{bucket}'.encode()
+    return hmac.new(_bucket_key(), msg, hashlib.sha256).hexdigest()[:16]
+
+def amount_bucket_token(user_id: int, value: float) -> str:
+    """Token stored next to encrypted amount for index range lookups"""
+    return bucket_token(user_id, amount_bucket(value))
+
+def bucket_range(min_amount: float = None, max_amount: float = None) -> range:
+    """Buckets that may contain amounts within [min_amount, max_amount]"""
+    low = amount_bucket(min_amount) if min_amount is not None else MIN_BUCKET
+    high = amount_bucket(max_amount) if max_amount is not None else MAX_BUCKET
+    return range(low, high + 1)
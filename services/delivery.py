@@ -0,0 +1,30 @@
+from services.ratelimit import telegram_limiter
+from aiogram.exceptions import TelegramRetryAfter
+import asyncio
+import logging
+
+MAX_SEND_ATTEMPTS = 3
+
+async def deliver(chat_id: int, send, semaphore: asyncio.Semaphore, what: str) -> bool:
+    """Make one Telegram call for chat_id within Telegram limits; True if it succeeded.
+
+    send is a no-argument coroutine function doing the call. The per-chat token
+    is taken before a semaphore slot, so a chat with many messages queued waits
+    on its own bucket without holding slots other chats need. Flood control
+    (RetryAfter) pauses the global bucket, so all senders back off together.
+    """
+    for attempt in range(MAX_SEND_ATTEMPTS):
+        await telegram_limiter.acquire_chat(chat_id)
+        async with semaphore:
+            await telegram_limiter.acquire_global()
+            try:
+                await send()
+                return True
+            except TelegramRetryAfter as e:
+                logging.warning(f"Flood control for {what}, retry after {e.retry_after}s")
+                telegram_limiter.pause(e.retry_after)
+            except Exception as e:
+                logging.error(f"Failed to send {what}: {e}")
+                return False
+    logging.error(f"Giving up on {what} after {MAX_SEND_ATTEMPTS} attempts")
+    return False
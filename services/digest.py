@@ -0,0 +1,233 @@
+from database.db import session_scope
+from database.models import User, Transaction, Category
+from services.crypto import decrypt_value
+from services.ledger import month_start, previous_month_start
+from services.user import convert_currency, format_amount
+from services.ratelimit import telegram_limiter
+from services.delivery import deliver
+from reports.charts import render_pie_chart
+from reports.workers import run_in_report_pool
+from config import DIGEST_BATCH_SIZE, DIGEST_CHART_DPI, DIGEST_LEASE_SECONDS
+from aiogram import Bot
+from aiogram.types import BufferedInputFile
+from sqlalchemy import select, update, func, or_
+from collections import defaultdict
+from typing import NamedTuple
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+
+# Digests sent concurrently (pacing itself comes from telegram_limiter)
+DIGEST_CONCURRENCY = 20
+# Categories listed in the digest text
+DIGEST_TOP_CATEGORIES = 5
+
+class Digest(NamedTuple):
+    user_id: int
+    currency: str
+    income: float
+    expense: float
+    count: int
+    categories: dict  # Expense category name -> amount
+
+async def set_digest_enabled(telegram_id: int, enabled: bool):
+    """Opt user in or out of the monthly digest; the first digest covers the month after opting in"""
+    async with session_scope() as session:
+        user = (await session.execute(
+            select(User).where(User.telegram_id == telegram_id)
+        )).scalars().first()
+        if not user:
+            user = User(telegram_id=telegram_id, preferred_currency='USD')
+            session.add(user)
+        if enabled and not user.digest_enabled:
+            user.digest_month = previous_month_start(datetime.datetime.now())
+        user.digest_enabled = enabled
+        await session.flush()
+        logging.info(f"Monthly digest {'enabled' if enabled else 'disabled'} for user {telegram_id}")
+
+async def is_digest_enabled(telegram_id: int) -> bool:
+    async with session_scope() as session:
+        return bool((await session.execute(
+            select(User.digest_enabled).where(User.telegram_id == telegram_id)
+        )).scalar())
+
+def _due(month: datetime.datetime, now: datetime.datetime = None):
+    # Opted in, no digest delivered for month yet and (with now) not leased by a live run
+    due = [User.digest_enabled == True, or_(User.digest_month == None, User.digest_month < month)]
+    if now is not None:
+        due.append(or_(User.digest_claim_expires_at == None, User.digest_claim_expires_at < now))
+    return due
+
+async def claim_digest_users(month: datetime.datetime, run_id: str, lease_seconds: int = DIGEST_LEASE_SECONDS,
+                             limit: int = DIGEST_BATCH_SIZE):
+    """Atomically claim up to limit opted-in users who have no digest for month yet.
+
+    Like reminder claims, one UPDATE ... RETURNING leases the rows to run_id,
+    so several bot processes never send the same user's digest twice. The
+    month is recorded only by complete_digests(); if the run dies or a send
+    fails, the user is claimed again once the lease expires. Returns
+    (telegram_id, preferred_currency) rows.
+    """
+    now = datetime.datetime.now()
+    due_ids = select(User.id).where(*_due(month, now)).order_by(User.id).limit(limit)
+    stmt = (
+        update(User)
+        .where(User.id.in_(due_ids.scalar_subquery()), *_due(month, now))
+        .values(digest_claimed_by=run_id, digest_claim_expires_at=now + datetime.timedelta(seconds=lease_seconds))
+        .returning(User.telegram_id, User.preferred_currency)
+    )
+    async with session_scope() as session:
+        rows = (await session.execute(stmt)).all()
+        await session.flush()
+        return rows
+
+async def complete_digests(telegram_ids: list, month: datetime.datetime, run_id: str) -> int:
+    # Record month as delivered for users still claimed by run_id, with a single UPDATE
+    if not telegram_ids:
+        return 0
+    async with session_scope() as session:
+        result = await session.execute(
+            update(User)
+            .where(User.telegram_id.in_(telegram_ids), User.digest_claimed_by == run_id)
+            .values(digest_month=month, digest_claimed_by=None, digest_claim_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.flush()
+        return result.rowcount
+
+async def count_undelivered_digests(month: datetime.datetime) -> int:
+    # Opted-in users still without a digest for month (failed sends, leases of runs that died)
+    async with session_scope() as session:
+        return (await session.execute(select(func.count(User.id)).where(*_due(month)))).scalar()
+
+def _aggregate(rows, currencies: dict, rates: dict) -> list:
+    # Decrypt and sum one batch; blocking, so it runs in a thread
+    totals = {user_id: {'income': 0.0, 'expense': 0.0, 'count': 0, 'categories': defaultdict(float)} for user_id in currencies}
+    for user_id, type_, amount, currency, category in rows:
+        target = currencies[user_id]
+        value = decrypt_value(amount) * rates[(currency or target, target)]
+        entry = totals[user_id]
+        entry['count'] += 1
+        if type_ == 'income':
+            entry['income'] += value
+        else:
+            entry['expense'] += value
+            entry['categories'][category or 'No category'] += value
+    return [
+        Digest(user_id, currencies[user_id], t['income'], t['expense'], t['count'], dict(t['categories']))
+        for user_id, t in totals.items()
+    ]
+
+async def collect_digests(users, start: datetime.datetime, end: datetime.datetime, rates: dict) -> list:
+    """Aggregate [start, end) for a batch of (telegram_id, currency) users with one query.
+
+    rates caches {(stored currency, user currency): rate} across batches, so the
+    whole job does one rate lookup per currency pair.
+    """
+    currencies = dict(users)
+    async with session_scope() as session:
+        rows = (await session.execute(
+            select(Transaction.user_id, Transaction.type, Transaction.amount, Transaction.currency, Category.name)
+            .outerjoin(Category, Transaction.category_id == Category.id)
+            .where(
+                Transaction.user_id.in_(list(currencies)),
+                Transaction.date >= start,
+                Transaction.date < end
+            )
+        )).all()
+
+    for pair in {(row.currency or currencies[row.user_id], currencies[row.user_id]) for row in rows}:
+        if pair not in rates:
+            rates[pair] = await convert_currency(1.0, *pair)
+    return await asyncio.to_thread(_aggregate, rows, currencies, rates)
+
+def format_digest(digest: Digest, month: datetime.datetime) -> str:
+    lines = [
+        f"📅 Monthly digest: {month:%B %Y}",
+        "",
+        f"Income: {format_amount(digest.income, digest.currency)}",
+        f"Expenses: {format_amount(digest.expense, digest.currency)}",
+        f"Balance: {format_amount(digest.income - digest.expense, digest.currency)}",
+        f"Transactions: {digest.count}",
+    ]
+    top = sorted(digest.categories.items(), key=lambda item: item[1], reverse=True)[:DIGEST_TOP_CATEGORIES]
+    if top:
+        lines += ["", "Top expenses:"] + [f"• {name}: {format_amount(amount, digest.currency)}" for name, amount in top]
+    return "\n".join(lines)
+
+async def _render_chart(digest: Digest, month: datetime.datetime):
+    # Pie of expense categories, rendered in a report worker process; None if there were no expenses
+    if not digest.categories:
+        return None
+    return await run_in_report_pool(
+        render_pie_chart,
+        list(digest.categories), list(digest.categories.values()),
+        f"Expenses {month:%B %Y} ({digest.currency})", DIGEST_CHART_DPI
+    )
+
+async def _deliver_digest(bot: Bot, digest: Digest, text: str, chart, semaphore: asyncio.Semaphore) -> bool:
+    if chart:
+        send = lambda: bot.send_photo(digest.user_id, BufferedInputFile(chart, filename="digest.png"), caption=text)
+    else:
+        send = lambda: bot.send_message(digest.user_id, text)
+    return await deliver(digest.user_id, send, semaphore, f"digest to user {digest.user_id}")
+
+async def send_monthly_digest(bot: Bot, today: datetime.datetime = None) -> dict:
+    """Send last month's digest to every opted-in user who has not received it yet.
+
+    Works through claimed batches of users: one aggregate query per batch,
+    charts rendered concurrently in the report worker pool, sends paced by
+    telegram_limiter. Users without transactions that month are skipped;
+    they and the users who got their digest are marked done for the month,
+    failed sends stay leased and are retried by a later run. Returns counts and timings (total and per phase, in seconds).
+    """
+    start = previous_month_start(today or datetime.datetime.now())
+    end = month_start(start + datetime.timedelta(days=32))
+    stats = {'users': 0, 'sent': 0, 'failed': 0, 'skipped': 0,
+             'query_seconds': 0.0, 'render_seconds': 0.0, 'send_seconds': 0.0, 'seconds': 0.0}
+    rates = {}
+    run_id = uuid.uuid4().hex
+    job_start = time.perf_counter()
+    semaphore = asyncio.Semaphore(DIGEST_CONCURRENCY)
+    try:
+        while True:
+            phase = time.perf_counter()
+            users = await claim_digest_users(start, run_id)
+            if not users:
+                break
+            digests = [d for d in await collect_digests(users, start, end, rates) if d.count]
+            stats['users'] += len(users)
+            stats['skipped'] += len(users) - len(digests)
+            stats['query_seconds'] += time.perf_counter() - phase
+
+            phase = time.perf_counter()
+            charts = await asyncio.gather(*(_render_chart(d, start) for d in digests))
+            stats['render_seconds'] += time.perf_counter() - phase
+
+            phase = time.perf_counter()
+            results = await asyncio.gather(*(
+                _deliver_digest(bot, d, format_digest(d, start), chart, semaphore)
+                for d, chart in zip(digests, charts)
+            ))
+            stats['sent'] += sum(results)
+            stats['failed'] += len(results) - sum(results)
+            stats['send_seconds'] += time.perf_counter() - phase
+            # Failed sends keep their lease and are retried after it expires
+            failed = {d.user_id for d, ok in zip(digests, results) if not ok}
+            await complete_digests([user_id for user_id, _ in users if user_id not in failed], start, run_id)
+    except Exception as e:
+        logging.error(f"Error in send_monthly_digest: {e}")
+    finally:
+        telegram_limiter.cleanup()
+
+    stats['seconds'] = time.perf_counter() - job_start
+    if stats['users']:
+        logging.info(
+            f"Monthly digest {start:%Y-%m}: users={stats['users']}, sent={stats['sent']}, failed={stats['failed']}, "
+            f"skipped={stats['skipped']}, time={stats['seconds']:.2f}s "
+            f"(query {stats['query_seconds']:.2f}s, render {stats['render_seconds']:.2f}s, send {stats['send_seconds']:.2f}s), "
+            f"{stats['seconds'] / stats['users'] * 1000:.1f} ms/user"
+        )
+    return stats
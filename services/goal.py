@@ -1,84 +1,93 @@
-from database.db import SessionLocal
-from database.models import Goal, Transaction
-from services.crypto import decrypt_value
+from database.db import session_scope
+from database.models import Goal
+from services.ledger import get_total
+from sqlalchemy import select
 import datetime
 import logging
-from sqlalchemy import func
 
-def add_goal(user_id: int, name: str, target_amount: float, deadline=None):
+async def add_goal(user_id: int, name: str, target_amount: float, deadline=None):
     # Add new financial goal for specific user
-    with SessionLocal() as session:
+    async with session_scope() as session:
         goal = Goal(
             user_id=user_id,
-            name=name, 
-            target_amount=target_amount, 
+            name=name,
+            target_amount=target_amount,
             deadline=deadline
         )
         session.add(goal)
-        session.commit()
+        await session.flush()
         logging.info(f"Goal added: user_id={user_id}, name={name}, target_amount={target_amount}, deadline={deadline}")
         return goal
 
-def get_goals(user_id: int):
+async def get_goals(user_id: int):
     # Get all financial goals for specific user
-    with SessionLocal() as session:
-        return session.query(Goal).filter(Goal.user_id == user_id).all()
+    async with session_scope() as session:
+        return (await session.execute(
+            select(Goal).where(Goal.user_id == user_id)
+        )).scalars().all()
 
-def update_goal_progress(user_id: int, goal_id: int, amount: float):
+async def update_goal_progress(user_id: int, goal_id: int, amount: float):
     # Update progress for a specific goal
-    with SessionLocal() as session:
-        goal = session.query(Goal).filter(
-            Goal.id == goal_id,
-            Goal.user_id == user_id
-        ).first()
+    async with session_scope() as session:
+        goal = (await session.execute(
+            select(Goal).where(
+                Goal.id == goal_id,
+                Goal.user_id == user_id
+            )
+        )).scalars().first()
         if goal:
             goal.current_amount += amount
             if goal.current_amount >= goal.target_amount:
                 goal.achieved = True
-            session.commit()
+            await session.flush()
             return goal
         return None
 
-def get_goals_with_progress(user_id: int):
-    # Get goals with calculated progress based on income transactions
-    with SessionLocal() as session:
-        goals = session.query(Goal).filter(Goal.user_id == user_id).all()
-        
-        # Calculate total income for progress
-        income_txs = session.query(Transaction).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'income'
-        ).all()
-        
-        total_income = 0
-        for tx in income_txs:
-            total_income += decrypt_value(tx.amount)
-        
-        # Update current amounts based on proportional income
+def apply_income_to_goals(goals, total_income: float):
+    # Divide total income equally among goals that are not achieved yet, O(goals)
+    active_goals = [g for g in goals if not g.achieved]
+    if not active_goals:
+        return goals
+    share = total_income / len(active_goals)
+    for goal in active_goals:
+        goal.current_amount = min(share, goal.target_amount)
+        if goal.current_amount >= goal.target_amount:
+            goal.achieved = True
+    return goals
+
+async def sync_goal_progress(session, user_id: int):
+    """Persist goal progress after income changes, inside caller's session (caller commits)"""
+    goals = (await session.execute(
+        select(Goal).where(Goal.user_id == user_id)
+    )).scalars().all()
+    if any(not g.achieved for g in goals):
+        apply_income_to_goals(goals, await get_total(user_id, 'income', session))
+    return goals
+
+async def get_goals_with_progress(user_id: int):
+    # Get goals with progress derived from the income ledger (read-only, nothing is committed)
+    async with session_scope() as session:
+        goals = (await session.execute(
+            select(Goal).where(Goal.user_id == user_id)
+        )).scalars().all()
+        if any(not g.achieved for g in goals):
+            apply_income_to_goals(goals, await get_total(user_id, 'income', session))
+        # Detach so derived values are never flushed back by the unit of work
         for goal in goals:
-            if not goal.achieved:
-                # Simple approach: divide total income among active goals
-                active_goals = [g for g in goals if not g.achieved]
-                if active_goals:
-                    goal.current_amount = min(
-                        total_income / len(active_goals),
-                        goal.target_amount
-                    )
-                    if goal.current_amount >= goal.target_amount:
-                        goal.achieved = True
-        
-        session.commit()
+            session.expunge(goal)
         return goals
 
-def delete_goal(user_id: int, goal_id: int):
+async def delete_goal(user_id: int, goal_id: int):
     # Delete a goal for specific user
-    with SessionLocal() as session:
-        goal = session.query(Goal).filter(
-            Goal.id == goal_id,
-            Goal.user_id == user_id
-        ).first()
+    async with session_scope() as session:
+        goal = (await session.execute(
+            select(Goal).where(
+                Goal.id == goal_id,
+                Goal.user_id == user_id
+            )
+        )).scalars().first()
         if goal:
-            session.delete(goal)
-            session.commit()
+            await session.delete(goal)
+            await session.flush()
             return True
-        return False 
\ No newline at end of file
+        return False
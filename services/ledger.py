@@ -0,0 +1,83 @@
+from database.db import SessionLocal, session_scope
+from database.models import MonthlyTotal, Transaction, ArchivedTransaction
+from services.crypto import encrypt_value, decrypt_value
+from sqlalchemy import select
+from collections import defaultdict
+import datetime
+import logging
+
+def month_start(date: datetime.datetime) -> datetime.datetime:
+    # Normalize date to the first day of its month
+    return datetime.datetime(date.year, date.month, 1)
+
+def previous_month_start(date: datetime.datetime) -> datetime.datetime:
+    # First day of the month before date's month
+    return month_start(month_start(date) - datetime.timedelta(days=1))
+
+async def record_transaction(session, user_id: int, type_: str, amount: float, date: datetime.datetime = None):
+    """Add amount to user's monthly ledger inside caller's session (caller commits)"""
+    month = month_start(date or datetime.datetime.utcnow())
+    entry = (await session.execute(
+        select(MonthlyTotal).where(
+            MonthlyTotal.user_id == user_id,
+            MonthlyTotal.month == month,
+            MonthlyTotal.type == type_
+        )
+    )).scalars().first()
+    if entry:
+        entry.total = encrypt_value(decrypt_value(entry.total) + amount)
+        entry.count += 1
+    else:
+        entry = MonthlyTotal(
+            user_id=user_id,
+            month=month,
+            type=type_,
+            total=encrypt_value(amount),
+            count=1
+        )
+        session.add(entry)
+    return entry
+
+async def get_total(user_id: int, type_: str, session=None) -> float:
+    """Get all-time total for transaction type from the ledger (one decrypt per month)"""
+    if session is None:
+        async with session_scope() as session:
+            return await get_total(user_id, type_, session)
+    entries = (await session.execute(
+        select(MonthlyTotal.total).where(
+            MonthlyTotal.user_id == user_id,
+            MonthlyTotal.type == type_
+        )
+    )).scalars().all()
+    return sum(decrypt_value(total) for total in entries)
+
+def rebuild_ledger(user_id: int = None) -> int:
+    """Recompute monthly totals from transactions and the archive (all users if user_id is None)"""
+    # Blocking: run from a script or a worker thread
+    with SessionLocal() as session:
+        ledger_query = session.query(MonthlyTotal)
+        if user_id is not None:
+            ledger_query = ledger_query.filter(MonthlyTotal.user_id == user_id)
+
+        totals = defaultdict(lambda: [0.0, 0])
+        for model in (Transaction, ArchivedTransaction):
+            tx_query = session.query(model.user_id, model.type, model.date, model.amount)
+            if user_id is not None:
+                tx_query = tx_query.filter(model.user_id == user_id)
+            for uid, type_, date, amount in tx_query.yield_per(1000):
+                key = (uid, month_start(date or datetime.datetime.utcnow()), type_)
+                totals[key][0] += decrypt_value(amount)
+                totals[key][1] += 1
+
+        ledger_query.delete(synchronize_session=False)
+        for (uid, month, type_), (total, count) in totals.items():
+            session.add(MonthlyTotal(
+                user_id=uid,
+                month=month,
+                type=type_,
+                total=encrypt_value(total),
+                count=count
+            ))
+        session.commit()
+        logging.info(f"Rebuilt ledger: user_id={user_id}, entries={len(totals)}")
+        return len(totals)
@@ -0,0 +1,110 @@
+from database.db import session_scope
+from database.models import MonthlyTotal
+from services.crypto import decrypt_value
+from services.ledger import month_start
+from sqlalchemy import select
+from collections import OrderedDict
+import numpy as np
+import datetime
+import logging
+
+# How many past months feed the trend and how far ahead we project
+HISTORY_MONTHS = 12
+HORIZON_MONTHS = 120
+
+# Forecasts kept for this many users (least recently used dropped first)
+FORECAST_CACHE_SIZE = 1024
+
+# (user_id, month) -> projected net savings for each of the next HORIZON_MONTHS months;
+# the month in the key retires forecasts when a new month starts
+_forecast_cache = OrderedDict()
+
+def _months_between(start: datetime.datetime, end: datetime.datetime) -> int:
+    return (end.year - start.year) * 12 + (end.month - start.month)
+
+def _add_months(date: datetime.datetime, months: int) -> datetime.datetime:
+    month_index = date.month - 1 + months
+    return datetime.datetime(date.year + month_index // 12, month_index % 12 + 1, 1)
+
+async def get_monthly_net(user_id: int, months: int = HISTORY_MONTHS) -> np.ndarray:
+    """Net income (income - expense) per month for the last N months, oldest first"""
+    current = month_start(datetime.datetime.utcnow())
+    first = _add_months(current, -(months - 1))
+    async with session_scope() as session:
+        entries = (await session.execute(
+            select(MonthlyTotal.month, MonthlyTotal.type, MonthlyTotal.total).where(
+                MonthlyTotal.user_id == user_id,
+                MonthlyTotal.month >= first
+            )
+        )).all()
+
+    net = np.zeros(months)
+    for month, type_, total in entries:
+        idx = _months_between(first, month)
+        if 0 <= idx < months:
+            sign = 1 if type_ == 'income' else -1
+            net[idx] += sign * decrypt_value(total)
+    return net
+
+def _forecast(net: np.ndarray) -> np.ndarray:
+    # Linear trend over the months we have data for, extrapolated HORIZON_MONTHS ahead
+    nonzero = np.flatnonzero(net)
+    if nonzero.size == 0:
+        return np.zeros(HORIZON_MONTHS)
+    history = net[nonzero[0]:]
+    t = np.arange(history.size)
+    future_t = np.arange(history.size, history.size + HORIZON_MONTHS)
+    if history.size < 2:
+        return np.full(HORIZON_MONTHS, history.mean())
+    slope, intercept = np.polyfit(t, history, 1)
+    return intercept + slope * future_t
+
+def _cache_key(user_id: int) -> tuple:
+    return user_id, month_start(datetime.datetime.utcnow())
+
+async def get_forecast(user_id: int) -> np.ndarray:
+    """Projected monthly net savings for the next HORIZON_MONTHS months (cached per user and month)"""
+    key = _cache_key(user_id)
+    forecast = _forecast_cache.get(key)
+    if forecast is not None:
+        _forecast_cache.move_to_end(key)
+        return forecast
+    forecast = _forecast(await get_monthly_net(user_id))
+    _forecast_cache[key] = forecast
+    while len(_forecast_cache) > FORECAST_CACHE_SIZE:
+        _forecast_cache.popitem(last=False)
+    return forecast
+
+def invalidate_forecast(user_id: int):
+    # Called when user's transactions change
+    _forecast_cache.pop(_cache_key(user_id), None)
+
+async def project_goals(user_id: int, goals) -> dict:
+    """Get {goal_id: (eta, required_monthly)} for active goals.
+
+    eta is the first month when projected savings cover the remaining amount
+    (None if never within the horizon); required_monthly is the savings rate
+    needed to reach the goal by its deadline (None without deadline).
+    """
+    active_goals = [g for g in goals if not g.achieved]
+    if not active_goals:
+        return {}
+
+    # Savings are shared equally between active goals, same as progress
+    cumulative = np.cumsum(np.maximum(await get_forecast(user_id), 0)) / len(active_goals)
+    now = datetime.datetime.now()
+    current = month_start(now)
+
+    projections = {}
+    for goal in active_goals:
+        remaining = max(goal.target_amount - (goal.current_amount or 0), 0)
+        idx = int(np.searchsorted(cumulative, remaining))
+        eta = _add_months(current, idx + 1) if idx < HORIZON_MONTHS else None
+
+        required_monthly = None
+        if goal.deadline:
+            months_left = max(_months_between(current, goal.deadline), 1)
+            required_monthly = remaining / months_left
+        projections[goal.id] = (eta, required_monthly)
+    logging.debug(f"Projected {len(projections)} goals for user {user_id}")
+    return projections
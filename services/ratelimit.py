@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+# Telegram Bot API limits: ~30 messages per second overall, ~1 per second per chat
+GLOBAL_RATE = 30
+PER_CHAT_RATE = 1
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self) -> bool:
+        # Full bucket carries no state and can be dropped
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def pause(self, seconds: float):
+        # Hand out no tokens for `seconds` (e.g. Telegram flood control)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        # Lock keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                paused = self.paused_until - time.monotonic()
+                if paused > 0:
+                    await asyncio.sleep(paused)
+                    continue
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class TelegramRateLimiter:
+    """Combined global and per-chat limiter for outgoing messages"""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE):
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self._chats = {}
+
+    async def acquire_chat(self, chat_id: int):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate)
+        await bucket.acquire()
+
+    async def acquire_global(self):
+        await self.global_bucket.acquire()
+
+    async def acquire(self, chat_id: int):
+        await self.acquire_chat(chat_id)
+        await self.acquire_global()
+
+    def pause(self, seconds: float):
+        # Flood control applies to the whole bot: stop every sender, not just the one that was told
+        self.global_bucket.pause(seconds)
+
+    def cleanup(self):
+        # Forget chats whose buckets have fully refilled
+        for chat_id in [c for c, b in self._chats.items() if b.is_idle()]:
+            del self._chats[chat_id]
+
+telegram_limiter = TelegramRateLimiter()
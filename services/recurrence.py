@@ -0,0 +1,58 @@
+import calendar
+import datetime
+
+# Recurrence rules stored in Reminder.recurrence:
+#   'daily', 'weekly'   - fixed period from the previous fire time
+#   'monthly:<day>'     - same day of month (clamped to month length), same time
+DAILY = 'daily'
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+
+PERIODS = {
+    DAILY: datetime.timedelta(days=1),
+    WEEKLY: datetime.timedelta(weeks=1),
+}
+
+RULE_LABELS = {
+    DAILY: 'Daily',
+    WEEKLY: 'Weekly',
+    MONTHLY: 'Monthly',
+}
+
+def make_rule(kind: str, first_fire: datetime.datetime) -> str:
+    """Build rule string for recurrence kind anchored at first fire time"""
+    if kind == MONTHLY:
+        return f'{MONTHLY}:{first_fire.day}'
+    if kind in PERIODS:
+        return kind
+    raise ValueError(f'Unknown recurrence: {kind}')
+
+def rule_label(rule: str) -> str:
+    return RULE_LABELS.get(rule.partition(':')[0], rule)
+
+def _shift_month(date: datetime.datetime, months: int, day: int) -> datetime.datetime:
+    month_index = date.month - 1 + months
+    year, month = date.year + month_index // 12, month_index % 12 + 1
+    day = min(day, calendar.monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+def next_fire(rule: str, last: datetime.datetime, after: datetime.datetime) -> datetime.datetime:
+    """First fire time of rule strictly after `after`, computed in closed form.
+
+    `last` is the previous fire time; missed occurrences (e.g. while the bot was
+    down) are skipped rather than replayed.
+    """
+    kind, _, arg = rule.partition(':')
+    if kind in PERIODS:
+        period = PERIODS[kind]
+        if last > after:
+            return last
+        return last + ((after - last) // period + 1) * period
+    if kind == MONTHLY:
+        day = int(arg) if arg else last.day
+        months = (after.year - last.year) * 12 + (after.month - last.month)
+        candidate = _shift_month(last, months, day)
+        if candidate <= after:
+            candidate = _shift_month(last, months + 1, day)
+        return candidate
+    raise ValueError(f'Unknown recurrence: {rule}')
@@ -1,58 +1,155 @@
-from database.db import SessionLocal
+from database.db import session_scope, after_commit
 from database.models import Reminder
+from services.reminder_queue import reminder_queue
+from sqlalchemy import case, select, update, and_, or_
+from config import REMINDER_LEASE_SECONDS
 import datetime
 import logging
 
-def add_reminder(user_id: int, message: str, remind_at: datetime.datetime):
-    # Add new reminder for specific user
-    with SessionLocal() as session:
+async def add_reminder(user_id: int, message: str, remind_at: datetime.datetime, recurrence: str = None):
+    # Add new reminder for specific user (recurrence rule from services.recurrence or None)
+    async with session_scope() as session:
         reminder = Reminder(
             user_id=user_id,
             message=message, 
-            remind_at=remind_at
+            remind_at=remind_at,
+            recurrence=recurrence
         )
         session.add(reminder)
-        session.commit()
-        logging.info(f"Reminder added: user_id={user_id}, message={message}, remind_at={remind_at}")
+        await session.flush()
+        reminder_id, remind_at = reminder.id, reminder.remind_at
+        after_commit(lambda: reminder_queue.push(reminder_id, remind_at))
+        logging.info(f"Reminder added: user_id={user_id}, message={message}, remind_at={remind_at}, recurrence={recurrence}")
         return reminder
 
-def get_active_reminders(user_id: int):
+async def get_active_reminders(user_id: int):
     # Get all active reminders for specific user
-    with SessionLocal() as session:
-        return session.query(Reminder).filter(
-            Reminder.user_id == user_id,
-            Reminder.is_active == True
-        ).all()
-
-def get_due_reminders():
-    # Get reminders that should be sent now (for all users)
+    async with session_scope() as session:
+        return (await session.execute(
+            select(Reminder).where(
+                Reminder.user_id == user_id,
+                Reminder.is_active == True
+            )
+        )).scalars().all()
+
+async def get_pending_reminders():
+    # Get (id, remind_at) of all active reminders to load the in-memory queue at startup
+    async with session_scope() as session:
+        return (await session.execute(
+            select(Reminder.id, Reminder.remind_at).where(Reminder.is_active == True)
+        )).all()
+
+def _claimable(now: datetime.datetime):
+    # Due, active and not leased by a live worker
+    return and_(
+        Reminder.is_active == True,
+        Reminder.remind_at <= now,
+        or_(Reminder.claim_expires_at.is_(None), Reminder.claim_expires_at < now)
+    )
+
+async def claim_due_reminders(worker_id: str, lease_seconds: int = REMINDER_LEASE_SECONDS, limit: int = 500):
+    """Atomically claim a batch of due reminders for this worker.
+
+    One UPDATE ... RETURNING marks the rows with worker_id and a lease expiry,
+    so concurrent workers never get the same reminder. If a worker dies, its
+    rows become claimable again once the lease expires.
+    """
+    now = datetime.datetime.now()
+    due_ids = (
+        select(Reminder.id)
+        .where(_claimable(now))
+        .order_by(Reminder.remind_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(Reminder)
+        .where(Reminder.id.in_(due_ids.scalar_subquery()), _claimable(now))
+        .values(claimed_by=worker_id, claim_expires_at=now + datetime.timedelta(seconds=lease_seconds))
+        .returning(Reminder.id, Reminder.user_id, Reminder.message, Reminder.remind_at, Reminder.recurrence)
+    )
+    async with session_scope() as session:
+        rows = (await session.execute(stmt)).all()
+        await session.flush()
+        return rows
+
+async def get_leased_reminders():
+    # Get (id, claim_expires_at) of due reminders leased by other workers, to retry after expiry
     now = datetime.datetime.now()
-    with SessionLocal() as session:
-        return session.query(Reminder).filter(
-            Reminder.is_active == True, 
-            Reminder.remind_at <= now
-        ).all()
+    async with session_scope() as session:
+        return (await session.execute(
+            select(Reminder.id, Reminder.claim_expires_at).where(
+                Reminder.is_active == True,
+                Reminder.remind_at <= now,
+                Reminder.claim_expires_at >= now
+            )
+        )).all()
 
-def deactivate_reminder(reminder_id: int):
+async def deactivate_reminder(reminder_id: int):
     # Deactivate reminder after sending
-    with SessionLocal() as session:
-        reminder = session.query(Reminder).get(reminder_id)
+    async with session_scope() as session:
+        reminder = await session.get(Reminder, reminder_id)
         if reminder:
             reminder.is_active = False
-            session.commit()
+            await session.flush()
             logging.info(f"Reminder deactivated: id={reminder_id}")
             return True
         return False
 
-def delete_reminder(user_id: int, reminder_id: int):
+async def deactivate_reminders(reminder_ids: list, worker_id: str = None) -> int:
+    # Deactivate a batch of sent reminders with a single UPDATE (only rows still claimed by worker_id)
+    if not reminder_ids:
+        return 0
+    async with session_scope() as session:
+        result = await session.execute(
+            update(Reminder)
+            .where(
+                Reminder.id.in_(reminder_ids),
+                Reminder.claimed_by == worker_id
+            )
+            .values(is_active=False, claimed_by=None, claim_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.flush()
+        updated = result.rowcount
+        logging.info(f"Reminders deactivated: {updated}")
+        return updated
+
+async def reschedule_reminders(next_times: dict, worker_id: str = None) -> int:
+    # Move recurring reminders to their next fire time with a single UPDATE ({id: remind_at}) and release claim
+    if not next_times:
+        return 0
+    async with session_scope() as session:
+        result = await session.execute(
+            update(Reminder)
+            .where(
+                Reminder.id.in_(next_times.keys()),
+                Reminder.claimed_by == worker_id
+            )
+            .values(
+                remind_at=case(next_times, value=Reminder.id),
+                claimed_by=None,
+                claim_expires_at=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.flush()
+        updated = result.rowcount
+        logging.info(f"Reminders rescheduled: {updated}")
+        return updated
+
+async def delete_reminder(user_id: int, reminder_id: int):
     # Delete reminder for specific user
-    with SessionLocal() as session:
-        reminder = session.query(Reminder).filter(
-            Reminder.id == reminder_id,
-            Reminder.user_id == user_id
-        ).first()
+    async with session_scope() as session:
+        reminder = (await session.execute(
+            select(Reminder).where(
+                Reminder.id == reminder_id,
+                Reminder.user_id == user_id
+            )
+        )).scalars().first()
         if reminder:
-            session.delete(reminder)
-            session.commit()
+            await session.delete(reminder)
+            await session.flush()
+            after_commit(lambda: reminder_queue.discard(reminder_id))
             return True
         return False 
\ No newline at end of file
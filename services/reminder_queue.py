@@ -0,0 +1,85 @@
+import asyncio
+import datetime
+import heapq
+import logging
+
+class ReminderQueue:
+    """In-memory min-heap of reminder fire times.
+
+    The heap holds (remind_at, reminder_id) pairs; _scheduled maps each live
+    reminder to its current fire time, so entries for deleted or rescheduled
+    reminders are skipped lazily instead of being removed from the heap.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._scheduled = {}
+        self._loop = None
+        self._wakeup = None
+
+    def __len__(self):
+        return len(self._scheduled)
+
+    def push(self, reminder_id: int, remind_at: datetime.datetime):
+        # Add or reschedule reminder and wake the runner if it became the earliest one
+        if self._scheduled.get(reminder_id) == remind_at:
+            return  # Already queued for that time (e.g. periodic reload)
+        self._scheduled[reminder_id] = remind_at
+        heapq.heappush(self._heap, (remind_at, reminder_id))
+        self._notify()
+
+    def discard(self, reminder_id: int):
+        # Stale heap entry is dropped when it reaches the top
+        self._scheduled.pop(reminder_id, None)
+
+    def _notify(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _drop_stale(self):
+        while self._heap:
+            remind_at, reminder_id = self._heap[0]
+            if self._scheduled.get(reminder_id) == remind_at:
+                return
+            heapq.heappop(self._heap)
+
+    def next_time(self):
+        """Earliest pending fire time or None if queue is empty"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime.datetime) -> list:
+        """Remove and return ids of reminders due at or before now"""
+        due = []
+        while True:
+            next_at = self.next_time()
+            if next_at is None or next_at > now:
+                return due
+            _, reminder_id = heapq.heappop(self._heap)
+            del self._scheduled[reminder_id]
+            due.append(reminder_id)
+
+    async def run(self, callback):
+        """Sleep until the next fire time and pass due reminder ids to callback"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logging.info(f"Reminder queue started with {len(self)} pending reminders")
+        while True:
+            self._wakeup.clear()
+            now = datetime.datetime.now()
+            due = self.pop_due(now)
+            if due:
+                try:
+                    await callback(due)
+                except Exception as e:
+                    logging.error(f"Error firing reminders {due}: {e}")
+                continue
+
+            next_at = self.next_time()
+            timeout = None if next_at is None else (next_at - now).total_seconds()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+reminder_queue = ReminderQueue()
@@ -1,38 +1,146 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from services.reminder import get_due_reminders, deactivate_reminder
+from services.reminder import get_pending_reminders, claim_due_reminders, get_leased_reminders, deactivate_reminders, reschedule_reminders
+from services.recurrence import next_fire
+from services.reminder_queue import reminder_queue
+from services.ratelimit import telegram_limiter
+from services.delivery import deliver
 from aiogram import Bot
+from services.archive import archive_transactions
+from services.digest import send_monthly_digest, count_undelivered_digests
+from services.ledger import month_start, previous_month_start
+from config import (
+    REMINDER_SWEEP_SECONDS, ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL_HOURS, DIGEST_HOUR, DIGEST_LEASE_SECONDS, DIGEST_RETRY_HOURS
+)
+import asyncio
+import datetime
 import logging
+import os
+import socket
+import time
+import uuid
 
-async def send_due_reminders(bot: Bot):
-    # Send reminders that are due
+# Reminders delivered concurrently, and how many are deactivated per UPDATE
+REMINDER_CONCURRENCY = 20
+REMINDER_BATCH_SIZE = 500
+
+# Identifies this process in reminder claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def _deliver_reminder(bot: Bot, reminder, semaphore: asyncio.Semaphore) -> bool:
+    return await deliver(
+        reminder.user_id,
+        lambda: bot.send_message(reminder.user_id, f"🔔 Напоминание:\n\n{reminder.message}", parse_mode=None),
+        semaphore, f"reminder {reminder.id} to user {reminder.user_id}"
+    )
+
+async def send_due_reminders(bot: Bot, reminder_ids: list = None) -> dict:
+    # Claim due reminders in batches and deliver them; reminder_ids from the queue only trigger the run,
+    # the claim decides which rows this worker sends
+    stats = {'sent': 0, 'failed': 0, 'seconds': 0.0}
+    start = time.perf_counter()
     try:
-        reminders = get_due_reminders()
-        for r in reminders:
-            try:
-                await bot.send_message(
-                    r.user_id, 
-                    f"🔔 Напоминание:\n\n{r.message}",
-                    parse_mode=None
-                )
-                deactivate_reminder(r.id)
-                logging.info(f"Reminder sent to user {r.user_id}: {r.message}")
-            except Exception as e:
-                logging.error(f"Failed to send reminder {r.id} to user {r.user_id}: {e}")
-                # Deactivate reminder even if sending failed to avoid spam
-                deactivate_reminder(r.id)
+        semaphore = asyncio.Semaphore(REMINDER_CONCURRENCY)
+        while True:
+            batch = await claim_due_reminders(WORKER_ID, limit=REMINDER_BATCH_SIZE)
+            if not batch:
+                break
+            results = await asyncio.gather(*(_deliver_reminder(bot, r, semaphore) for r in batch))
+            sent = sum(results)
+            stats['sent'] += sent
+            stats['failed'] += len(batch) - sent
+            # Deactivate failed one-shot reminders too to avoid spam
+            await deactivate_reminders([r.id for r in batch if not r.recurrence], WORKER_ID)
+            
+            # Recurring reminders stay active and move to their next occurrence in place
+            now = datetime.datetime.now()
+            next_times = {r.id: next_fire(r.recurrence, r.remind_at, now) for r in batch if r.recurrence}
+            await reschedule_reminders(next_times, WORKER_ID)
+            for reminder_id, remind_at in next_times.items():
+                reminder_queue.push(reminder_id, remind_at)
+        
+        # Rows leased by another worker come back to us if its lease runs out
+        for reminder_id, expires_at in await get_leased_reminders():
+            reminder_queue.push(reminder_id, expires_at + datetime.timedelta(seconds=1))
     except Exception as e:
         logging.error(f"Error in send_due_reminders: {e}")
+    finally:
+        telegram_limiter.cleanup()
 
-scheduler = AsyncIOScheduler()
+    stats['seconds'] = time.perf_counter() - start
+    total = stats['sent'] + stats['failed']
+    if total:
+        logging.info(
+            f"Reminders delivered by {WORKER_ID}: sent={stats['sent']}, failed={stats['failed']}, "
+            f"time={stats['seconds']:.2f}s, rate={total / max(stats['seconds'], 1e-6):.1f} msg/s"
+        )
+    return stats
 
-def setup_scheduler(bot: Bot):
-    # Check for due reminders every minute
-    scheduler.add_job(
-        send_due_reminders, 
-        'interval', 
-        minutes=1, 
-        args=[bot],
-        id='reminder_job'
-    )
-    scheduler.start()
-    logging.info("Scheduler started for reminders") 
\ No newline at end of file
+async def load_pending_reminders():
+    # Put all active reminders into the in-memory queue
+    for reminder_id, remind_at in await get_pending_reminders():
+        reminder_queue.push(reminder_id, remind_at)
+
+async def _sweep_reminders(interval: int):
+    # Pick up reminders created by other bot processes
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_pending_reminders()
+        except Exception as e:
+            logging.error(f"Error reloading reminders: {e}")
+
+async def _archive_periodically(interval: int):
+    # Move cold transactions to the archive, in a thread because archival uses the sync engine
+    while True:
+        try:
+            await asyncio.to_thread(archive_transactions)
+        except Exception as e:
+            logging.error(f"Error archiving transactions: {e}")
+        await asyncio.sleep(interval)
+
+def next_digest_time(now: datetime.datetime) -> datetime.datetime:
+    # The 1st of the month at DIGEST_HOUR, this month's if still ahead
+    due = month_start(now).replace(hour=DIGEST_HOUR)
+    if now < due:
+        return due
+    return month_start(due + datetime.timedelta(days=32)).replace(hour=DIGEST_HOUR)
+
+async def _digest_monthly(bot: Bot):
+    # Catch up on a missed digest at startup (claims make reruns harmless), then run on every 1st;
+    # undelivered digests are retried each time their leases expire, for DIGEST_RETRY_HOURS
+    now = datetime.datetime.now()
+    if now < month_start(now).replace(hour=DIGEST_HOUR):
+        await asyncio.sleep((next_digest_time(now) - now).total_seconds())
+    while True:
+        pending = 0
+        try:
+            await send_monthly_digest(bot)
+            pending = await count_undelivered_digests(previous_month_start(datetime.datetime.now()))
+        except Exception as e:
+            logging.error(f"Error sending monthly digest: {e}")
+        now = datetime.datetime.now()
+        retry_until = month_start(now).replace(hour=DIGEST_HOUR) + datetime.timedelta(hours=DIGEST_RETRY_HOURS)
+        if pending and now < retry_until:
+            logging.info(f"{pending} monthly digests undelivered, retrying in {DIGEST_LEASE_SECONDS}s")
+            await asyncio.sleep(DIGEST_LEASE_SECONDS + 1)
+        else:
+            await asyncio.sleep((next_digest_time(now) - now).total_seconds())
+
+_background_tasks = set()
+
+def _start_task(coro):
+    # Keep a reference so the task is not garbage collected
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def setup_scheduler(bot: Bot):
+    # Load active reminders into the in-memory queue and fire each one exactly on time
+    await load_pending_reminders()
+    _start_task(reminder_queue.run(lambda ids: send_due_reminders(bot, ids)))
+    if REMINDER_SWEEP_SECONDS > 0:
+        _start_task(_sweep_reminders(REMINDER_SWEEP_SECONDS))
+    if ARCHIVE_AFTER_DAYS > 0 and ARCHIVE_INTERVAL_HOURS > 0:
+        _start_task(_archive_periodically(ARCHIVE_INTERVAL_HOURS * 3600))
+    _start_task(_digest_monthly(bot))
+    logging.info("Scheduler started for reminders")
@@ -0,0 +1,51 @@
+from database.db import session_scope
+from database.models import TelegramFile
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile
+from sqlalchemy import delete
+import hashlib
+import logging
+
+# How each kind is sent and where Telegram puts the file_id in the returned message
+SEND_METHODS = {
+    'photo': ('answer_photo', lambda msg: msg.photo[-1].file_id),
+    'document': ('answer_document', lambda msg: msg.document.file_id),
+}
+
+def content_hash(kind: str, filename: str, data: bytes) -> str:
+    digest = hashlib.sha256(f"{kind}:{filename}:".encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+async def get_file_id(hash_: str):
+    async with session_scope() as session:
+        record = await session.get(TelegramFile, hash_)
+        return record.file_id if record else None
+
+async def save_file_id(hash_: str, kind: str, file_id: str):
+    async with session_scope() as session:
+        await session.merge(TelegramFile(content_hash=hash_, kind=kind, file_id=file_id))
+        await session.flush()
+
+async def forget_file_id(hash_: str):
+    async with session_scope() as session:
+        await session.execute(delete(TelegramFile).where(TelegramFile.content_hash == hash_))
+
+async def send_cached_file(message, kind: str, data: bytes, filename: str, **kwargs):
+    """Send bytes as a photo or document, re-using Telegram's file_id if the same content was uploaded before"""
+    method_name, extract_file_id = SEND_METHODS[kind]
+    send = getattr(message, method_name)
+    hash_ = content_hash(kind, filename, data)
+
+    file_id = await get_file_id(hash_)
+    if file_id:
+        try:
+            return await send(file_id, **kwargs)
+        except TelegramBadRequest as e:
+            # file_id no longer valid (e.g. bot token changed), upload again
+            logging.warning(f"Cached file_id rejected for {filename}: {e}")
+            await forget_file_id(hash_)
+
+    sent = await send(BufferedInputFile(data, filename=filename), **kwargs)
+    await save_file_id(hash_, kind, extract_file_id(sent))
+    return sent
@@ -1,26 +1,41 @@
-from database.db import SessionLocal
-from database.models import Transaction, Category
+from database.db import SessionLocal, session_scope, commit_current
+from database.models import Transaction, ArchivedTransaction, Category
 from sqlalchemy.exc import NoResultFound
-import pandas as pd
-import matplotlib.pyplot as plt
 import io
 import datetime
-from services.crypto import encrypt_value, decrypt_value
-from services.user import get_user_currency, format_amount_with_currency, convert_to_user_currency
+from services.crypto import encrypt_value, decrypt_value, amount_bucket_token, bucket_token, bucket_range
+from services.user import get_user_currency, format_amount_with_currency, convert_currency, bump_data_version
+from services.ledger import record_transaction
+from services.goal import sync_goal_progress
+from services.projection import invalidate_forecast
+from database.write_queue import transaction_writer
+from reports.charts import render_pie_chart
+from reports.cache import chart_cache
+from config import CHART_DPI
 import logging
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, or_, func
+from typing import NamedTuple, Optional
 
-def copy_default_categories_for_user(user_id: int):
+# Number of amount buckets fetched per query when looking for largest transactions
+BUCKET_SCAN_STEP = 4
+# Rows per keyset page when streaming full history for exports
+EXPORT_BATCH_SIZE = 1000
+
+async def copy_default_categories_for_user(user_id: int):
     """Copy system default categories (user_id=0) to new user"""
-    with SessionLocal() as session:
-        # Get default categories
-        default_categories = session.query(Category).filter(Category.user_id == 0).all()
-        
+    async with session_scope() as session:
         # Check if user already has categories
-        user_categories = session.query(Category).filter(Category.user_id == user_id).first()
+        user_categories = (await session.execute(
+            select(Category.id).where(Category.user_id == user_id).limit(1)
+        )).first()
         if user_categories:
             return  # User already has categories
         
+        # Get default categories
+        default_categories = (await session.execute(
+            select(Category).where(Category.user_id == 0)
+        )).scalars().all()
+        
         # Copy default categories to user
         for default_cat in default_categories:
             user_category = Category(
@@ -30,169 +45,350 @@ def copy_default_categories_for_user(user_id: int):
             )
             session.add(user_category)
         
-        session.commit()
+        await session.flush()
         logging.info(f"Copied {len(default_categories)} default categories for user {user_id}")
 
-def get_categories(user_id: int, category_type: str = None):
+async def get_categories(user_id: int, category_type: str = None):
     """Get all categories from DB for specific user, optionally filtered by type"""
-    with SessionLocal() as session:
-        # First ensure user has default categories
-        copy_default_categories_for_user(user_id)
-        
-        query = session.query(Category).filter(Category.user_id == user_id)
+    # First ensure user has default categories
+    await copy_default_categories_for_user(user_id)
+    
+    async with session_scope() as session:
+        query = select(Category).where(Category.user_id == user_id)
         if category_type:
-            query = query.filter(Category.type == category_type)
-        return query.all()
+            query = query.where(Category.type == category_type)
+        return (await session.execute(query)).scalars().all()
 
-def add_transaction(user_id: int, amount, type_, category_id, description=None):
-    """Add new transaction to DB (amount encrypted)"""
-    with SessionLocal() as session:
+async def add_transaction(user_id: int, amount, type_, category_id, description=None):
+    """Add new transaction to DB (amount encrypted); returns the new transaction id.
+
+    The insert is committed through the shared group-commit writer together
+    with other concurrent inserts.
+    """
+    async with session_scope() as session:
         # Verify category belongs to user and matches transaction type
-        category = session.query(Category).filter(
-            Category.id == category_id, 
-            Category.user_id == user_id,
-            Category.type == type_
-        ).first()
-        if not category:
-            raise ValueError("Category not found, doesn't belong to user, or type mismatch")
-        
-        # Get user's current currency and save transaction in that currency
-        user_currency = get_user_currency(user_id)
-        
-        # Convert amount to user's preferred currency if needed
-        if user_currency != 'RUB':  # Assume input is in RUB, convert to user currency
-            try:
-                amount = convert_to_user_currency(amount, 'RUB', user_id)
-            except Exception as e:
-                logging.warning(f"Currency conversion failed for user {user_id}: {e}")
-        
-        enc_amount = encrypt_value(amount)
+        category = (await session.execute(
+            select(Category.id).where(
+                Category.id == category_id, 
+                Category.user_id == user_id,
+                Category.type == type_
+            )
+        )).first()
+    if not category:
+        raise ValueError("Category not found, doesn't belong to user, or type mismatch")
+    
+    # Get user's current currency and save transaction in that currency
+    user_currency = await get_user_currency(user_id)
+    
+    # Convert amount to user's preferred currency if needed
+    if user_currency != 'RUB':  # Assume input is in RUB, convert to user currency
+        try:
+            amount = await convert_currency(amount, 'RUB', user_currency)
+        except Exception as e:
+            logging.warning(f"Currency conversion failed for user {user_id}: {e}")
+    
+    enc_amount = encrypt_value(amount)
+    bucket = amount_bucket_token(user_id, amount)
+
+    async def write(session):
         transaction = Transaction(
             user_id=user_id,
             amount=enc_amount, 
             type=type_, 
             category_id=category_id,
             description=description,
-            currency=user_currency  # Save currency at time of transaction
+            currency=user_currency,  # Save currency at time of transaction
+            amount_bucket=bucket
         )
         session.add(transaction)
-        session.commit()
-        logging.info(f"Transaction added: user_id={user_id}, type={type_}, amount={amount}, category_id={category_id}")
-        return transaction
+        # Keep monthly ledger and goal progress up to date in the same commit
+        await record_transaction(session, user_id, type_, amount)
+        if type_ == 'income':
+            await sync_goal_progress(session, user_id)
+        await bump_data_version(session, user_id)
+        await session.flush()
+        return transaction.id
 
-def get_last_transactions(user_id: int, limit=10):
-    # Get last N transactions from DB for specific user (amount decrypted and converted to current currency)
-    with SessionLocal() as session:
-        txs = (
-            session.query(Transaction)
-            .options(joinedload(Transaction.category))
-            .filter(Transaction.user_id == user_id)
-            .order_by(Transaction.date.desc())
-            .limit(limit)
-            .all()
+    # The writer commits on its own connection: end this update's transaction first so it never waits on our locks
+    await commit_current()
+    transaction_id = await transaction_writer.submit(write)
+    invalidate_forecast(user_id)
+    logging.info(f"Transaction added: user_id={user_id}, type={type_}, amount={amount}, category_id={category_id}")
+    return transaction_id
+
+class TransactionRow(NamedTuple):
+    """Read-only transaction record with decrypted amount and category name"""
+    id: int
+    date: datetime.datetime
+    type: str
+    category: str
+    amount: float
+    currency: str
+    description: Optional[str]
+
+# Hot table first, then archived history (services/archive.py)
+TRANSACTION_TABLES = (Transaction, ArchivedTransaction)
+
+def _row_query(user_id: int, model=Transaction):
+    # Only the columns read paths need, category name via outer join instead of ORM objects
+    return (
+        select(
+            model.id, model.date, model.type, Category.name,
+            model.amount, model.currency, model.description
         )
-        
-        # Get user's current currency for conversion
-        current_currency = get_user_currency(user_id)
-        
-        for t in txs:
-            decrypted_amount = decrypt_value(t.amount)
-            
-            # Convert amount to current user currency if transaction was in different currency
-            transaction_currency = getattr(t, 'currency', current_currency)  # Default to current if no currency field
-            if transaction_currency != current_currency:
-                try:
-                    converted_amount = convert_to_user_currency(decrypted_amount, transaction_currency, user_id)
-                except Exception as e:
-                    logging.warning(f"Currency conversion failed for transaction {t.id}: {e}")
-                    converted_amount = decrypted_amount  # Use original amount if conversion fails
-            else:
-                converted_amount = decrypted_amount
+        .outerjoin(Category, model.category_id == Category.id)
+        .where(model.user_id == user_id)
+    )
+
+def _to_row(row, amount: float, currency: str = None) -> TransactionRow:
+    return TransactionRow(
+        row.id, row.date, row.type, row.name or 'No category',
+        amount, currency or row.currency, row.description
+    )
+
+async def _convert_rows(rows, current_currency: str, rates: dict) -> list:
+    # Decrypt amounts and convert them to current_currency, one rate lookup per stored currency (cached in rates)
+    result = []
+    for row in rows:
+        if row.currency not in rates:
+            # convert_currency falls back to the original amount (rate 1) if the lookup fails
+            rates[row.currency] = await convert_currency(1.0, row.currency, current_currency)
+        result.append(_to_row(row, decrypt_value(row.amount) * rates[row.currency], current_currency))
+    return result
+
+def _initial_rates(current_currency: str) -> dict:
+    return {current_currency: 1.0, None: 1.0}  # Rows without currency are treated as current
+
+async def _to_converted_rows(rows, user_id: int) -> list:
+    current_currency = await get_user_currency(user_id)
+    return await _convert_rows(rows, current_currency, _initial_rates(current_currency))
+
+async def iter_transaction_rows(user_id: int, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield a user's full history, oldest first, as lists of TransactionRow (converted to current currency).
+
+    Archived rows come first, then the hot table. Each batch is one keyset-paged
+    query (id > last seen id), so memory stays bounded by batch_size.
+    """
+    current_currency = await get_user_currency(user_id)
+    rates = _initial_rates(current_currency)
+    for model in (ArchivedTransaction, Transaction):
+        last_id = 0
+        while True:
+            async with session_scope() as session:
+                rows = (await session.execute(
+                    _row_query(user_id, model)
+                    .where(model.id > last_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                )).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            yield await _convert_rows(rows, current_currency, rates)
+            if len(rows) < batch_size:
+                break
+
+async def get_conversion_rates(user_id: int):
+    """(current currency, {stored currency: rate}) covering every currency in the user's history"""
+    current_currency = await get_user_currency(user_id)
+    rates = _initial_rates(current_currency)
+    currencies = set()
+    async with session_scope() as session:
+        for model in TRANSACTION_TABLES:
+            currencies.update((await session.execute(
+                select(model.currency).where(model.user_id == user_id).distinct()
+            )).scalars().all())
+    for currency in currencies - rates.keys():
+        rates[currency] = await convert_currency(1.0, currency, current_currency)
+    return current_currency, rates
+
+def iter_transaction_rows_sync(user_id: int, current_currency: str, rates: dict, batch_size: int = EXPORT_BATCH_SIZE):
+    """Blocking variant of iter_transaction_rows for worker processes.
+
+    Uses the sync engine and never touches the network: rates must come from
+    get_conversion_rates (unknown currencies are left unconverted).
+    """
+    with SessionLocal() as session:
+        for model in (ArchivedTransaction, Transaction):
+            last_id = 0
+            while True:
+                rows = session.execute(
+                    _row_query(user_id, model)
+                    .where(model.id > last_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                yield [
+                    _to_row(row, decrypt_value(row.amount) * rates.get(row.currency, 1.0), current_currency)
+                    for row in rows
+                ]
+                if len(rows) < batch_size:
+                    break
+
+async def get_text_column_lengths(user_id: int) -> dict:
+    # Longest category name and description over full history, e.g. for export column widths
+    lengths = {'category': 0, 'description': 0}
+    async with session_scope() as session:
+        for model in TRANSACTION_TABLES:
+            category, description = (await session.execute(
+                select(func.max(func.length(Category.name)), func.max(func.length(model.description)))
+                .select_from(model)
+                .outerjoin(Category, model.category_id == Category.id)
+                .where(model.user_id == user_id)
+            )).one()
+            lengths['category'] = max(lengths['category'], category or 0)
+            lengths['description'] = max(lengths['description'], description or 0)
+    return lengths
+
+async def get_last_transactions(user_id: int, limit=10) -> list:
+    # Get last N transactions for specific user as TransactionRow (amount converted to current currency);
+    # the archive is only read when the hot table has fewer than N rows
+    rows = []
+    async with session_scope() as session:
+        for model in TRANSACTION_TABLES:
+            rows.extend((await session.execute(
+                _row_query(user_id, model)
+                .order_by(model.date.desc())
+                .limit(limit - len(rows))
+            )).all())
+            if len(rows) >= limit:
+                break
+    return await _to_converted_rows(rows, user_id)
+
+async def get_transactions_by_amount(user_id: int, min_amount: float = None, max_amount: float = None, type_: str = None):
+    """Get transactions with stored amount within [min_amount, max_amount].
+
+    Candidates are narrowed through the amount bucket index, so only rows from
+    matching buckets (plus legacy rows without a bucket) are decrypted.
+    Amounts are compared in the currency they were stored in.
+    """
+    tokens = [bucket_token(user_id, b) for b in bucket_range(min_amount, max_amount)]
+    if not tokens:
+        return []
+    rows = []
+    async with session_scope() as session:
+        for model in TRANSACTION_TABLES:
+            query = _row_query(user_id, model).where(
+                or_(model.amount_bucket.in_(tokens), model.amount_bucket.is_(None))
+            )
+            if type_:
+                query = query.where(model.type == type_)
+            rows.extend((await session.execute(query)).all())
+    
+    result = []
+    for row in rows:
+        amount = decrypt_value(row.amount)
+        if min_amount is not None and amount < min_amount:
+            continue
+        if max_amount is not None and amount > max_amount:
+            continue
+        result.append(_to_row(row, amount))
+    result.sort(key=lambda t: t.amount, reverse=True)
+    return result
+
+async def get_largest_transactions(user_id: int, limit: int = 10, type_: str = None):
+    """Get N largest transactions by stored amount, scanning buckets from the top down"""
+    buckets = list(reversed(bucket_range()))
+    async with session_scope() as session:
+        candidates = []
+        for model in TRANSACTION_TABLES:
+            base_query = _row_query(user_id, model)
+            if type_:
+                base_query = base_query.where(model.type == type_)
             
-            t.amount = converted_amount
-        return txs
+            # Legacy rows without a bucket can be anywhere, so always include them
+            candidates.extend((await session.execute(
+                base_query.where(model.amount_bucket.is_(None))
+            )).all())
+            bucketed = 0
+            # One query per decade of buckets; stop once the fully scanned top buckets hold enough rows
+            step = BUCKET_SCAN_STEP
+            for i in range(0, len(buckets), step):
+                tokens = [bucket_token(user_id, b) for b in buckets[i:i + step]]
+                rows = (await session.execute(
+                    base_query.where(model.amount_bucket.in_(tokens))
+                )).all()
+                candidates.extend(rows)
+                bucketed += len(rows)
+                if bucketed >= limit:
+                    break
+    
+    result = [_to_row(row, decrypt_value(row.amount)) for row in candidates]
+    result.sort(key=lambda t: t.amount, reverse=True)
+    return result[:limit]
 
-def get_expense_stats_last_month(user_id: int):
-    """Get expense stats by category for the last month for specific user (amount decrypted and converted to current currency)"""
+def backfill_amount_buckets(batch_size: int = 500) -> int:
+    """Compute amount bucket tokens for transactions created before the bucket column existed"""
+    # One-off script, blocking
+    updated = 0
     with SessionLocal() as session:
-        month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
-        q = (
-            session.query(Transaction)
-            .options(joinedload(Transaction.category))
-            .filter(
-                Transaction.user_id == user_id,
+        while True:
+            txs = (
+                session.query(Transaction)
+                .filter(Transaction.amount_bucket.is_(None))
+                .limit(batch_size)
+                .all()
+            )
+            if not txs:
+                break
+            for t in txs:
+                t.amount_bucket = amount_bucket_token(t.user_id, decrypt_value(t.amount))
+            session.commit()
+            updated += len(txs)
+    logging.info(f"Backfilled amount buckets for {updated} transactions")
+    return updated
+
+async def get_expense_stats_last_month(user_id: int):
+    """Get expense stats by category for the last month for specific user (amount decrypted and converted to current currency)"""
+    month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
+    async with session_scope() as session:
+        rows = (await session.execute(
+            _row_query(user_id).where(
                 Transaction.type == 'expense', 
                 Transaction.date >= month_ago
             )
-            .all()
-        )
-        if not q:
-            return None, None
-        
-        # Get user's current currency for conversion
-        current_currency = get_user_currency(user_id)
-        
-        converted_data = []
-        for t in q:
-            decrypted_amount = decrypt_value(t.amount)
-            
-            # Convert amount to current user currency if transaction was in different currency
-            transaction_currency = getattr(t, 'currency', current_currency)  # Default to current if no currency field
-            if transaction_currency != current_currency:
-                try:
-                    converted_amount = convert_to_user_currency(decrypted_amount, transaction_currency, user_id)
-                except Exception as e:
-                    logging.warning(f"Currency conversion failed for transaction {t.id}: {e}")
-                    converted_amount = decrypted_amount  # Use original amount if conversion fails
-            else:
-                converted_amount = decrypted_amount
-            
-            converted_data.append({
-                'category': t.category.name if t.category else 'No category',
-                'amount': converted_amount
-            })
-        
-        df = pd.DataFrame(converted_data)
-        stats_series = df.groupby('category')['amount'].sum()
-        
-        # Convert pandas Series to regular dict to avoid numpy issues
-        stats_dict = stats_series.to_dict()
-        
-        # Prepare data for matplotlib
-        categories = list(stats_dict.keys())
-        amounts = list(stats_dict.values())
-        
-        # Generate pie chart with fixed matplotlib syntax
-        fig, ax = plt.subplots(figsize=(10, 8))
-        wedges, texts, autotexts = ax.pie(
-            amounts, 
-            labels=categories, 
-            autopct='%1.1f%%', 
-            startangle=90
-        )
-        user_currency_name = get_user_currency(user_id)
-        ax.set_title(f'Monthly Expenses by Category ({user_currency_name})', fontsize=14, fontweight='bold')
-        
-        # Improve text readability
-        for autotext in autotexts:
-            autotext.set_color('white')
-            autotext.set_fontweight('bold')
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
-        return stats_dict, buf
+        )).all()
+    if not rows:
+        return None, None
+    
+    converted_data = [
+        {'category': t.category, 'amount': t.amount}
+        for t in await _to_converted_rows(rows, user_id)
+    ]
+    
+    import pandas as pd  # Heavy; loaded on first use (or by the startup warm-up, see services/warmup.py)
+    df = pd.DataFrame(converted_data)
+    stats_series = df.groupby('category')['amount'].sum()
+    
+    # Convert pandas Series to regular dict to avoid numpy issues
+    stats_dict = stats_series.to_dict()
+    
+    # Pie chart renders in a report worker process, cached by its input data;
+    # amounts are rounded to cents so float noise does not change the key
+    user_currency_name = await get_user_currency(user_id)
+    png = await chart_cache.get_or_render(
+        render_pie_chart,
+        list(stats_dict.keys()),
+        [round(amount, 2) for amount in stats_dict.values()],
+        f'Monthly Expenses by Category ({user_currency_name})',
+        CHART_DPI
+    )
+    return stats_dict, io.BytesIO(png)
 
-def add_category(user_id: int, name: str, category_type: str):
+async def add_category(user_id: int, name: str, category_type: str):
     """Add new category to DB for specific user with type"""
-    with SessionLocal() as session:
+    async with session_scope() as session:
         # Check if category already exists for this user with same name and type
-        existing = session.query(Category).filter(
-            Category.user_id == user_id,
-            Category.name == name,
-            Category.type == category_type
-        ).first()
+        existing = (await session.execute(
+            select(Category).where(
+                Category.user_id == user_id,
+                Category.name == name,
+                Category.type == category_type
+            )
+        )).scalars().first()
         if existing:
             raise ValueError("Category already exists")
         
@@ -201,5 +397,5 @@ def add_category(user_id: int, name: str, category_type: str):
         
         category = Category(user_id=user_id, name=name, type=category_type)
         session.add(category)
-        session.commit()
-        return category 
\ No newline at end of file
+        await session.flush()
+        return category
@@ -0,0 +1,34 @@
+from reports.workers import warm_report_pool
+from config import STARTUP_WARMUP
+import asyncio
+import importlib
+import logging
+import time
+
+# Heavy modules the bot process imports lazily on first use (/stats, Excel export).
+# Warm-up loads them in a thread after polling has started, so neither start-up
+# nor the first user pays for them.
+LAZY_MODULES = ('pandas', 'openpyxl')
+# Imported by report worker processes for PDFs and charts
+WORKER_MODULES = ('reports.pdf', 'reports.charts', 'reports.pillow_charts')
+
+_task = None
+
+async def warm_up():
+    start = time.perf_counter()
+    for module in LAZY_MODULES:
+        await asyncio.to_thread(importlib.import_module, module)
+    workers = await warm_report_pool(WORKER_MODULES)
+    logging.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s: {', '.join(LAZY_MODULES)} loaded, {workers} report workers ready")
+
+async def start_warm_up():
+    """Dispatcher startup hook: run warm_up in the background (STARTUP_WARMUP=0 disables it)"""
+    global _task
+    if not STARTUP_WARMUP:
+        return
+    _task = asyncio.create_task(warm_up())
+    _task.add_done_callback(_log_failure)
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception():
+        logging.warning(f"Warm-up failed, modules will load on first use: {task.exception()}")
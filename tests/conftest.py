@@ -0,0 +1,44 @@
+from database.models import Base
+import database.db as db
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+import asyncio
+import inspect
+import pytest
+
+class SqliteDatabase:
+    """Temporary SQLite file with the full schema.
+
+    Session seeds and inspects rows synchronously; AsyncSession is what the
+    services use (the sqlite_db fixture installs it as db.AsyncSessionLocal).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        # No pooling: connections never outlive the event loop of the test that opened them
+        self.async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        self.AsyncSession = async_sessionmaker(self.async_engine, expire_on_commit=False)
+
+    def dispose(self):
+        self.engine.dispose()
+        self.async_engine.sync_engine.dispose()
+
+@pytest.fixture
+def sqlite_db(monkeypatch, tmp_path):
+    database = SqliteDatabase(tmp_path / "test.db")
+    monkeypatch.setattr(db, 'AsyncSessionLocal', database.AsyncSession)
+    yield database
+    database.dispose()
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    # async def tests run in a fresh event loop, fixtures are set up and torn down outside it
+    if inspect.iscoroutinefunction(pyfuncitem.obj):
+        funcargs = pyfuncitem.funcargs
+        asyncio.run(pyfuncitem.obj(**{name: funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}))
+        return True
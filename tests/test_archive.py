@@ -0,0 +1,53 @@
+from database.models import Transaction, ArchivedTransaction, MonthlyTotal
+from services.crypto import encrypt_value, decrypt_value
+from services.transaction import get_last_transactions
+import services.archive as archive
+import services.ledger as ledger
+import datetime
+
+async def test_archive_moves_old_rows_and_reads_stay_complete(monkeypatch, sqlite_db):
+    Session = sqlite_db.Session
+    monkeypatch.setattr(archive, 'SessionLocal', Session)
+    monkeypatch.setattr(ledger, 'SessionLocal', Session)
+    now = datetime.datetime.utcnow()
+    with Session() as session:
+        for days, amount in [(1, 10.0), (400, 20.0), (800, 30.0)]:
+            session.add(Transaction(user_id=1, amount=encrypt_value(amount), type="expense",
+                                    currency="USD", date=now - datetime.timedelta(days=days)))
+        session.commit()
+    ledger.rebuild_ledger()
+
+    # Recent rows are never archived, even with a tiny horizon
+    assert archive.archive_transactions(days=1, batch_size=1) == 2
+    with Session() as session:
+        assert session.query(Transaction).count() == 1
+        assert session.query(ArchivedTransaction).count() == 2
+        totals_before = sorted(decrypt_value(t) for (t,) in session.query(MonthlyTotal.total))
+    # Ledger stays correct when rebuilt from hot and archived rows
+    ledger.rebuild_ledger()
+    with Session() as session:
+        assert sorted(decrypt_value(t) for (t,) in session.query(MonthlyTotal.total)) == totals_before
+
+    recent = await get_last_transactions(1, limit=1)
+    everything = await get_last_transactions(1, limit=10)
+    assert [r.amount for r in recent] == [10.0]
+    assert [r.amount for r in everything] == [10.0, 20.0, 30.0]
+
+def test_archive_keeps_working_after_hot_table_empties(monkeypatch, sqlite_db):
+    Session = sqlite_db.Session
+    monkeypatch.setattr(archive, 'SessionLocal', Session)
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=400)
+
+    def add():
+        with Session() as session:
+            session.add(Transaction(user_id=1, amount=encrypt_value(1.0), type="expense", currency="USD", date=old))
+            session.commit()
+
+    add()
+    add()
+    assert archive.archive_transactions(days=1) == 2
+    # New ids continue after the archived ones instead of restarting at 1
+    add()
+    assert archive.archive_transactions(days=1) == 1
+    with Session() as session:
+        assert sorted(id_ for (id_,) in session.query(ArchivedTransaction.id)) == [1, 2, 3]
@@ -1,7 +1,14 @@
-from services.crypto import encrypt_value, decrypt_value
+from services.crypto import encrypt_value, decrypt_value, amount_bucket, amount_bucket_token, bucket_range
 
 def test_crypto_roundtrip():
     value = 1234.56
     enc = encrypt_value(value)
     dec = decrypt_value(enc)
-    assert abs(dec - value) < 1e-6 
\ No newline at end of file
+    assert abs(dec - value) < 1e-6 
+
+def test_amount_bucket_token():
+    assert amount_bucket(150) < amount_bucket(1500)
+    assert amount_bucket(150) in bucket_range(100, 200)
+    assert amount_bucket(150) not in bucket_range(1000, None)
+    assert amount_bucket_token(1, 150) == amount_bucket_token(1, 151)
+    assert amount_bucket_token(1, 150) != amount_bucket_token(2, 150)
@@ -0,0 +1,71 @@
+from database.models import User, Category, Transaction
+from services.crypto import encrypt_value
+from services.ratelimit import TelegramRateLimiter
+from services.scheduler import next_digest_time
+import database.db as db
+import services.delivery as delivery
+import services.digest as digest
+from sqlalchemy import update
+import datetime
+
+def test_next_digest_time():
+    assert next_digest_time(datetime.datetime(2026, 10, 1, 3, 0)) == datetime.datetime(2026, 10, 1, 9, 0)
+    assert next_digest_time(datetime.datetime(2026, 10, 19, 17, 0)) == datetime.datetime(2026, 11, 1, 9, 0)
+    assert next_digest_time(datetime.datetime(2026, 12, 1, 9, 0)) == datetime.datetime(2027, 1, 1, 9, 0)
+
+async def test_send_monthly_digest_batches_and_claims(monkeypatch, sqlite_db):
+    september = datetime.datetime(2026, 9, 10)
+    with sqlite_db.Session() as session:
+        for tid in (1, 2, 3, 4):
+            session.add(User(telegram_id=tid, preferred_currency='USD', digest_enabled=tid != 4))
+        food = Category(user_id=1, name="Food", type="expense")
+        session.add(food)
+        session.flush()
+        session.add_all([
+            Transaction(user_id=1, amount=encrypt_value(1000.0), type="income", currency="USD", date=september),
+            Transaction(user_id=1, amount=encrypt_value(30.0), type="expense", category_id=food.id, currency="USD", date=september),
+            Transaction(user_id=1, amount=encrypt_value(12.5), type="expense", currency="USD", date=september),
+            Transaction(user_id=1, amount=encrypt_value(999.0), type="expense", currency="USD", date=datetime.datetime(2026, 10, 2)),
+            Transaction(user_id=2, amount=encrypt_value(50.0), type="income", currency="USD", date=september),
+            Transaction(user_id=4, amount=encrypt_value(5.0), type="expense", currency="USD", date=september),
+        ])
+        session.commit()
+
+    sent = []
+    failures = {2}  # First send to user 2 fails
+
+    class FakeBot:
+        async def send_photo(self, chat_id, photo, caption):
+            sent.append((chat_id, 'photo', caption))
+
+        async def send_message(self, chat_id, text):
+            if chat_id in failures:
+                failures.discard(chat_id)
+                raise RuntimeError("Telegram unavailable")
+            sent.append((chat_id, 'text', text))
+
+    async def inline(fn, *args):
+        return fn(*args)
+
+    monkeypatch.setattr(digest, 'run_in_report_pool', inline)
+    monkeypatch.setattr(delivery, 'telegram_limiter', TelegramRateLimiter(global_rate=1000, per_chat_rate=1000))
+
+    today = datetime.datetime(2026, 10, 1, 9, 0)
+    first = await digest.send_monthly_digest(FakeBot(), today)
+    # A rerun (restart, second instance) sends nothing: delivered users are done, the failed one is leased
+    second = await digest.send_monthly_digest(FakeBot(), today)
+    assert await digest.count_undelivered_digests(datetime.datetime(2026, 9, 1)) == 1
+    # Once the lease expires the failed digest is sent again
+    async with db.session_scope() as session:
+        await session.execute(update(User).values(digest_claim_expires_at=datetime.datetime(2000, 1, 1)))
+    third = await digest.send_monthly_digest(FakeBot(), today)
+    assert await digest.count_undelivered_digests(datetime.datetime(2026, 9, 1)) == 0
+    assert first['users'] == 3 and first['sent'] == 1 and first['failed'] == 1 and first['skipped'] == 1
+    assert second['users'] == 0
+    assert third['users'] == 1 and third['sent'] == 1
+    by_user = {chat_id: (kind, text) for chat_id, kind, text in sent}
+    assert sorted(by_user) == [1, 2]
+    kind, text = by_user[1]
+    assert kind == 'photo'
+    assert "September 2026" in text and "Expenses: 42.50 $" in text and "• Food: 30.00 $" in text
+    assert by_user[2][0] == 'text'  # Income only, no chart
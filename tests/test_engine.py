@@ -0,0 +1,88 @@
+from database.engine import make_engine, sync_url, async_url
+from database.models import Category
+from handlers.middleware import CommitBeforeRequestMiddleware
+import database.db as db
+from sqlalchemy import event, select, text
+import asyncio
+
+def test_database_urls():
+    assert sync_url('sqlite:///finance.db') == 'sqlite:///finance.db'
+    assert async_url('sqlite:///finance.db') == 'sqlite+aiosqlite:///finance.db'
+    assert async_url('postgresql://bot:secret@db/finance') == 'postgresql+asyncpg://bot:secret@db/finance'
+    assert sync_url('postgresql+asyncpg://bot@db/finance') == 'postgresql+psycopg2://bot@db/finance'
+
+def test_sqlite_wal_profile(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'profile.db'}", 'wal')
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    engine.dispose()
+
+async def test_unit_of_work_shares_session_and_commits_once(sqlite_db):
+    commits = []
+    event.listen(sqlite_db.async_engine.sync_engine, "commit", lambda conn: commits.append(1))
+
+    async def add(name):
+        async with db.session_scope() as session:
+            session.add(Category(user_id=1, name=name, type='expense'))
+            await session.flush()
+            return session
+
+    async with db.unit_of_work() as outer:
+        assert await add('a') is outer
+        assert await add('b') is outer
+    assert len(commits) == 1
+
+    # A failing update rolls back everything it wrote
+    try:
+        async with db.unit_of_work():
+            await add('c')
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    async with db.session_scope() as session:
+        names = (await session.execute(select(Category.name))).scalars().all()
+    assert sorted(names) == ['a', 'b']
+
+async def test_unit_of_work_commits_before_telegram_calls(sqlite_db):
+    committed = []
+
+    async def add(name, fail=False):
+        async with db.session_scope() as session:
+            session.add(Category(user_id=1, name=name, type='expense'))
+            await session.flush()
+            db.after_commit(lambda: committed.append(name))
+            if fail:
+                raise ValueError(name)
+
+    async def make_request(bot, method):
+        # Nothing of the update is left uncommitted while Telegram is called
+        assert not db._current_session.get().in_transaction()
+        return 'sent'
+
+    async with db.unit_of_work():
+        await add('a')
+        assert committed == []
+        assert await CommitBeforeRequestMiddleware()(make_request, None, None) == 'sent'
+        assert committed == ['a']
+        # A handler catching a service error must not commit that service's partial write
+        try:
+            await add('b', fail=True)
+        except ValueError:
+            pass
+    async with db.session_scope() as session:
+        names = (await session.execute(select(Category.name))).scalars().all()
+    assert (names, committed) == (['a'], ['a'])
+
+async def test_background_task_starts_outside_unit_of_work(monkeypatch, sqlite_db):
+    create_task = asyncio.create_task
+    # Python 3.10 signature: no context argument
+    monkeypatch.setattr(asyncio, 'create_task', lambda coro, *, name=None: create_task(coro, name=name))
+
+    async def current_session():
+        return db._current_session.get()
+
+    async with db.unit_of_work() as session:
+        assert await current_session() is session
+        assert await db.create_background_task(current_session()) is None
@@ -0,0 +1,236 @@
+from database.models import Transaction, ArchivedTransaction, Category
+from services.crypto import encrypt_value
+from services.transaction import iter_transaction_rows
+from services.telegram_files import send_cached_file
+from reports.export import export_excel
+from reports.stream import export_stream
+from reports.cache import ReportCache, ChartCache
+from reports.jobs import ReportJobQueue
+from reports.charts import render_pie_chart
+import services.transaction as transaction_service
+import reports.cache as cache_module
+import reports.charts as charts
+import reports.pdf as pdf
+import reports.pillow_charts as pillow_charts
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendDocument
+from aiogram.types import BufferedInputFile
+from PIL import Image
+from types import SimpleNamespace
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import openpyxl
+import pytest
+
+def _populate(database, rows: int):
+    with database.Session() as session:
+        cat = Category(user_id=1, name="Groceries and household", type="expense")
+        session.add(cat)
+        session.flush()
+        start = datetime.datetime(2024, 1, 1)
+        # Oldest row lives in the archive, like after services/archive.py ran
+        session.add(ArchivedTransaction(id=1, user_id=1, amount=encrypt_value(100.0), type="income",
+                                        currency="USD", date=start))
+        for i in range(2, rows + 1):
+            session.add(Transaction(id=i, user_id=1, amount=encrypt_value(1.0), type="expense",
+                                    category_id=cat.id, currency="USD",
+                                    date=start + datetime.timedelta(days=i), description="x" * (i % 30)))
+        session.add(Transaction(user_id=2, amount=encrypt_value(5.0), type="expense", currency="USD"))
+        session.commit()
+
+async def test_iter_transaction_rows_pages_full_history(sqlite_db):
+    _populate(sqlite_db, 25)
+    batches = [batch async for batch in iter_transaction_rows(1, batch_size=7)]
+    ids = [t.id for batch in batches for t in batch]
+    assert ids == list(range(1, 26))
+    assert max(len(batch) for batch in batches) == 7
+
+async def test_export_excel_streams_all_rows(sqlite_db):
+    _populate(sqlite_db, 2500)
+    wb = openpyxl.load_workbook(await export_excel(1))
+    ws = wb["Transactions"]
+    rows = list(ws.values)
+    assert rows[1][2] == "Income" and rows[2][1] == "Groceries and household"
+    assert len([r for r in rows if r[2] in ("Income", "Expense")]) == 2500
+    assert rows[-1][0] == "Balance:" and rows[-1][3] == 100.0 - 2499
+    assert ws.column_dimensions["B"].width == len("Groceries and household") + 2
+
+def test_history_pdf_month_subtotals_in_one_pass(monkeypatch, sqlite_db):
+    _populate(sqlite_db, 120)
+    monkeypatch.setattr(transaction_service, 'SessionLocal', sqlite_db.Session)
+    subtotals = []
+    original = pdf._PagedTable.subtotal
+    def record(self, label, income, expense):
+        subtotals.append((label, income, expense))
+        original(self, label, income, expense)
+    monkeypatch.setattr(pdf._PagedTable, 'subtotal', record)
+
+    data = pdf.render_history_pdf(1, "USD", {"USD": 1.0, None: 1.0})
+    assert data.startswith(b"%PDF")
+    assert subtotals[0] == ("Subtotal 2024-01", 100.0, 29.0)  # Archived income plus days 2..30
+    assert [label for label, _, _ in subtotals][-1] == "Subtotal 2024-04"
+    assert sum(expense for _, _, expense in subtotals) == 119.0
+    assert pdf.render_history_pdf(3, "USD", {}) is None
+
+async def _export_stream(fmt):
+    file, stats = await export_stream(1, fmt)
+    data = b"".join([chunk async for chunk in file.read(None)])
+    return file, stats, data
+
+async def test_export_csv_gz_stream(sqlite_db):
+    _populate(sqlite_db, 1500)
+    file, stats, data = await _export_stream('csv')
+    rows = list(csv.reader(io.StringIO(gzip.decompress(data).decode('utf-8'))))
+    assert rows[0] == ['id', 'date', 'type', 'category', 'amount', 'currency', 'description']
+    assert len(rows) == 1501 and stats['rows'] == 1500
+    assert rows[1][2:6] == ['income', 'No category', '100.00', 'USD']
+    assert file.filename.endswith('.csv.gz') and file.file.closed
+
+async def test_export_parquet_stream(sqlite_db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    _populate(sqlite_db, 1500)
+    file, stats, data = await _export_stream('parquet')
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 1500
+    assert sum(table.column('amount').to_pylist()) == 100.0 + 1499
+
+async def test_report_cache_versions_lru_and_disk(monkeypatch, tmp_path):
+    versions = {1: 0, 2: 0}
+    builds = []
+
+    async def fake_version(user_id):
+        return versions.get(user_id)
+
+    async def build(user_id):
+        builds.append(user_id)
+        return io.BytesIO(b"x" * 60)
+
+    monkeypatch.setattr(cache_module, 'get_data_version', fake_version)
+    cache = ReportCache(max_bytes=100, directory=str(tmp_path / "reports"))
+
+    await cache.get_or_build(1, 'pdf', build)
+    assert (await cache.get_or_build(1, 'pdf', build)).read() == b"x" * 60
+    assert builds == [1]
+    versions[1] += 1  # New transaction
+    await cache.get_or_build(1, 'pdf', build)
+    assert builds == [1, 1]
+    # Second user's report evicts the first from memory, disk tier still serves it
+    await cache.get_or_build(2, 'pdf', build)
+    assert cache.get(1, 'pdf', 1) is None
+    await cache.get_or_build(1, 'pdf', build)
+    assert builds == [1, 1, 2]
+    assert sorted(p.name for p in (tmp_path / "reports").iterdir()) == ["1_pdf_1.bin", "2_pdf_0.bin"]
+    # Users without a row are never cached
+    await cache.get_or_build(3, 'pdf', build)
+    await cache.get_or_build(3, 'pdf', build)
+    assert builds == [1, 1, 2, 3, 3]
+
+def test_report_cache_disk_write_is_atomic(monkeypatch, tmp_path):
+    cache = ReportCache(max_bytes=100, directory=str(tmp_path / "reports"))
+    cache._write_disk(1, 'pdf', 0, b"v0")
+
+    def crash(fd, mode):
+        cache_module.os.close(fd)
+        raise OSError("disk full")
+
+    # A write that dies midway leaves neither a partial report nor a temp file
+    monkeypatch.setattr(cache_module.os, 'fdopen', crash)
+    with pytest.raises(OSError):
+        cache._write_disk(1, 'pdf', 1, b"v1")
+    assert list((tmp_path / "reports").iterdir()) == []
+    assert cache._read_disk(1, 'pdf', 1) is None
+
+async def test_send_cached_file_reuses_file_id(sqlite_db):
+    _populate(sqlite_db, 1)
+    sent = []
+    stale = set()
+
+    class FakeMessage:
+        async def answer_document(self, document, **kwargs):
+            sent.append(document)
+            if document in stale:
+                raise TelegramBadRequest(method=SendDocument(chat_id=1, document=document), message="wrong file identifier")
+            file_id = f"file-{len(sent)}" if isinstance(document, BufferedInputFile) else document
+            return SimpleNamespace(document=SimpleNamespace(file_id=file_id))
+
+    message = FakeMessage()
+    await send_cached_file(message, 'document', b"report v1", "report.pdf")
+    await send_cached_file(message, 'document', b"report v1", "report.pdf")
+    await send_cached_file(message, 'document', b"report v2", "report.pdf")
+    # A rejected file_id is forgotten and the content uploaded again
+    stale.add("file-1")
+    await send_cached_file(message, 'document', b"report v1", "report.pdf")
+    await send_cached_file(message, 'document', b"report v1", "report.pdf")
+    uploads = [isinstance(d, BufferedInputFile) for d in sent]
+    assert uploads == [True, False, True, False, True, False]
+    assert sent[-1] == "file-5"
+
+async def test_report_job_queue_limits_concurrency_and_dedupes():
+    queue = ReportJobQueue(concurrency=2, max_pending=2)
+    running = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def job():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+
+    positions = []
+    for user_id in (1, 2, 3, 4):
+        positions.append(queue.submit((user_id, 'pdf'), job))
+        await asyncio.sleep(0)  # Let a free worker pick the job up
+    assert positions == [0, 0, 1, 2]
+    # Same user and format again while in flight
+    assert queue.submit((1, 'pdf'), job) is None
+    # Another format of the same user is a separate job
+    with pytest.raises(asyncio.QueueFull):
+        queue.submit((1, 'excel'), job)
+    await asyncio.sleep(0.01)
+    assert running == 2
+    release.set()
+    await queue._queue.join()
+    assert not queue.is_active((1, 'pdf'))
+    assert queue.submit((1, 'pdf'), job) == 0
+    await queue._queue.join()
+    await queue.close()
+    assert peak == 2 and queue.completed == 5
+
+async def test_chart_cache_renders_once_per_input(monkeypatch):
+    renders = []
+
+    async def inline(fn, *args):
+        renders.append(args)
+        return fn(*args)
+
+    monkeypatch.setattr(cache_module, 'run_in_report_pool', inline)
+    cache = ChartCache(max_bytes=10**6)
+
+    first = await cache.get_or_render(render_pie_chart, ["Food", "Rent"], [30.0, 70.0], "Expenses", 50)
+    again = await cache.get_or_render(render_pie_chart, ["Food", "Rent"], [30.0, 70.0], "Expenses", 50)
+    other = await cache.get_or_render(render_pie_chart, ["Food", "Rent"], [31.0, 70.0], "Expenses", 50)
+    assert first.startswith(b"\x89PNG") and again == first and other != first
+    assert len(renders) == 2 and cache.hits == 1
+
+def test_chart_backends_and_fallback(monkeypatch):
+    calls = []
+    original = pillow_charts.render_pie
+    monkeypatch.setattr(pillow_charts, 'render_pie', lambda *args: calls.append(args) or original(*args))
+    monkeypatch.setattr(charts, 'PIE_CHART_BACKEND', 'pillow')
+
+    png = charts.render_pie_chart(["Продукты", "Rent"], [30.0, 70.0], "Expenses", 50)
+    assert Image.open(io.BytesIO(png)).size == (500, 400) and len(calls) == 1
+    bar = charts.render_bar_chart(["A", "B", "C"], [1.0, 2.5, 0.0], "Bars", 50)
+    assert Image.open(io.BytesIO(bar)).size == (500, 400)
+
+    # Too many slices for the simple layout, and the matplotlib setting, both use matplotlib
+    labels = [f"Category {i}" for i in range(charts.PILLOW_MAX_ITEMS + 1)]
+    assert charts.render_pie_chart(labels, [1.0] * len(labels), "Many", 50).startswith(b"\x89PNG")
+    monkeypatch.setattr(charts, 'PIE_CHART_BACKEND', 'matplotlib')
+    assert charts.render_pie_chart(["A"], [1.0], "One", 50).startswith(b"\x89PNG")
+    assert len(calls) == 1
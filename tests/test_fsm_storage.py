@@ -0,0 +1,89 @@
+from database.models import FSMState
+from database.fsm_storage import SQLStorage, storage_key
+from aiogram.fsm.storage.base import StorageKey
+import asyncio
+import datetime
+
+async def test_sql_storage_caches_reads_and_survives_restart(sqlite_db):
+    factory = sqlite_db.AsyncSession
+    key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+    other = StorageKey(bot_id=1, chat_id=20, user_id=20)
+
+    storage = SQLStorage(factory, flush_interval=0.01)
+    assert await storage.get_state(key) is None
+    await storage.set_state(key, "TransactionState:waiting_for_amount")
+    assert await storage.update_data(key, {'type': 'income'}) == {'type': 'income'}
+    assert await storage.update_data(key, {'amount': 12.5}) == {'type': 'income', 'amount': 12.5}
+    await storage.set_state(other, "GoalState:waiting_for_name")
+    # Only the first read of each key touches the database
+    assert storage.loads == 2
+    # The background task writes both keys in one transaction (first connection can be slow)
+    for _ in range(200):
+        if storage.flushes:
+            break
+        await asyncio.sleep(0.01)
+    assert storage.flushes == 1
+
+    # Finished dialogs are removed; pending writes are flushed on close
+    await storage.set_state(other, None)
+    await storage.close()
+
+    restarted = SQLStorage(factory, flush_interval=0.01)
+    assert await restarted.get_state(key) == "TransactionState:waiting_for_amount"
+    assert await restarted.get_data(key) == {'type': 'income', 'amount': 12.5}
+    assert await restarted.get_state(other) is None
+
+    # Stale dialogs read as empty and are swept
+    with sqlite_db.Session() as session:
+        session.get(FSMState, storage_key(key)).updated_at -= datetime.timedelta(hours=25)
+        session.commit()
+    expiring = SQLStorage(factory, ttl_hours=24)
+    assert await expiring.get_data(key) == {}
+    assert await expiring.sweep() == 1
+    with sqlite_db.Session() as session:
+        assert session.query(FSMState).count() == 0
+
+class _SlowSession:
+    # Session whose query results arrive after a delay, to interleave concurrent loads deterministically
+    def __init__(self, session, delay: float):
+        self.session = session
+        self.delay = delay
+
+    async def __aenter__(self):
+        await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self.session.__aexit__(*exc)
+
+    async def execute(self, *args, **kwargs):
+        result = await self.session.execute(*args, **kwargs)
+        await asyncio.sleep(self.delay)
+        return result
+
+    async def commit(self):
+        await self.session.commit()
+
+async def test_sql_storage_concurrent_loads_and_shared_state(sqlite_db):
+    factory = sqlite_db.AsyncSession
+    key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+    # The first (slow) cold load must not overwrite a state set while it was reading
+    delays = [0.1]
+    storage = SQLStorage(lambda: _SlowSession(factory(), delays.pop() if delays else 0), flush_interval=0.01)
+    await asyncio.gather(storage.get_state(key), storage.set_state(key, "GoalState:waiting_for_name"))
+    assert await storage.get_state(key) == "GoalState:waiting_for_name"
+    await storage.close()
+
+    # Webhook defaults: no cache, write-through, so two processes see each other's changes at once
+    first = SQLStorage(factory, flush_interval=0, cache_seconds=0)
+    second = SQLStorage(factory, flush_interval=0, cache_seconds=0)
+    assert await second.get_state(key) == "GoalState:waiting_for_name"
+    await first.set_state(key, "GoalState:waiting_for_amount")
+    await first.update_data(key, {'name': 'Car'})
+    assert await second.get_state(key) == "GoalState:waiting_for_amount"
+    assert await second.update_data(key, {'target_amount': 100.0}) == {'name': 'Car', 'target_amount': 100.0}
+    assert await first.get_data(key) == {'name': 'Car', 'target_amount': 100.0}
+    await first.close()
+    await second.close()
+
@@ -1,7 +1,11 @@
 from database.models import Base, Goal
+from services.goal import apply_income_to_goals
+from services.projection import _forecast
+import services.projection as projection
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import datetime
+import numpy as np
 
 def test_add_and_get_goal():
     engine = create_engine('sqlite:///:memory:')
@@ -13,4 +17,42 @@ def test_add_and_get_goal():
     session.commit()
     goal = session.query(Goal).first()
     assert goal.name == "TestGoal"
-    assert goal.target_amount == 1000 
\ No newline at end of file
+    assert goal.target_amount == 1000 
+
+def test_apply_income_to_goals():
+    goals = [
+        Goal(name="Small", target_amount=100, current_amount=0, achieved=False),
+        Goal(name="Big", target_amount=1000, current_amount=0, achieved=False),
+        Goal(name="Done", target_amount=50, current_amount=50, achieved=True),
+    ]
+    apply_income_to_goals(goals, 400)
+    assert goals[0].current_amount == 100 and goals[0].achieved
+    assert goals[1].current_amount == 200 and not goals[1].achieved
+    assert goals[2].current_amount == 50
+
+
+def test_forecast_follows_linear_trend():
+    forecast = _forecast(np.array([0, 0, 100, 200, 300]))
+    assert abs(forecast[0] - 400) < 1e-6
+    assert abs(forecast[1] - 500) < 1e-6
+
+async def test_forecast_cache_is_bounded_and_monthly(monkeypatch):
+    loads = []
+
+    async def fake_net(user_id):
+        loads.append(user_id)
+        return np.array([100.0, 200.0])
+
+    month = [datetime.datetime(2026, 9, 1)]
+    monkeypatch.setattr(projection, 'get_monthly_net', fake_net)
+    monkeypatch.setattr(projection, 'month_start', lambda date: month[0])
+    monkeypatch.setattr(projection, 'FORECAST_CACHE_SIZE', 2)
+    monkeypatch.setattr(projection, '_forecast_cache', projection.OrderedDict())
+
+    for user_id in (1, 2, 1, 3, 1, 2):
+        await projection.get_forecast(user_id)
+    month[0] = datetime.datetime(2026, 10, 1)
+    await projection.get_forecast(1)
+    # 2 was least recently used when 3 arrived; a new month recomputes
+    assert loads == [1, 2, 3, 2, 1]
+    assert len(projection._forecast_cache) == 2
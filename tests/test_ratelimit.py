@@ -0,0 +1,56 @@
+from services.ratelimit import TokenBucket, TelegramRateLimiter
+import services.delivery as delivery
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+import asyncio
+import time
+
+async def test_token_bucket_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        await bucket.acquire()
+    # First token is available immediately, the next five take 20 ms each
+    assert 0.09 <= time.monotonic() - start < 0.3
+
+async def test_per_chat_limit_does_not_block_other_chats():
+    limiter = TelegramRateLimiter(global_rate=100, per_chat_rate=5)
+    start = time.monotonic()
+    await asyncio.gather(*(limiter.acquire(chat_id) for chat_id in range(10)))
+    assert time.monotonic() - start < 0.1
+
+async def test_busy_chat_does_not_hold_delivery_slots(monkeypatch):
+    monkeypatch.setattr(delivery, 'telegram_limiter', TelegramRateLimiter(global_rate=1000, per_chat_rate=10))
+    sent = {}
+    semaphore = asyncio.Semaphore(2)
+    start = time.monotonic()
+
+    def send(chat_id):
+        async def call():
+            sent.setdefault(chat_id, []).append(time.monotonic() - start)
+        return call
+
+    # Chat 1 has five messages due at once, paced at 10/s; chat 2 must not queue behind them
+    await asyncio.gather(*(delivery.deliver(chat_id, send(chat_id), semaphore, f"message to {chat_id}")
+                           for chat_id in [1, 1, 1, 1, 1, 2]))
+    assert len(sent[1]) == 5
+    assert sent[2][0] < 0.05
+
+async def test_retry_after_pauses_every_sender(monkeypatch):
+    limiter = TelegramRateLimiter(global_rate=1000, per_chat_rate=1000)
+    monkeypatch.setattr(delivery, 'telegram_limiter', limiter)
+    calls = []
+    start = time.monotonic()
+
+    async def flooded():
+        calls.append(time.monotonic() - start)
+        if len(calls) == 1:
+            error = TelegramRetryAfter(method=SendMessage(chat_id=1, text='x'), message='Too Many Requests', retry_after=1)
+            error.retry_after = 0.2
+            raise error
+
+    assert await delivery.deliver(1, flooded, asyncio.Semaphore(5), "message to 1")
+    # Another chat sending after the flood warning waits for the pause too
+    await limiter.acquire(2)
+    assert time.monotonic() - start >= 0.2
+    assert len(calls) == 2 and calls[1] >= 0.2
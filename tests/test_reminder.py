@@ -1,6 +1,10 @@
 from database.models import Base, Reminder
+from services.reminder_queue import ReminderQueue
+from services.recurrence import next_fire, make_rule, MONTHLY
+import services.reminder as reminder_service
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+import asyncio
 import datetime
 
 def test_add_and_get_reminder():
@@ -13,4 +17,76 @@ def test_add_and_get_reminder():
     session.commit()
     rem = session.query(Reminder).first()
     assert rem.message == "Test"
-    assert rem.is_active 
\ No newline at end of file
+    assert rem.is_active 
+
+def test_reminder_queue_order_and_discard():
+    now = datetime.datetime.now()
+    queue = ReminderQueue()
+    queue.push(1, now + datetime.timedelta(minutes=5))
+    queue.push(2, now - datetime.timedelta(minutes=1))
+    queue.push(3, now - datetime.timedelta(minutes=2))
+    queue.discard(2)
+    assert queue.pop_due(now) == [3]
+    assert queue.next_time() == now + datetime.timedelta(minutes=5)
+    queue.push(1, now - datetime.timedelta(seconds=1))  # rescheduled earlier
+    assert queue.pop_due(now) == [1]
+    assert queue.next_time() is None
+
+def test_reminder_queue_reload_does_not_grow_heap():
+    remind_at = datetime.datetime.now() + datetime.timedelta(hours=1)
+    queue = ReminderQueue()
+    for _ in range(100):  # Every sweep pushes all pending reminders again
+        queue.push(1, remind_at)
+        queue.push(2, remind_at)
+    assert len(queue) == 2
+    assert len(queue._heap) == 2
+
+
+async def test_reminder_queue_fires_on_time():
+    queue = ReminderQueue()
+    fired = []
+    fire_at = datetime.datetime.now() + datetime.timedelta(milliseconds=200)
+
+    async def callback(ids):
+        fired.append((ids, datetime.datetime.now()))
+
+    task = asyncio.create_task(queue.run(callback))
+    await asyncio.sleep(0.05)
+    queue.push(7, fire_at)  # pushed while runner is idle
+    await asyncio.sleep(0.4)
+    task.cancel()
+    assert [ids for ids, _ in fired] == [[7]]
+    assert fired[0][1] >= fire_at
+    assert (fired[0][1] - fire_at).total_seconds() < 0.1
+
+
+def test_next_fire_closed_form():
+    last = datetime.datetime(2025, 1, 31, 9, 0)
+    rule = make_rule(MONTHLY, last)
+    assert next_fire(rule, last, last) == datetime.datetime(2025, 2, 28, 9, 0)
+    assert next_fire(rule, datetime.datetime(2025, 2, 28, 9, 0), datetime.datetime(2025, 2, 28, 9, 0)) == datetime.datetime(2025, 3, 31, 9, 0)
+    # Bot was down for months: missed occurrences are skipped
+    assert next_fire(rule, last, datetime.datetime(2025, 6, 1)) == datetime.datetime(2025, 6, 30, 9, 0)
+    assert next_fire('daily', last, datetime.datetime(2025, 2, 10, 12, 0)) == datetime.datetime(2025, 2, 11, 9, 0)
+    assert next_fire('weekly', last, last) == datetime.datetime(2025, 2, 7, 9, 0)
+
+
+async def test_claim_due_reminders_is_exclusive(sqlite_db):
+    now = datetime.datetime.now()
+    with sqlite_db.Session() as session:
+        session.add_all([Reminder(user_id=i, message="m", remind_at=now) for i in range(3)])
+        session.add(Reminder(user_id=9, message="later", remind_at=now + datetime.timedelta(hours=1)))
+        session.commit()
+
+    claimed = await reminder_service.claim_due_reminders("w1", lease_seconds=60)
+    assert sorted(r.user_id for r in claimed) == [0, 1, 2]
+    assert await reminder_service.claim_due_reminders("w2", lease_seconds=60) == []
+    # Only the owner can complete its claim
+    assert await reminder_service.deactivate_reminders([r.id for r in claimed], "w2") == 0
+    assert await reminder_service.deactivate_reminders([r.id for r in claimed[:1]], "w1") == 1
+
+    # Expired lease can be taken over
+    with sqlite_db.Session() as session:
+        session.query(Reminder).update({Reminder.claim_expires_at: now - datetime.timedelta(seconds=1)})
+        session.commit()
+    assert len(await reminder_service.claim_due_reminders("w2", lease_seconds=60)) == 2
@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Generous default for slow CI machines; tighten with STARTUP_BUDGET_SECONDS
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '10'))
+
+def test_time_to_first_update_within_budget():
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', 'bench_startup.py'), '1', '--budget', str(STARTUP_BUDGET_SECONDS)],
+        capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "replies: ['SendMessage']" in result.stdout
+    # pandas, openpyxl, reportlab and matplotlib load lazily or in the background warm-up
+    assert "Heavy modules imported at start-up: none" in result.stdout
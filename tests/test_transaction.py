@@ -1,6 +1,12 @@
-from database.models import Base, Transaction, Category
-from sqlalchemy import create_engine
+from database.models import Base, Transaction, ArchivedTransaction, Category
+from database.write_queue import WriteQueue
+from services.crypto import encrypt_value, amount_bucket_token
+from services.transaction import (
+    get_last_transactions, get_transactions_by_amount, get_largest_transactions, TransactionRow
+)
+from sqlalchemy import create_engine, select, func
 from sqlalchemy.orm import sessionmaker
+import asyncio
 import datetime
 
 def test_add_and_get_transaction():
@@ -16,4 +22,101 @@ def test_add_and_get_transaction():
     session.commit()
     tx = session.query(Transaction).first()
     assert tx.type == "income"
-    assert tx.category_id == cat.id 
\ No newline at end of file
+    assert tx.category_id == cat.id 
+
+async def test_write_queue_groups_commits_and_isolates_failures(sqlite_db):
+    queue = WriteQueue(sqlite_db.AsyncSession, max_batch=50, max_delay=0.05)
+
+    def insert(i):
+        async def work(session):
+            cat = Category(user_id=1, name=f"Cat {i}", type="expense")
+            session.add(cat)
+            await session.flush()
+            return cat.id
+
+        return work
+
+    async def broken(session):
+        session.add(Transaction(amount=b"1", type="expense"))  # user_id is required
+        await session.flush()
+
+    ids = await asyncio.gather(*(queue.submit(insert(i)) for i in range(20)))
+    grouped_batches = queue.batches
+    mixed = await asyncio.gather(
+        queue.submit(insert(20)), queue.submit(broken), queue.submit(insert(21)),
+        return_exceptions=True
+    )
+    await queue.close()
+    async with sqlite_db.AsyncSession() as session:
+        count = (await session.execute(select(func.count(Category.id)))).scalar()
+    assert len(set(ids)) == 20
+    assert grouped_batches == 1
+    # A failing write only fails its own caller
+    assert isinstance(mixed[0], int) and isinstance(mixed[2], int)
+    assert isinstance(mixed[1], Exception)
+    assert count == 22
+
+
+async def test_write_queue_never_strands_callers(sqlite_db):
+    queue = WriteQueue(sqlite_db.AsyncSession, max_batch=50, max_delay=0.05)
+
+    async def work(session):
+        session.add(Category(user_id=1, name="Food", type="expense"))
+        await session.flush()
+        return 'ok'
+
+    # The writer dies while collecting a batch: its callers fail instead of waiting forever
+    pending = [asyncio.ensure_future(queue.submit(work)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    queue._task.cancel()
+    results = await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), 1)
+    # The next write starts a new writer
+    after = await asyncio.wait_for(queue.submit(work), 1)
+    await queue.close()
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert after == 'ok'
+
+async def test_last_transactions_are_plain_rows(sqlite_db):
+    with sqlite_db.Session() as session:
+        cat = Category(user_id=1, name="Food", type="expense")
+        session.add(cat)
+        session.flush()
+        now = datetime.datetime.now()
+        session.add_all([
+            Transaction(user_id=1, amount=encrypt_value(12.5), type="expense", category_id=cat.id,
+                        currency="USD", date=now),
+            Transaction(user_id=1, amount=encrypt_value(3.0), type="expense", currency="USD",
+                        date=now - datetime.timedelta(days=1)),
+        ])
+        session.commit()
+
+    rows = await get_last_transactions(1)
+    assert all(isinstance(r, TransactionRow) for r in rows)
+    assert [(r.category, r.amount, r.currency) for r in rows] == [("Food", 12.5, "USD"), ("No category", 3.0, "USD")]
+
+async def test_amount_queries_cover_bucket_edges_legacy_and_archived_rows(sqlite_db):
+    def tx(model, amount, bucketed=True, type_="expense", user_id=1, **kwargs):
+        return model(user_id=user_id, amount=encrypt_value(amount), type=type_, currency="USD",
+                     amount_bucket=amount_bucket_token(user_id, amount) if bucketed else None, **kwargs)
+
+    old = datetime.datetime(2024, 1, 1)
+    with sqlite_db.Session() as session:
+        session.add_all([
+            # 100 and 1000 start a bucket, 99.99 and 1000.01 sit just outside [100, 1000]
+            tx(Transaction, 99.99), tx(Transaction, 100.0), tx(Transaction, 1000.0), tx(Transaction, 1000.01),
+            tx(Transaction, 100.0, type_="income"),
+            # Created before the bucket column existed
+            tx(Transaction, 500.0, bucketed=False), tx(Transaction, 5000.0, bucketed=False),
+            tx(ArchivedTransaction, 250.0, id=1000, date=old), tx(ArchivedTransaction, 20000.0, id=1001, date=old),
+            tx(Transaction, 500.0, user_id=2),
+        ])
+        session.commit()
+
+    amounts = lambda rows: [r.amount for r in rows]
+    assert amounts(await get_transactions_by_amount(1, 100, 1000)) == [1000.0, 500.0, 250.0, 100.0, 100.0]
+    assert amounts(await get_transactions_by_amount(1, 100, 1000, type_="expense")) == [1000.0, 500.0, 250.0, 100.0]
+    assert amounts(await get_transactions_by_amount(1, min_amount=1000)) == [20000.0, 5000.0, 1000.01, 1000.0]
+    assert amounts(await get_transactions_by_amount(1, max_amount=99.99)) == [99.99]
+    assert amounts(await get_largest_transactions(1, limit=3)) == [20000.0, 5000.0, 1000.01]
+    assert amounts(await get_largest_transactions(1, limit=2, type_="income")) == [100.0]
+    assert amounts(await get_largest_transactions(2)) == [500.0]
@@ -0,0 +1,79 @@
+from webhook import create_webhook_app, WEBHOOK_HANDLER
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiohttp.test_utils import TestServer, TestClient
+import asyncio
+import time
+
+TOKEN = '123456789:' + 'A' * 35
+
+class FakeSession(BaseSession):
+    # Records Bot API calls instead of sending them
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(type(method).__name__)
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b''
+
+    async def close(self):
+        pass
+
+def _update(update_id: int, text: str = "hi") -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': text,
+            'chat': {'id': update_id, 'type': 'private'},
+            'from': {'id': update_id, 'is_bot': False, 'first_name': 'Test'},
+        },
+    }
+
+async def test_webhook_bounds_concurrent_updates_and_drains_on_shutdown():
+    router = Router()
+    handled = []
+    events = []
+    running = [0, 0]  # now, peak
+
+    @router.message()
+    async def slow_handler(message):
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.2)
+        running[0] -= 1
+        handled.append(message.chat.id)
+        await message.answer("ok")
+
+    session = FakeSession()
+    bot = Bot(TOKEN, session=session)
+    dp = Dispatcher()
+    dp.include_router(router)
+    dp.startup.register(lambda: events.append('startup'))
+    dp.shutdown.register(lambda: events.append(('shutdown', len(handled))))
+    app = create_webhook_app(bot, dp, path='/hook', secret='s3cret', concurrency=2)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    response = await client.post('/hook', json=_update(1))
+    assert response.status == 401
+    assert (await client.get('/health')).status == 200
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post('/hook', json=_update(i), headers={'X-Telegram-Bot-Api-Secret-Token': 's3cret'})
+        for i in range(2, 7)
+    ))
+    acked = time.perf_counter() - start
+    assert [r.status for r in responses] == [200] * 5
+    # Acknowledged before the handlers finish; all five accepted, two running at a time
+    assert acked < 0.2 and app[WEBHOOK_HANDLER].in_flight == 5
+
+    await client.close()  # Graceful shutdown: waits for the in-flight updates
+    assert sorted(handled) == [2, 3, 4, 5, 6]
+    assert running[1] == 2
+    assert session.calls == ['SendMessage'] * 5
+    # Dispatcher shutdown hooks ran after every update had finished
+    assert events == ['startup', ('shutdown', 5)]
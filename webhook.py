@@ -0,0 +1,84 @@
+# Webhook mode: Telegram posts updates to an aiohttp server (alternative to long polling, see main.py)
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_CONCURRENCY, WEBHOOK_SHUTDOWN_TIMEOUT
+)
+import asyncio
+import logging
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """Acknowledges each update at once and handles it in a background task.
+
+    Because Telegram gets its answer immediately, WEBHOOK_MAX_CONNECTIONS
+    does not bound the work in this process: at most `concurrency` updates run
+    handlers at a time (each may hold a database connection), the rest wait
+    their turn. On shutdown, updates still in flight or waiting get `timeout`
+    seconds to finish before the rest of the bot shuts down.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, timeout: float = WEBHOOK_SHUTDOWN_TIMEOUT,
+                 concurrency: int = WEBHOOK_CONCURRENCY, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def _background_feed_update(self, bot: Bot, update: dict):
+        async with self._slots:
+            await super()._background_feed_update(bot, update)
+
+    @property
+    def in_flight(self) -> int:
+        # Accepted updates not finished yet, running or waiting for a slot
+        return len(self._background_feed_update_tasks)
+
+    async def drain(self, app: web.Application = None):
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logging.info(f"Waiting up to {self.timeout}s for {len(tasks)} updates in flight")
+        _, pending = await asyncio.wait(tasks, timeout=self.timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.warning(f"Cancelled {len(pending)} updates still running after {self.timeout}s")
+
+# The app's DrainingRequestHandler, e.g. for in-flight counts
+WEBHOOK_HANDLER = web.AppKey('webhook_handler', DrainingRequestHandler)
+
+async def _health(request: web.Request) -> web.Response:
+    # Load balancer health check
+    return web.json_response({'status': 'ok'})
+
+async def register_webhook(bot: Bot, dispatcher: Dispatcher):
+    # Startup hook: point Telegram at this server; skipped without a public URL (local testing)
+    if not WEBHOOK_BASE_URL:
+        logging.info("WEBHOOK_BASE_URL not set, webhook not registered with Telegram")
+        return
+    await bot.set_webhook(
+        url=WEBHOOK_BASE_URL.rstrip('/') + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dispatcher.resolve_used_update_types()
+    )
+    logging.info(f"Webhook registered: {WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+def create_webhook_app(bot: Bot, dp: Dispatcher, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                       concurrency: int = WEBHOOK_CONCURRENCY) -> web.Application:
+    """aiohttp app serving updates on POST `path`, with GET /health.
+
+    The webhook stays registered on shutdown, so other instances behind the
+    same load balancer keep receiving updates during a rolling restart.
+    """
+    app = web.Application()
+    handler = DrainingRequestHandler(dispatcher=dp, bot=bot, concurrency=concurrency, secret_token=secret or None)
+    # Shutdown order: finish in-flight updates, close the bot session, then dispatcher shutdown hooks
+    app.on_shutdown.append(handler.drain)
+    handler.register(app, path=path)
+    app.router.add_get('/health', _health)
+    app[WEBHOOK_HANDLER] = handler
+    dp.startup.register(register_webhook)
+    setup_application(app, dp, bot=bot)
+    return app